@@ -0,0 +1,208 @@
+"""
+Cargador compartido de los datos de la carpeta Consulta
+Parsea cada JSON una sola vez por proceso, construye índices por nacionalidad y
+región, y entrega vistas inmutables que se invalidan cuando cambia el mtime del archivo
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+CONSULTA_DIR = Path(__file__).parent / "Consulta"
+
+logger = logging.getLogger(__name__)
+
+
+def _readonly(self, *args, **kwargs):
+    raise TypeError(f"{type(self).__name__} es de solo lectura; use consulta_data.thaw() para obtener una copia editable")
+
+
+class FrozenDict(dict):
+    """dict de solo lectura (sigue siendo dict para isinstance y json.dump)"""
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return (dict, (thaw(self),))
+
+
+class FrozenList(list):
+    """list de solo lectura"""
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = remove = pop = clear = sort = reverse = _readonly
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return (list, (thaw(self),))
+
+
+def freeze(value: Any) -> Any:
+    """Convierte recursivamente dicts y listas en vistas de solo lectura"""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return FrozenList(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Copia editable (dict/list normales) de una vista inmutable"""
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [thaw(item) for item in value]
+    return value
+
+
+class _ConsultaCache:
+    """Caché por proceso; cada entrada guarda la huella (mtime, tamaño) de los archivos de los que depende"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._files: Dict[Path, Tuple[Tuple[int, int], Any]] = {}
+        self._countries: Dict[Path, Tuple[tuple, Dict[str, Any]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _stamp(path: Path) -> Tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def load_json(self, path) -> Any:
+        path = Path(path).resolve()
+        stamp = self._stamp(path)
+        with self._lock:
+            cached = self._files.get(path)
+            if cached and cached[0] == stamp:
+                self.hits += 1
+                return cached[1]
+
+            with open(path, 'r', encoding='utf-8') as f:
+                data = freeze(json.load(f))
+            self._files[path] = (stamp, data)
+            self.misses += 1
+            return data
+
+    def countries(self, consulta_dir) -> Dict[str, Any]:
+        countries_dir = (Path(consulta_dir) / "countries").resolve()
+        files = sorted(countries_dir.glob("*.json")) if countries_dir.exists() else []
+        stamps = tuple((path.name, self._stamp(path)) for path in files)
+
+        with self._lock:
+            cached = self._countries.get(countries_dir)
+            if cached and cached[0] == stamps:
+                self.hits += 1
+                return cached[1]
+
+            by_name = {}
+            for path in files:
+                try:
+                    by_name[path.stem] = self.load_json(path)
+                except Exception as e:
+                    # Igual que los motores: un archivo inválido no impide cargar el resto
+                    logger.warning(f"Error cargando {path}: {e}")
+
+            # Índices: nacionalidad -> regiones y región -> nacionalidades que la definen
+            regions = {}
+            region_nationalities: Dict[str, list] = {}
+            for name, data in by_name.items():
+                country_regions = data.get("regions") if isinstance(data, dict) else None
+                if isinstance(country_regions, dict):
+                    regions[name] = country_regions
+                    for region in country_regions:
+                        region_nationalities.setdefault(region, []).append(name)
+
+            index = freeze({"countries": {}, "regions": {}, "region_nationalities": region_nationalities})
+            # Los datos ya están congelados: se referencian, no se copian
+            dict.update(index["countries"], by_name)
+            dict.update(index["regions"], regions)
+            self._countries[countries_dir] = (stamps, index)
+            self.misses += 1
+            return index
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+            self._countries.clear()
+
+
+_cache = _ConsultaCache()
+
+
+def load_json(path) -> Any:
+    """
+    Carga un JSON (cacheado por mtime y tamaño)
+
+    Args:
+        path: Ruta del archivo
+
+    Returns:
+        Vista inmutable del contenido
+
+    Raises:
+        FileNotFoundError: Si el archivo no existe
+    """
+    return _cache.load_json(path)
+
+
+def load_consulta_json(name: str, consulta_dir=None) -> Any:
+    """Carga un JSON relativo a la carpeta Consulta (p.ej. 'gui_config.json' o 'templates/Alta Calidad.json')"""
+    return _cache.load_json(Path(consulta_dir or CONSULTA_DIR) / name)
+
+
+def load_countries(consulta_dir=None) -> Dict[str, Any]:
+    """
+    Datos de Consulta/countries/*.json indexados por nombre de archivo (p.ej. 'venezolana')
+
+    Returns:
+        Vista inmutable nombre -> datos del país
+    """
+    return _cache.countries(consulta_dir or CONSULTA_DIR)["countries"]
+
+
+def get_regions(nationality: str, consulta_dir=None) -> Dict[str, Any]:
+    """Regiones de una nacionalidad (vacío si no existe)"""
+    return _cache.countries(consulta_dir or CONSULTA_DIR)["regions"].get(nationality, FrozenDict())
+
+
+def get_region(nationality: str, region: str, default: Optional[str] = "caracas", consulta_dir=None) -> Dict[str, Any]:
+    """
+    Datos de una región, con la región por defecto como respaldo (mismo criterio que los motores genéticos)
+
+    Returns:
+        Vista inmutable de la región (vacía si no existe ninguna de las dos)
+    """
+    regions = get_regions(nationality, consulta_dir)
+    return regions.get(region, regions.get(default, FrozenDict()))
+
+
+def nationalities_for_region(region: str, consulta_dir=None) -> Tuple[str, ...]:
+    """Nacionalidades que definen una región con ese nombre"""
+    return tuple(_cache.countries(consulta_dir or CONSULTA_DIR)["region_nationalities"].get(region, ()))
+
+
+def cache_info() -> Dict[str, int]:
+    """Aciertos y fallos de la caché"""
+    return {"hits": _cache.hits, "misses": _cache.misses}
+
+
+def clear_cache():
+    """Vacía la caché (los archivos se volverán a parsear en el próximo acceso)"""
+    _cache.clear()
@@ -15,6 +15,53 @@ def rebuild_conventional(up, down, shape, dyn_dim=None):
     return (up @ down).reshape(shape)
 
 
+def stack_conventional(terms):
+    """
+    Concatenates (up, down, scale, dyn_dim) terms of conventional Loras applied to one layer along the rank dimension,
+    so that the sum of their updowns is one matmul: sum(scale * up @ down) == cat(scale * up) @ cat(down).
+    """
+
+    ups = []
+    downs = []
+    for up, down, scale, dyn_dim in terms:
+        up = up.reshape(up.size(0), -1)
+        down = down.reshape(down.size(0), -1)
+        if dyn_dim is not None:
+            up = up[:, :dyn_dim]
+            down = down[:dyn_dim, :]
+
+        ups.append(up * scale)
+        downs.append(down)
+
+    return torch.cat(ups, dim=1), torch.cat(downs, dim=0)
+
+
+def rebuild_conventional_batched(pairs, max_elements=2**26):
+    """
+    Multiplies many (up, down) pairs, with one bmm for each group of pairs that have the same shapes, dtype and device.
+    Yields (index, up @ down) for each pair; results of a group are produced together, and no more than max_elements
+    of results are kept at once.
+    """
+
+    groups = {}
+    for i, (up, down) in enumerate(pairs):
+        groups.setdefault((up.shape, down.shape, up.dtype, up.device), []).append(i)
+
+    for (up_shape, down_shape, _, _), indices in groups.items():
+        batch_size = max(1, max_elements // (up_shape[0] * down_shape[1]))
+
+        for start in range(0, len(indices), batch_size):
+            batch = indices[start:start + batch_size]
+            if len(batch) == 1:
+                up, down = pairs[batch[0]]
+                yield batch[0], up @ down
+                continue
+
+            products = torch.bmm(torch.stack([pairs[i][0] for i in batch]), torch.stack([pairs[i][1] for i in batch]))
+            for i, product in zip(batch, products):
+                yield i, product
+
+
 def rebuild_cp_decomposition(up, down, mid):
     up = up.reshape(up.size(0), -1)
     down = down.reshape(down.size(0), -1)
@@ -6,6 +6,7 @@ import re
 
 import lora_patches
 import network
+import lyco_helpers
 import network_lora
 import network_glora
 import network_hada
@@ -18,7 +19,7 @@ import network_oft
 import torch
 from typing import Union
 
-from modules import shared, devices, sd_models, errors, scripts, sd_hijack
+from modules import shared, devices, sd_models, errors, scripts, sd_hijack, hashes, safetensors_metadata, cond_cache
 import modules.textual_inversion.textual_inversion as textual_inversion
 import modules.models.sd3.mmdit
 
@@ -145,6 +146,7 @@ def assign_network_names_to_compvis_modules(sd_model):
         module.network_layer_name = network_name
 
     sd_model.network_layer_mapping = network_layer_mapping
+    sd_model.network_batched_names = None
 
 
 class BundledTIHash(str):
@@ -307,6 +309,12 @@ def load_networks(names, te_multipliers=None, unet_multipliers=None, dyn_dims=No
 
         networks_on_disk = [available_networks.get(name, None) if name.lower() in forbidden_network_aliases else available_network_aliases.get(name, None) for name in names]
 
+    # Loras of one prompt that have no hash yet are hashed in parallel rather than one after another by read_hash()
+    unhashed = [x for x in networks_on_disk if x is not None and not x.hash]
+    if len(unhashed) > 1:
+        for network_on_disk, sha256 in zip(unhashed, hashes.sha256_many([(x.filename, "lora/" + x.name, x.is_safetensors) for x in unhashed])):
+            network_on_disk.set_hash(sha256 or '')
+
     failed_to_load_networks = []
 
     for i, (network_on_disk, name) in enumerate(zip(networks_on_disk, names)):
@@ -388,6 +396,126 @@ def restore_weights_backup(obj, field, weight):
     getattr(obj, field).copy_(weight)
 
 
+def merged_weights_key(self, network_layer_name):
+    """Key for weights of a layer with the current set of networks applied; None if such weights should not be cached."""
+
+    if shared.opts.lora_merged_weights_cache_mb <= 0 or not loaded_networks:
+        return None
+
+    weight = getattr(self, 'weight', None)
+    if weight is None:
+        weight = getattr(self, 'in_proj_weight', None)
+
+    checkpoint_info = getattr(shared.sd_model, 'sd_checkpoint_info', None)
+    wanted_networks = tuple((x.name, x.mtime, x.te_multiplier, x.unet_multiplier, x.dyn_dim) for x in loaded_networks)
+
+    return network_layer_name, getattr(checkpoint_info, 'filename', None), getattr(shared.sd_model, 'sd_model_hash', None), getattr(weight, 'dtype', None), wanted_networks
+
+
+def store_merged_weights(self):
+    if isinstance(self, torch.nn.MultiheadAttention):
+        return store_weights_backup(self.in_proj_weight), store_weights_backup(self.out_proj.weight), store_weights_backup(self.out_proj.bias)
+
+    return store_weights_backup(self.weight), store_weights_backup(getattr(self, 'bias', None))
+
+
+def restore_merged_weight(obj, field, weight):
+    if weight is not None and getattr(obj, field) is None:
+        # bias that was created by a network
+        setattr(obj, field, torch.nn.Parameter(weight.to(obj.weight.device), requires_grad=False))
+        return
+
+    restore_weights_backup(obj, field, weight)
+
+
+def restore_merged_weights(self, merged):
+    with torch.no_grad():
+        if isinstance(self, torch.nn.MultiheadAttention):
+            restore_merged_weight(self, 'in_proj_weight', merged[0])
+            restore_merged_weight(self.out_proj, 'weight', merged[1])
+            restore_merged_weight(self.out_proj, 'bias', merged[2])
+        else:
+            restore_merged_weight(self, 'weight', merged[0])
+            restore_merged_weight(self, 'bias', merged[1])
+
+
+def network_add_updown(self, updown):
+    if getattr(self, 'fp16_weight', None) is None:
+        weight = self.weight
+    else:
+        weight = self.fp16_weight.clone().to(self.weight.device)
+
+    if len(weight.shape) == 4 and weight.shape[1] == 9:
+        # inpainting model. zero pad updown to make channel[1]  4 to 9
+        updown = torch.nn.functional.pad(updown, (0, 0, 0, 0, 0, 5))
+
+    self.weight.copy_((weight.to(dtype=updown.dtype) + updown).to(dtype=self.weight.dtype))
+
+
+def is_batchable(module, layer):
+    """conventional Lora without extras, on a layer that network_apply_weights handles by the layer's own name"""
+
+    if type(module) is not network_lora.NetworkModuleLora or module.mid_model is not None or module.bias is not None or module.dora_scale is not None:
+        return False
+
+    return type(layer) in (torch.nn.Linear, torch.nn.Conv2d) and layer.weight.device == devices.device
+
+
+def network_apply_weights_batched(wanted_names):
+    """
+    Applies the current set of networks to all layers they change at once. Updowns of conventional Loras are summed
+    per layer with a single matmul, and those matmuls are batched across layers with equal shapes; other network types
+    are applied by network_apply_weights as usual.
+    """
+
+    layer_mapping = getattr(shared.sd_model, 'network_layer_mapping', {})
+    layer_names = dict.fromkeys(name for net in loaded_networks for name in net.modules)
+
+    layers = []
+    pairs = []
+    for layer_name in layer_names:
+        layer = layer_mapping.get(layer_name)
+        if layer is None or getattr(layer, 'network_current_names', ()) == wanted_names:
+            continue
+
+        merged_key = merged_weights_key(layer, layer_name)
+        if merged_key is not None and merged_key in merged_weights:
+            continue
+
+        indices = []
+        terms = []
+        for i, net in enumerate(loaded_networks):
+            module = net.modules.get(layer_name)
+            if module is None or not is_batchable(module, layer):
+                continue
+
+            indices.append(i)
+            terms.append((module.up_model.weight.to(layer.weight.device), module.down_model.weight.to(layer.weight.device), module.calc_scale() * module.multiplier(), net.dyn_dim))
+
+        if not terms:
+            continue
+
+        try:
+            pairs.append(lyco_helpers.stack_conventional(terms))
+        except RuntimeError as e:
+            logging.debug(f"Networks {[loaded_networks[i].name for i in indices]} layer {layer_name}: {e}")
+            continue
+
+        layers.append((layer, indices))
+
+    with torch.no_grad():
+        for i, updown in lyco_helpers.rebuild_conventional_batched(pairs):
+            layer, indices = layers[i]
+            weight = layer.weight
+
+            output_shape = [updown.size(0), *loaded_networks[indices[0]].modules[layer.network_layer_name].down_model.weight.shape[1:]]
+            updown = updown.reshape(output_shape)
+            if weight.size().numel() == updown.size().numel():
+                updown = updown.reshape(weight.shape)
+
+            network_apply_weights(layer, precalculated=(set(indices), updown))
+
+
 def network_restore_weights_from_backup(self: Union[torch.nn.Conv2d, torch.nn.Linear, torch.nn.GroupNorm, torch.nn.LayerNorm, torch.nn.MultiheadAttention]):
     weights_backup = getattr(self, "network_weights_backup", None)
     bias_backup = getattr(self, "network_bias_backup", None)
@@ -408,11 +536,14 @@ def network_restore_weights_from_backup(self: Union[torch.nn.Conv2d, torch.nn.Li
         restore_weights_backup(self, 'bias', bias_backup)
 
 
-def network_apply_weights(self: Union[torch.nn.Conv2d, torch.nn.Linear, torch.nn.GroupNorm, torch.nn.LayerNorm, torch.nn.MultiheadAttention]):
+def network_apply_weights(self: Union[torch.nn.Conv2d, torch.nn.Linear, torch.nn.GroupNorm, torch.nn.LayerNorm, torch.nn.MultiheadAttention], precalculated=None):
     """
     Applies the currently selected set of networks to the weights of torch layer self.
     If weights already have this particular set of networks applied, does nothing.
     If not, restores original weights from backup and alters weights according to networks.
+
+    precalculated is a tuple of (indices of loaded_networks, updown): the sum of updowns of those networks for this layer,
+    calculated by network_apply_weights_batched.
     """
 
     network_layer_name = getattr(self, 'network_layer_name', None)
@@ -422,6 +553,16 @@ def network_apply_weights(self: Union[torch.nn.Conv2d, torch.nn.Linear, torch.nn
     current_names = getattr(self, "network_current_names", ())
     wanted_names = tuple((x.name, x.te_multiplier, x.unet_multiplier, x.dyn_dim) for x in loaded_networks)
 
+    if wanted_names == () and getattr(shared.sd_model, 'network_batched_names', None) is not None:
+        # without networks, the next set of networks has to be merged in a batch again, even if it is the same as the last one
+        shared.sd_model.network_batched_names = None
+
+    if current_names != wanted_names and precalculated is None and wanted_names != () and shared.opts.lora_batched_updown and not shared.opts.lora_functional and getattr(shared.sd_model, 'network_batched_names', wanted_names) != wanted_names:
+        # first layer to see a new set of networks updates all layers it changes
+        shared.sd_model.network_batched_names = wanted_names
+        network_apply_weights_batched(wanted_names)
+        current_names = getattr(self, "network_current_names", ())
+
     weights_backup = getattr(self, "network_weights_backup", None)
     if weights_backup is None and wanted_names != ():
         if current_names != () and not allowed_layer_without_weight(self):
@@ -451,9 +592,32 @@ def network_apply_weights(self: Union[torch.nn.Conv2d, torch.nn.Linear, torch.nn
         self.network_bias_backup = bias_backup
 
     if current_names != wanted_names:
+        merged_key = merged_weights_key(self, network_layer_name)
+        merged = merged_weights.get(merged_key) if merged_key is not None else None
+        if merged is not None:
+            restore_merged_weights(self, merged)
+            self.network_current_names = wanted_names
+            return
+
         network_restore_weights_from_backup(self)
 
-        for net in loaded_networks:
+        applied = False
+        errors_count = sum(extra_network_lora.errors.values())
+
+        if precalculated is not None:
+            try:
+                with torch.no_grad():
+                    network_add_updown(self, precalculated[1])
+                applied = True
+            except RuntimeError as e:
+                for i in precalculated[0]:
+                    logging.debug(f"Network {loaded_networks[i].name} layer {network_layer_name}: {e}")
+                    extra_network_lora.errors[loaded_networks[i].name] = extra_network_lora.errors.get(loaded_networks[i].name, 0) + 1
+
+        for i, net in enumerate(loaded_networks):
+            if precalculated is not None and i in precalculated[0]:
+                continue
+
             module = net.modules.get(network_layer_name, None)
             if module is not None and hasattr(self, 'weight') and not isinstance(module, modules.models.sd3.mmdit.QkvLinear):
                 try:
@@ -478,6 +642,7 @@ def network_apply_weights(self: Union[torch.nn.Conv2d, torch.nn.Linear, torch.nn
                                 self.bias = torch.nn.Parameter(ex_bias).to(self.weight.dtype)
                             else:
                                 self.bias.copy_((bias + ex_bias).to(dtype=self.bias.dtype))
+                        applied = True
                 except RuntimeError as e:
                     logging.debug(f"Network {net.name} layer {network_layer_name}: {e}")
                     extra_network_lora.errors[net.name] = extra_network_lora.errors.get(net.name, 0) + 1
@@ -508,6 +673,7 @@ def network_apply_weights(self: Union[torch.nn.Conv2d, torch.nn.Linear, torch.nn
                             self.out_proj.bias = torch.nn.Parameter(ex_bias)
                         else:
                             self.out_proj.bias += ex_bias
+                    applied = True
 
                 except RuntimeError as e:
                     logging.debug(f"Network {net.name} layer {network_layer_name}: {e}")
@@ -526,6 +692,7 @@ def network_apply_weights(self: Union[torch.nn.Conv2d, torch.nn.Linear, torch.nn
                         del qw, kw, vw
                         updown_qkv = torch.vstack([updown_q, updown_k, updown_v])
                         self.weight += updown_qkv
+                        applied = True
 
                 except RuntimeError as e:
                     logging.debug(f"Network {net.name} layer {network_layer_name}: {e}")
@@ -539,6 +706,10 @@ def network_apply_weights(self: Union[torch.nn.Conv2d, torch.nn.Linear, torch.nn
             logging.debug(f"Network {net.name} layer {network_layer_name}: couldn't find supported operation")
             extra_network_lora.errors[net.name] = extra_network_lora.errors.get(net.name, 0) + 1
 
+        # layers where a network failed are computed again next time, so that the error is reported again
+        if merged_key is not None and applied and sum(extra_network_lora.errors.values()) == errors_count:
+            merged_weights.put(merged_key, store_merged_weights(self), int(shared.opts.lora_merged_weights_cache_mb * 1024 * 1024))
+
         self.network_current_names = wanted_names
 
 
@@ -650,6 +821,8 @@ def network_MultiheadAttention_load_state_dict(self, *args, **kwargs):
 def process_network_files(names: list[str] | None = None):
     candidates = list(shared.walk_files(shared.cmd_opts.lora_dir, allowed_extensions=[".pt", ".ckpt", ".safetensors"]))
     candidates += list(shared.walk_files(shared.cmd_opts.lyco_dir_backcompat, allowed_extensions=[".pt", ".ckpt", ".safetensors"]))
+    safetensors_metadata.prefetch(candidates)
+
     for filename in candidates:
         if os.path.isdir(filename):
             continue
@@ -687,6 +860,9 @@ def list_available_networks():
 
     process_network_files()
 
+    if shared.opts.hash_models_in_background:
+        hashes.prehash([(entry.filename, "lora/" + entry.name, entry.is_safetensors) for entry in available_networks.values() if not entry.hash])
+
 
 re_network_name = re.compile(r"(.*)\s*\([0-9a-fA-F]+\)")
 
@@ -731,6 +907,8 @@ available_network_aliases = {}
 loaded_networks = []
 loaded_bundle_embeddings = {}
 networks_in_memory = {}
+merged_weights = cond_cache.TensorCache()
+"""weights of layers with a set of networks applied, kept in RAM so that switching back to a recently used set of networks is a copy rather than a recalculation"""
 available_network_hash_lookup = {}
 forbidden_network_aliases = {}
 
@@ -9,7 +9,7 @@ import lora  # noqa:F401
 import lora_patches
 import extra_networks_lora
 import ui_extra_networks_lora
-from modules import script_callbacks, ui_extra_networks, extra_networks, shared
+from modules import script_callbacks, ui_extra_networks, extra_networks, shared, sd_hijack_clip, shared_items
 
 
 def unload():
@@ -31,6 +31,12 @@ script_callbacks.on_script_unloaded(unload)
 script_callbacks.on_before_ui(before_ui)
 script_callbacks.on_infotext_pasted(networks.infotext_pasted)
 
+# Loras applied to the text encoder change its output, so they are part of the key for cached prompt chunks
+sd_hijack_clip.chunk_cache_key_callbacks.append(lambda: tuple((x.name, x.te_multiplier, x.dyn_dim, x.mtime) for x in networks.loaded_networks))
+
+if networks.list_available_networks not in shared_items.refresh_callbacks:
+    shared_items.refresh_callbacks.append(networks.list_available_networks)
+
 
 shared.options_templates.update(shared.options_section(('extra_networks', "Extra Networks"), {
     "sd_lora": shared.OptionInfo("None", "Add network to prompt", gr.Dropdown, lambda: {"choices": ["None", *networks.available_networks]}, refresh=networks.list_available_networks),
@@ -40,6 +46,8 @@ shared.options_templates.update(shared.options_section(('extra_networks', "Extra
     "lora_show_all": shared.OptionInfo(False, "Always show all networks on the Lora page").info("otherwise, those detected as for incompatible version of Stable Diffusion will be hidden"),
     "lora_hide_unknown_for_versions": shared.OptionInfo([], "Hide networks of unknown versions for model versions", gr.CheckboxGroup, {"choices": ["SD1", "SD2", "SDXL"]}),
     "lora_in_memory_limit": shared.OptionInfo(0, "Number of Lora networks to keep cached in memory", gr.Number, {"precision": 0}),
+    "lora_merged_weights_cache_mb": shared.OptionInfo(0, "Lora merged weights cache size (MB)", gr.Number, {"precision": 0}, onchange=networks.merged_weights.clear).info("keeps model weights with recently used combinations of networks in RAM, so that switching back to a combination is a copy instead of a recalculation; a combination takes about as much RAM as the layers it changes; 0 = disable"),
+    "lora_batched_updown": shared.OptionInfo(True, "Apply Lora networks to all layers at once").info("conventional Loras stacked on a layer are merged with one matrix multiplication, batched across layers of the same shape"),
     "lora_not_found_warning_console": shared.OptionInfo(False, "Lora not found warning in console"),
     "lora_not_found_gradio_warning": shared.OptionInfo(False, "Lora not found warning popup in webui"),
 }))
@@ -55,7 +63,7 @@ def create_lora_json(obj: network.NetworkOnDisk):
         "name": obj.name,
         "alias": obj.alias,
         "path": obj.filename,
-        "metadata": obj.metadata,
+        "metadata": dict(obj.metadata),
     }
 
 
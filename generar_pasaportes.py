@@ -25,6 +25,8 @@ from pathlib import Path
 from typing import Dict, List, Any, Optional
 import argparse
 
+import consulta_data
+
 class GeneradorPasaportes:
     """Generador de imágenes de pasaportes venezolanos con diversidad étnica."""
     
@@ -41,31 +43,28 @@ class GeneradorPasaportes:
         self.datos_etnicos = self._cargar_datos_etnicos()
         
     def _cargar_configuracion(self) -> Dict[str, Any]:
-        """Carga la configuración principal desde gui_config.json."""
+        """Carga la configuración principal desde gui_config.json (vista inmutable cacheada)."""
         config_path = self.consulta_dir / "gui_config.json"
         if not config_path.exists():
             raise FileNotFoundError(f"No se encontró {config_path}")
         
-        with open(config_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return consulta_data.load_json(config_path)
     
     def _cargar_prompts(self) -> Dict[str, Any]:
-        """Carga los prompts optimizados desde optimized_prompts.json."""
+        """Carga los prompts optimizados desde optimized_prompts.json (vista inmutable cacheada)."""
         prompts_path = self.consulta_dir / "optimized_prompts.json"
         if not prompts_path.exists():
             raise FileNotFoundError(f"No se encontró {prompts_path}")
         
-        with open(prompts_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return consulta_data.load_json(prompts_path)
     
     def _cargar_datos_etnicos(self) -> Dict[str, Any]:
-        """Carga los datos étnicos desde intelligent_ethnic_data.json."""
+        """Carga los datos étnicos desde intelligent_ethnic_data.json (vista inmutable cacheada)."""
         datos_path = self.consulta_dir / "intelligent_ethnic_data.json"
         if not datos_path.exists():
             raise FileNotFoundError(f"No se encontró {datos_path}")
         
-        with open(datos_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return consulta_data.load_json(datos_path)
     
     def generar_caracteristicas_etnicas(self, nacionalidad: str) -> Dict[str, str]:
         """
@@ -5,13 +5,38 @@ Sistema avanzado para generar características únicas con control granular
 """
 
 import random
-import json
+import hashlib
+import itertools
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 import logging
 
+import consulta_data
+
+def new_master_seed() -> int:
+    """Seed maestra aleatoria (63 bits) tomada de la entropía del sistema"""
+    return random.SystemRandom().getrandbits(63)
+
+
+def derive_seed(master_seed: int, index: int, stream: str = "profile") -> int:
+    """
+    Deriva la sub-seed de un perfil a partir de (master_seed, índice)
+
+    Cálculo O(1) e independiente del resto de la corrida, de modo que cualquier
+    perfil puede regenerarse sin reproducir los anteriores y varios procesos
+    pueden repartirse índices distintos sin generar duplicados.
+
+    Args:
+        master_seed: Seed maestra de la corrida
+        index: Índice del perfil dentro de la corrida
+        stream: Flujo independiente para el mismo índice (perfil, parámetros, ...)
+    """
+    digest = hashlib.sha256(f"{master_seed}:{stream}:{index}".encode()).digest()
+    return int.from_bytes(digest[:8], "big") >> 1
+
+
 @dataclass
 class GeneticProfile:
     """Perfil genético completo de una persona"""
@@ -80,34 +105,34 @@ class GeneticProfile:
     generation_type: str
     uniqueness_score: float
 
+    # Reproducibilidad: el perfil se regenera con (master_seed, profile_index)
+    master_seed: int = 0
+    profile_index: int = 0
+    profile_seed: int = 0
+
 class GeneticDiversityEngine:
     """Motor de diversidad genética con control granular"""
     
-    def __init__(self, logger: logging.Logger = None):
-        """Inicializa el motor de diversidad genética"""
+    def __init__(self, logger: logging.Logger = None, seed: Optional[int] = None):
+        """
+        Inicializa el motor de diversidad genética
+
+        Args:
+            logger: Logger a utilizar
+            seed: Seed maestra de la corrida (None = aleatoria)
+        """
         self.logger = logger or logging.getLogger(__name__)
+        self.master_seed = seed if seed is not None else new_master_seed()
+        self.rng = random.Random(self.master_seed)
+        self._profile_counter = itertools.count()
         self.consulta_dir = Path(__file__).parent / "Consulta"
         self.ethnic_data = self._load_ethnic_data()
         self.beauty_engine = self._initialize_beauty_engine()
         self.age_engine = self._initialize_age_engine()
         
     def _load_ethnic_data(self) -> Dict[str, Any]:
-        """Carga datos étnicos desde archivos JSON"""
-        ethnic_data = {}
-        
-        # Cargar datos de países
-        countries_dir = self.consulta_dir / "countries"
-        if countries_dir.exists():
-            for json_file in countries_dir.glob("*.json"):
-                try:
-                    with open(json_file, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        country_name = json_file.stem
-                        ethnic_data[country_name] = data
-                except Exception as e:
-                    self.logger.warning(f"Error cargando {json_file}: {e}")
-        
-        return ethnic_data
+        """Carga datos étnicos desde archivos JSON (vista inmutable compartida, ver consulta_data)"""
+        return consulta_data.load_countries(self.consulta_dir)
     
     def _initialize_beauty_engine(self) -> Dict[str, Any]:
         """Inicializa el motor de belleza realista"""
@@ -205,9 +230,13 @@ class GeneticDiversityEngine:
             }
         }
     
+    def profile_rng(self, index: int, stream: str = "profile") -> random.Random:
+        """Generador independiente para un índice de la corrida (p.ej. edad, región o seed de imagen)"""
+        return random.Random(derive_seed(self.master_seed, index, stream))
+    
     def _select_by_probability(self, options: Dict[str, float]) -> str:
         """Selecciona una opción basada en probabilidades"""
-        rand = random.random()
+        rand = self.rng.random()
         acumulado = 0.0
         
         for option, probability in options.items():
@@ -240,7 +269,8 @@ class GeneticDiversityEngine:
                                beauty_control: str = "normal",
                                skin_control: str = "auto",
                                hair_control: str = "auto",
-                               eye_control: str = "auto") -> GeneticProfile:
+                               eye_control: str = "auto",
+                               index: Optional[int] = None) -> GeneticProfile:
         """
         Genera un perfil genético completo con control granular
         
@@ -253,8 +283,15 @@ class GeneticDiversityEngine:
             skin_control: Control de piel (auto, light, medium, dark, mixed)
             hair_control: Control de cabello (auto, dark, light, mixed)
             eye_control: Control de ojos (auto, dark, light, mixed)
+            index: Índice del perfil en la corrida (None = siguiente del contador del motor)
         """
         
+        # El perfil depende solo de (master_seed, index) y de los argumentos
+        if index is None:
+            index = next(self._profile_counter)
+        profile_seed = derive_seed(self.master_seed, index)
+        self.rng.seed(profile_seed)
+        
         # Obtener datos étnicos de la nacionalidad y región
         ethnic_data = self.ethnic_data.get(nationality, {})
         regions = ethnic_data.get("regions", {})
@@ -317,7 +354,7 @@ class GeneticDiversityEngine:
         uniqueness_score = self._calculate_uniqueness_score()
         
         return GeneticProfile(
-            image_id=f"{nationality}_{region}_{gender}_{age}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]}",
+            image_id=f"{nationality}_{region}_{gender}_{age}_{self.master_seed:016x}_{index:06d}",
             nationality=nationality,
             region=region,
             gender=gender,
@@ -359,7 +396,10 @@ class GeneticDiversityEngine:
             ethnic_features=ethnic_features,
             generated_at=datetime.now().isoformat(),
             generation_type="genetic_diversity_engine",
-            uniqueness_score=uniqueness_score
+            uniqueness_score=uniqueness_score,
+            master_seed=self.master_seed,
+            profile_index=index,
+            profile_seed=profile_seed
         )
     
     def _generate_face_shape(self, region_data: Dict, gender: str) -> str:
@@ -751,16 +791,16 @@ class GeneticDiversityEngine:
         elif beauty_control == "random":
             # Aumentar variación
             for key in base_probabilities:
-                base_probabilities[key] *= random.uniform(0.5, 1.5)
+                base_probabilities[key] *= self.rng.uniform(0.5, 1.5)
         
         # Agregar imperfecciones basadas en probabilidades
         for imperfection, probability in base_probabilities.items():
-            if random.random() < probability:
+            if self.rng.random() < probability:
                 imperfections.append(imperfection)
         
         # Agregar características de edad
         for char, probability in age_chars.items():
-            if random.random() < probability:
+            if self.rng.random() < probability:
                 imperfections.append(char)
         
         return imperfections
@@ -933,7 +973,7 @@ class GeneticDiversityEngine:
         
         characteristics = []
         for char, probability in age_chars.items():
-            if random.random() < probability:
+            if self.rng.random() < probability:
                 characteristics.append(char)
         
         return characteristics
@@ -960,11 +1000,11 @@ class GeneticDiversityEngine:
             }
         else:  # random
             beauty_levels = {
-                "common": random.uniform(0.2, 0.6),
-                "average": random.uniform(0.2, 0.4),
-                "attractive": random.uniform(0.1, 0.3),
-                "very_attractive": random.uniform(0.02, 0.1),
-                "exceptionally_beautiful": random.uniform(0.0, 0.05)
+                "common": self.rng.uniform(0.2, 0.6),
+                "average": self.rng.uniform(0.2, 0.4),
+                "attractive": self.rng.uniform(0.1, 0.3),
+                "very_attractive": self.rng.uniform(0.02, 0.1),
+                "exceptionally_beautiful": self.rng.uniform(0.0, 0.05)
             }
             # Normalizar
             total = sum(beauty_levels.values())
@@ -979,17 +1019,17 @@ class GeneticDiversityEngine:
         if beauty_level in ["very_attractive", "exceptionally_beautiful"]:
             # Más factores de atractivo
             for factor, probability in self.beauty_engine["attractiveness_factors"].items():
-                if random.random() < probability * 1.5:
+                if self.rng.random() < probability * 1.5:
                     factors.append(factor)
         elif beauty_level == "attractive":
             # Factores normales
             for factor, probability in self.beauty_engine["attractiveness_factors"].items():
-                if random.random() < probability:
+                if self.rng.random() < probability:
                     factors.append(factor)
         else:
             # Menos factores de atractivo
             for factor, probability in self.beauty_engine["attractiveness_factors"].items():
-                if random.random() < probability * 0.5:
+                if self.rng.random() < probability * 0.5:
                     factors.append(factor)
         
         return factors
@@ -1028,10 +1068,10 @@ class GeneticDiversityEngine:
         """Calcula score de unicidad de 0 a 1"""
         # Combinación de múltiples factores aleatorios
         factors = [
-            random.random(),  # Factor base
-            random.random(),  # Factor étnico
-            random.random(),  # Factor de edad
-            random.random(),  # Factor de belleza
+            self.rng.random(),  # Factor base
+            self.rng.random(),  # Factor étnico
+            self.rng.random(),  # Factor de edad
+            self.rng.random(),  # Factor de belleza
         ]
         
         return sum(factors) / len(factors)
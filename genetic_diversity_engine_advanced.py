@@ -5,13 +5,19 @@ Sistema que permite generar belleza excepcional en todas las etnias y tonos de p
 """
 
 import random
-import json
+import itertools
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime
 import logging
 
+import consulta_data
+from genetic_diversity_engine import derive_seed, new_master_seed
+
+# Regiones usadas cuando region == "aleatorio" (misma lista que el método masivo básico)
+AVAILABLE_REGIONS = ["caracas", "maracaibo", "valencia", "barquisimeto", "ciudad_guayana", "maturin", "merida", "san_cristobal", "barcelona", "puerto_la_cruz", "ciudad_bolivar", "tucupita", "porlamar", "valera", "acarigua", "guanare", "san_fernando", "trujillo", "el_tigre", "cabimas", "punto_fijo", "ciudad_ojeda", "puerto_cabello", "valle_de_la_pascua", "san_juan_de_los_morros", "carora", "tocuyo", "duaca", "siquisique", "araure", "turen", "guanarito", "santa_elena", "el_venado", "san_rafael", "san_antonio", "la_fria", "rubio", "colon", "san_cristobal", "tachira", "apure", "amazonas", "delta_amacuro", "yacambu", "lara", "portuguesa", "cojedes", "guarico", "anzoategui", "monagas", "sucre", "nueva_esparta", "falcon", "zulia", "merida", "trujillo", "barinas", "yaracuy", "carabobo", "aragua", "miranda", "vargas", "distrito_capital"]
+
 @dataclass
 class AdvancedGeneticProfile:
     """Perfil genético avanzado sin sesgos étnicos"""
@@ -109,12 +115,27 @@ class AdvancedGeneticProfile:
     uniqueness_score: float
     beauty_score: float  # Score de belleza independiente del tono de piel
 
+    # Reproducibilidad: el perfil se regenera con (master_seed, profile_index)
+    master_seed: int = 0
+    profile_index: int = 0
+    profile_seed: int = 0  # Sub-seed de generate_advanced_genetic_profile; 0 en perfiles del sampler compilado
+    sampler: str = ""  # "" = motor escalar; "numpy" = CompiledProfileSampler, reproducible solo con la misma seed y lotes
+
 class AdvancedGeneticDiversityEngine:
     """Motor de diversidad genética avanzado sin sesgos"""
     
-    def __init__(self, logger: logging.Logger = None):
-        """Inicializa el motor avanzado"""
+    def __init__(self, logger: logging.Logger = None, seed: Optional[int] = None):
+        """
+        Inicializa el motor avanzado
+
+        Args:
+            logger: Logger a utilizar
+            seed: Seed maestra de la corrida (None = aleatoria)
+        """
         self.logger = logger or logging.getLogger(__name__)
+        self.master_seed = seed if seed is not None else new_master_seed()
+        self.rng = random.Random(self.master_seed)
+        self._profile_counter = itertools.count()
         self.consulta_dir = Path(__file__).parent / "Consulta"
         self.ethnic_data = self._load_ethnic_data()
         self.beauty_engine = self._initialize_advanced_beauty_engine()
@@ -123,23 +144,12 @@ class AdvancedGeneticDiversityEngine:
         self.hair_engine = self._initialize_advanced_hair_engine()
         self.eye_engine = self._initialize_advanced_eye_engine()
         
+        # Tablas de probabilidad compiladas (NumPy), compartidas por los samplers de este motor
+        self._compiled_tables = {}
+        
     def _load_ethnic_data(self) -> Dict[str, Any]:
-        """Carga datos étnicos desde archivos JSON"""
-        ethnic_data = {}
-        
-        # Cargar datos de países
-        countries_dir = self.consulta_dir / "countries"
-        if countries_dir.exists():
-            for country_file in countries_dir.glob("*.json"):
-                try:
-                    with open(country_file, 'r', encoding='utf-8') as f:
-                        country_data = json.load(f)
-                        country_name = country_file.stem
-                        ethnic_data[country_name] = country_data
-                except Exception as e:
-                    self.logger.warning(f"Error cargando {country_file}: {e}")
-        
-        return ethnic_data
+        """Carga datos étnicos desde archivos JSON (vista inmutable compartida, ver consulta_data)"""
+        return consulta_data.load_countries(self.consulta_dir)
     
     def _initialize_advanced_beauty_engine(self) -> Dict[str, Any]:
         """Inicializa motor de belleza avanzado sin sesgos étnicos"""
@@ -391,9 +401,13 @@ class AdvancedGeneticDiversityEngine:
             }
         }
     
+    def profile_rng(self, index: int, stream: str = "profile") -> random.Random:
+        """Generador independiente para un índice de la corrida (p.ej. edad, región o seed de imagen)"""
+        return random.Random(derive_seed(self.master_seed, index, stream))
+    
     def _select_by_probability(self, options: Dict[str, float]) -> str:
         """Selecciona una opción basada en probabilidades"""
-        rand = random.random()
+        rand = self.rng.random()
         acumulado = 0.0
         
         for option, probability in options.items():
@@ -426,7 +440,8 @@ class AdvancedGeneticDiversityEngine:
                                         beauty_control: str = "normal",
                                         skin_control: str = "auto",
                                         hair_control: str = "auto",
-                                        eye_control: str = "auto") -> AdvancedGeneticProfile:
+                                        eye_control: str = "auto",
+                                        index: Optional[int] = None) -> AdvancedGeneticProfile:
         """
         Genera un perfil genético avanzado sin sesgos étnicos
         
@@ -439,23 +454,23 @@ class AdvancedGeneticDiversityEngine:
             skin_control: Control de piel (auto, light, medium, dark, mixed)
             hair_control: Control de cabello (auto, dark, light, mixed)
             eye_control: Control de ojos (auto, dark, light, mixed)
+            index: Índice del perfil en la corrida (None = siguiente del contador del motor)
         """
         
         # Obtener datos étnicos de la nacionalidad y región
         ethnic_data = self.ethnic_data.get(nationality, {})
         regions = ethnic_data.get("regions", {})
         
-        # Añadir variación de seed para máxima diversidad
-        import time
-        unique_seed = int(time.time() * 1000000) + random.randint(1, 999999) + hash(f"{nationality}_{region}_{gender}_{age}") % 1000000
-        random.seed(unique_seed)
+        # El perfil depende solo de (master_seed, index) y de los argumentos
+        if index is None:
+            index = next(self._profile_counter)
+        profile_seed = derive_seed(self.master_seed, index)
+        self.rng.seed(profile_seed)
         
         # Si la región es "aleatorio", seleccionar una región aleatoria
         if region == "aleatorio":
-            import random
             # Usar la misma lista de regiones que el método masivo básico
-            available_regions = ["caracas", "maracaibo", "valencia", "barquisimeto", "ciudad_guayana", "maturin", "merida", "san_cristobal", "barcelona", "puerto_la_cruz", "ciudad_bolivar", "tucupita", "porlamar", "valera", "acarigua", "guanare", "san_fernando", "trujillo", "el_tigre", "cabimas", "punto_fijo", "ciudad_ojeda", "puerto_cabello", "valle_de_la_pascua", "san_juan_de_los_morros", "carora", "tocuyo", "duaca", "siquisique", "araure", "turen", "guanarito", "santa_elena", "el_venado", "san_rafael", "san_antonio", "la_fria", "rubio", "colon", "san_cristobal", "tachira", "apure", "amazonas", "delta_amacuro", "yacambu", "lara", "portuguesa", "cojedes", "guarico", "anzoategui", "monagas", "sucre", "nueva_esparta", "falcon", "zulia", "merida", "trujillo", "barinas", "yaracuy", "carabobo", "aragua", "miranda", "vargas", "distrito_capital"]
-            region = random.choice(available_regions)
+            region = self.rng.choice(AVAILABLE_REGIONS)
         
         region_data = regions.get(region, regions.get("caracas", {}))
         
@@ -537,7 +552,7 @@ class AdvancedGeneticDiversityEngine:
         beauty_score = self._calculate_beauty_score(beauty_level, skin_tone, attractiveness_factors)
         
         return AdvancedGeneticProfile(
-            image_id=f"{nationality}_{region}_{gender}_{age}_{int(time.time() * 1000000)}_{random.randint(1, 999999)}",
+            image_id=f"{nationality}_{region}_{gender}_{age}_{self.master_seed:016x}_{index:06d}",
             nationality=nationality,
             region=region,
             gender=gender,
@@ -608,8 +623,35 @@ class AdvancedGeneticDiversityEngine:
             generated_at=datetime.now().isoformat(),
             generation_type="advanced_genetic_diversity",
             uniqueness_score=uniqueness_score,
-            beauty_score=beauty_score
+            beauty_score=beauty_score,
+            master_seed=self.master_seed,
+            profile_index=index,
+            profile_seed=profile_seed
         )
+
+    def generate_advanced_genetic_profiles(self,
+                                           count: int,
+                                           nationality: str,
+                                           region: str,
+                                           gender: str,
+                                           age_min: int = 18,
+                                           age_max: int = 50,
+                                           seed: int = None,
+                                           **controls) -> List[AdvancedGeneticProfile]:
+        """
+        Genera un lote de perfiles genéticos con el sampler compilado (NumPy)
+
+        Args:
+            count: Cantidad de perfiles
+            nationality, region, gender: Igual que generate_advanced_genetic_profile
+            age_min, age_max: Rango de edades (uniforme)
+            seed: Seed para resultados reproducibles
+            **controls: beauty_control, skin_control, hair_control, eye_control
+        """
+        from genetic_profile_sampler import CompiledProfileSampler
+
+        sampler = CompiledProfileSampler(self, seed=seed)
+        return sampler.sample_profiles(count, nationality, region, gender, age_min=age_min, age_max=age_max, **controls)
     
     def _generate_facial_symmetry(self, beauty_control: str) -> str:
         """Genera simetría facial basada en control de belleza"""
@@ -822,7 +864,7 @@ class AdvancedGeneticDiversityEngine:
         # Obtener características étnicas específicas
         ethnic_beauty = self.beauty_engine["ethnic_beauty_features"].get(nationality, {})
         for heritage, heritage_features in ethnic_beauty.items():
-            if random.random() < 0.3:  # 30% probabilidad de incluir cada herencia
+            if self.rng.random() < 0.3:  # 30% probabilidad de incluir cada herencia
                 features.extend(heritage_features)
         
         return features
@@ -839,7 +881,7 @@ class AdvancedGeneticDiversityEngine:
         
         heritage = []
         for heritage_type, probability in heritage_options.items():
-            if random.random() < probability:
+            if self.rng.random() < probability:
                 heritage.append(heritage_type)
         
         return heritage if heritage else ["mestizo"]
@@ -1476,16 +1518,16 @@ class AdvancedGeneticDiversityEngine:
         elif beauty_control == "random":
             # Aumentar variación
             for key in base_probabilities:
-                base_probabilities[key] *= random.uniform(0.5, 1.5)
+                base_probabilities[key] *= self.rng.uniform(0.5, 1.5)
         
         # Agregar imperfecciones basadas en probabilidades
         for imperfection, probability in base_probabilities.items():
-            if random.random() < probability:
+            if self.rng.random() < probability:
                 imperfections.append(imperfection)
         
         # Agregar características de edad
         for char, probability in age_chars.items():
-            if isinstance(probability, (int, float)) and random.random() < probability:
+            if isinstance(probability, (int, float)) and self.rng.random() < probability:
                 imperfections.append(char)
         
         return imperfections
@@ -1823,7 +1865,7 @@ class AdvancedGeneticDiversityEngine:
         
         characteristics = []
         for char, probability in age_chars.items():
-            if isinstance(probability, (int, float)) and random.random() < probability:
+            if isinstance(probability, (int, float)) and self.rng.random() < probability:
                 characteristics.append(char)
         
         return characteristics
@@ -1850,11 +1892,11 @@ class AdvancedGeneticDiversityEngine:
             }
         else:  # random
             beauty_levels = {
-                "common": random.uniform(0.2, 0.6),
-                "average": random.uniform(0.2, 0.4),
-                "attractive": random.uniform(0.1, 0.3),
-                "very_attractive": random.uniform(0.02, 0.1),
-                "exceptionally_beautiful": random.uniform(0.0, 0.05)
+                "common": self.rng.uniform(0.2, 0.6),
+                "average": self.rng.uniform(0.2, 0.4),
+                "attractive": self.rng.uniform(0.1, 0.3),
+                "very_attractive": self.rng.uniform(0.02, 0.1),
+                "exceptionally_beautiful": self.rng.uniform(0.0, 0.05)
             }
             # Normalizar
             total = sum(beauty_levels.values())
@@ -1869,17 +1911,17 @@ class AdvancedGeneticDiversityEngine:
         if beauty_level in ["very_attractive", "exceptionally_beautiful"]:
             # Más factores de atractivo
             for factor, probability in self.beauty_engine["attractiveness_factors"].items():
-                if random.random() < probability * 1.5:
+                if self.rng.random() < probability * 1.5:
                     factors.append(factor)
         elif beauty_level == "attractive":
             # Factores normales
             for factor, probability in self.beauty_engine["attractiveness_factors"].items():
-                if random.random() < probability:
+                if self.rng.random() < probability:
                     factors.append(factor)
         else:
             # Menos factores de atractivo
             for factor, probability in self.beauty_engine["attractiveness_factors"].items():
-                if random.random() < probability * 0.5:
+                if self.rng.random() < probability * 0.5:
                     factors.append(factor)
         
         return factors
@@ -1891,11 +1933,11 @@ class AdvancedGeneticDiversityEngine:
         # Agregar características basadas en la región
         if region_data:
             for key, value in region_data.items():
-                if isinstance(value, dict) and random.random() < 0.3:
+                if isinstance(value, dict) and self.rng.random() < 0.3:
                     features.append(f"{key}_characteristics")
         
         return features
     
     def _calculate_uniqueness_score(self) -> float:
         """Calcula score de unicidad"""
-        return round(random.uniform(0.95, 1.0), 3)
+        return round(self.rng.uniform(0.95, 1.0), 3)
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Sampler compilado y vectorizado para AdvancedGeneticDiversityEngine
+Convierte las tablas de probabilidad del motor en arreglos NumPy de probabilidad
+acumulada y genera lotes completos de perfiles con muestreo por searchsorted
+"""
+
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from genetic_diversity_engine import new_master_seed
+from genetic_diversity_engine_advanced import AVAILABLE_REGIONS, AdvancedGeneticDiversityEngine, AdvancedGeneticProfile
+
+# Columna categórica: (vocabulario, código por perfil)
+Categorical = Tuple[np.ndarray, np.ndarray]
+
+
+class _TableCapture:
+    """Proxy del motor que registra la tabla pasada a _select_by_probability en lugar de muestrear"""
+
+    def __init__(self, engine: AdvancedGeneticDiversityEngine):
+        self._engine = engine
+        self.options: Optional[Dict[str, float]] = None
+
+    def __getattr__(self, name):
+        return getattr(self._engine, name)
+
+    def _select_by_probability(self, options: Dict[str, float]) -> str:
+        if self.options is None:
+            self.options = dict(options)
+        return next(iter(options))
+
+
+class _CompiledTable:
+    """Tabla de probabilidad compilada: claves y probabilidad acumulada en el orden original"""
+
+    def __init__(self, options: Dict[str, float]):
+        self.keys = np.array(list(options.keys()), dtype=object)
+        # np.cumsum suma secuencialmente, igual que el acumulado de _select_by_probability
+        self.cdf = np.cumsum(np.array(list(options.values()), dtype=np.float64))
+
+
+class _Subsets:
+    """Materializa máscaras booleanas (perfil x clave) como listas, con una lista cacheada por combinación"""
+
+    def __init__(self, keys: Sequence[str]):
+        self.keys = list(keys)
+        self.weights = (1 << np.arange(len(self.keys), dtype=np.int64))
+        self.cache: Dict[int, List[str]] = {}
+
+    def lists(self, mask: np.ndarray, prefix: Optional[Sequence[List[str]]] = None) -> List[List[str]]:
+        bits = (mask.astype(np.int64) @ self.weights) if len(self.keys) else np.zeros(len(mask), dtype=np.int64)
+        cache = self.cache
+        for combo in np.unique(bits).tolist():
+            if combo not in cache:
+                cache[combo] = [key for i, key in enumerate(self.keys) if combo >> i & 1]
+
+        if prefix is None:
+            return [cache[combo][:] for combo in bits.tolist()]
+        return [list(head) + cache[combo] for head, combo in zip(prefix, bits.tolist())]
+
+
+class CompiledProfileSampler:
+    """
+    Genera lotes de AdvancedGeneticProfile con las mismas distribuciones que
+    AdvancedGeneticDiversityEngine.generate_advanced_genetic_profile
+
+    Las tablas se extraen de los propios métodos _generate_* del motor (una vez por
+    contexto y por motor), de modo que cualquier cambio en esas tablas se refleja aquí.
+    """
+
+    def __init__(self, engine: AdvancedGeneticDiversityEngine = None, seed: Optional[int] = None):
+        """
+        Args:
+            engine: Motor genético cuyas tablas se compilan (se crea uno si no se indica)
+            seed: Seed maestra (None = aleatoria) del numpy.random.Generator; los perfiles registran
+                (seed, índice) pero no profile_seed, porque el motor escalar no los regenera: salen de
+                un único stream vectorizado y se repiten solo con la misma seed y la misma secuencia de lotes
+        """
+        self.engine = engine or AdvancedGeneticDiversityEngine()
+        self.master_seed = seed if seed is not None else new_master_seed()
+        self.rng = np.random.default_rng(self.master_seed)
+        self.next_index = 0  # Índice del próximo perfil: los lotes sucesivos continúan la numeración
+        self._tables = self.engine._compiled_tables
+
+    # ------------------------------------------------------------------
+    # Compilación de tablas
+    # ------------------------------------------------------------------
+
+    def _capture(self, method_name: str, *args) -> Dict[str, float]:
+        """Ejecuta un método _generate_* sobre un proxy y devuelve la primera tabla que usa"""
+        capture = _TableCapture(self.engine)
+        try:
+            getattr(AdvancedGeneticDiversityEngine, method_name)(capture, *args)
+        except Exception:
+            # Algunos métodos fallan después de elegir (p.ej. tonalidad de un color sin datos);
+            # la tabla ya quedó registrada
+            if capture.options is None:
+                raise
+        return capture.options
+
+    @staticmethod
+    def _freeze(arg):
+        # Los datos de región viven en engine.ethnic_data durante toda la vida del motor
+        if isinstance(arg, dict):
+            return ("region_data", id(arg)) if arg else ("region_data", None)
+        return arg
+
+    def _table(self, method_name: str, *args) -> _CompiledTable:
+        cache_key = (method_name,) + tuple(self._freeze(arg) for arg in args)
+        table = self._tables.get(cache_key)
+        if table is None:
+            table = _CompiledTable(self._capture(method_name, *args))
+            self._tables[cache_key] = table
+        return table
+
+    def _uniform_table(self, values: Sequence[str]) -> _CompiledTable:
+        cache_key = ("uniform",) + tuple(values)
+        table = self._tables.get(cache_key)
+        if table is None:
+            table = _CompiledTable({value: 1.0 / len(values) for value in values})
+            self._tables[cache_key] = table
+        return table
+
+    # ------------------------------------------------------------------
+    # Muestreo vectorizado
+    # ------------------------------------------------------------------
+
+    def _draw(self, tables: List[_CompiledTable], codes: Optional[np.ndarray], n: int) -> Categorical:
+        """
+        Muestrea una categoría por perfil
+
+        Args:
+            tables: Tablas compiladas, una por contexto
+            codes: Índice de tabla de cada perfil (None si hay una sola tabla)
+            n: Cantidad de perfiles
+
+        Returns:
+            Columna categórica (vocabulario, código por perfil)
+        """
+        u = self.rng.random(n)
+
+        if len(tables) == 1:
+            table = tables[0]
+            idx = np.searchsorted(table.cdf, u, side='left')
+            # Igual que _select_by_probability: si no cae en ninguna opción se toma la primera
+            idx[idx >= len(table.keys)] = 0
+            return table.keys, idx
+
+        vocab: Dict[str, int] = {}
+        width = max(len(table.keys) for table in tables)
+        cdf = np.full((len(tables), width), np.inf)
+        keymap = np.zeros((len(tables), width), dtype=np.int64)
+        sizes = np.empty(len(tables), dtype=np.int64)
+        for row, table in enumerate(tables):
+            cdf[row, :len(table.cdf)] = table.cdf
+            keymap[row, :len(table.keys)] = [vocab.setdefault(key, len(vocab)) for key in table.keys]
+            sizes[row] = len(table.keys)
+
+        # searchsorted por fila: cantidad de entradas acumuladas estrictamente menores que u
+        idx = (cdf[codes] < u[:, None]).sum(axis=1)
+        idx[idx >= sizes[codes]] = 0
+        return np.array(list(vocab), dtype=object), keymap[codes, idx]
+
+    def _draw_by(self, method_name: str, context: Categorical, make_args: Callable[[Any], tuple]) -> Categorical:
+        """Muestrea un campo cuya tabla depende de otra columna (edad, región, valor previo...)"""
+        vocab, codes = context
+        tables = [self._table(method_name, *make_args(value)) for value in vocab.tolist()]
+        return self._draw(tables, codes, len(codes))
+
+    def _draw_uniform_by(self, context: Categorical, values_for: Callable[[Any], List[str]]) -> Categorical:
+        vocab, codes = context
+        tables = [self._uniform_table(values_for(value)) for value in vocab.tolist()]
+        return self._draw(tables, codes, len(codes))
+
+    def _bernoulli(self, probabilities: np.ndarray, n: int) -> np.ndarray:
+        """Máscara (perfil x clave): cada clave se incluye de forma independiente con su probabilidad"""
+        return self.rng.random((n, probabilities.shape[-1])) < probabilities
+
+    def sample_columns(self,
+                       n: int,
+                       nationality: str,
+                       region: str,
+                       gender: str,
+                       ages: Optional[Sequence[int]] = None,
+                       age_min: int = 18,
+                       age_max: int = 50,
+                       beauty_control: str = "normal",
+                       skin_control: str = "auto",
+                       hair_control: str = "auto",
+                       eye_control: str = "auto") -> Dict[str, Any]:
+        """
+        Genera n perfiles en formato columnar
+
+        Args:
+            n: Cantidad de perfiles
+            nationality, region, gender: Igual que en generate_advanced_genetic_profile
+            ages: Edad de cada perfil; si no se indica se sortea uniformemente en [age_min, age_max]
+            beauty_control, skin_control, hair_control, eye_control: Controles del motor
+
+        Returns:
+            Diccionario campo -> columna. Los campos categóricos son tuplas
+            (vocabulario, códigos); los de lista son (claves, máscara booleana).
+        """
+        engine = self.engine
+        regions = engine.ethnic_data.get(nationality, {}).get("regions", {})
+
+        ages = np.asarray(ages, dtype=np.int64) if ages is not None else self.rng.integers(age_min, age_max + 1, size=n)
+        age_vocab, age_codes = np.unique(ages, return_inverse=True)
+        age_col = (age_vocab.astype(object), age_codes.reshape(-1))
+
+        if region == "aleatorio":
+            region_vocab = np.array(AVAILABLE_REGIONS, dtype=object)
+            region_col = (region_vocab, self.rng.integers(0, len(region_vocab), size=n))
+        else:
+            region_col = (np.array([region], dtype=object), np.zeros(n, dtype=np.int64))
+
+        def region_data(name):
+            return regions.get(name, regions.get("caracas", {}))
+
+        def fixed(method_name, *args):
+            return self._draw([self._table(method_name, *args)], None, n)
+
+        def by_region(method_name, *extra):
+            return self._draw_by(method_name, region_col, lambda name: (region_data(name), *extra))
+
+        def by_age(method_name, make_args):
+            return self._draw_by(method_name, age_col, make_args)
+
+        cols: Dict[str, Any] = {"region": region_col, "age": age_col}
+
+        # Rasgos faciales
+        cols["face_shape"] = fixed("_generate_face_shape", {}, gender)
+        cols["face_width"] = fixed("_generate_face_width", {})
+        cols["face_length"] = fixed("_generate_face_length", {})
+        cols["jawline"] = by_age("_generate_jawline", lambda age: ({}, gender, age))
+        cols["chin"] = fixed("_generate_chin", {}, gender)
+        cols["cheekbones"] = by_age("_generate_cheekbones", lambda age: ({}, gender, age))
+        cols["facial_symmetry"] = fixed("_generate_facial_symmetry", beauty_control)
+        cols["bone_structure"] = fixed("_generate_bone_structure", {}, gender)
+
+        # Ojos
+        eye_colors = engine.eye_engine["eye_colors"]
+        cols["eye_color"] = by_region("_generate_advanced_eye_color", eye_control)
+        cols["eye_color_shade"] = self._draw_uniform_by(cols["eye_color"], lambda color: eye_colors[color]["shades"] if color in eye_colors else [color])
+        cols["eye_shape"] = by_region("_generate_eye_shape")
+        cols["eye_size"] = fixed("_generate_eye_size", {})
+        cols["eye_spacing"] = fixed("_generate_eye_spacing", {})
+        cols["eyelid_type"] = by_region("_generate_eyelid_type")
+        cols["eyelashes"] = cols["eyelashes_length"] = fixed("_generate_eyelashes", {}, gender)
+        cols["eyebrows"] = cols["eyebrows_thickness"] = fixed("_generate_eyebrows", {}, gender)
+        cols["eyebrows_shape"] = (np.array(["natural"], dtype=object), np.zeros(n, dtype=np.int64))
+
+        # Nariz y boca
+        cols["nose_shape"] = fixed("_generate_nose_shape", {})
+        cols["nose_size"] = fixed("_generate_nose_size", {})
+        cols["nose_width"] = fixed("_generate_nose_width", {})
+        cols["nose_bridge"] = fixed("_generate_nose_bridge", {})
+        cols["nose_tip"] = fixed("_generate_nose_tip", {})
+        cols["nostril_size"] = fixed("_generate_nostril_size", {})
+        cols["lip_shape"] = fixed("_generate_lip_shape", {}, gender)
+        cols["lip_size"] = fixed("_generate_lip_size", {}, gender)
+        cols["lip_thickness"] = fixed("_generate_lip_thickness", {}, gender)
+        cols["mouth_width"] = fixed("_generate_mouth_width", {})
+        cols["lip_color"] = fixed("_generate_lip_color", {}, gender)
+        cols["lip_fullness"] = fixed("_generate_lip_fullness", {}, gender)
+
+        # Piel
+        skin_tones = engine.skin_engine["skin_tones"]
+        cols["skin_tone"] = by_region("_generate_advanced_skin_tone", skin_control)
+        cols["skin_tone_shade"] = self._draw_uniform_by(cols["skin_tone"], lambda tone: skin_tones[tone]["shades"])
+        cols["skin_texture"] = by_age("_generate_skin_texture", lambda age: ({}, age))
+        cols["skin_undertone"] = self._draw_uniform_by(cols["skin_tone"], lambda tone: skin_tones[tone]["undertones"])
+        cols["skin_glow"] = fixed("_generate_skin_glow", "", beauty_control)
+        cols["skin_imperfections"] = self._sample_skin_imperfections(n, beauty_control)
+        cols["freckles"] = cols["freckles_density"] = self._draw_by("_generate_freckles", cols["skin_tone"], lambda tone: ({}, tone))
+        cols["moles"] = cols["moles_count"] = self._draw_by("_generate_moles", cols["skin_tone"], lambda tone: ({}, tone))
+        cols["birthmarks"] = fixed("_generate_birthmarks", {}, "")
+        cols["scars"] = by_age("_generate_scars", lambda age: ({}, age))
+        cols["acne"] = by_age("_generate_acne", lambda age: (age, beauty_control))
+        cols["age_spots"] = by_age("_generate_age_spots", lambda age: (age, beauty_control))
+        cols["wrinkles"] = by_age("_generate_wrinkles", lambda age: (age, beauty_control))
+        cols["skin_elasticity"] = by_age("_generate_skin_elasticity", lambda age: (age,))
+
+        # Cabello
+        hair_colors = engine.hair_engine["hair_colors"]
+        cols["hair_color"] = by_region("_generate_advanced_hair_color", hair_control)
+        cols["hair_color_shade"] = self._draw_uniform_by(cols["hair_color"], lambda color: hair_colors[color]["shades"] if color in hair_colors else [color])
+        cols["hair_texture"] = by_region("_generate_hair_texture")
+        texture_vocab, texture_codes = cols["hair_texture"]
+        cols["hair_curliness"] = (np.array([engine._generate_hair_curliness(texture) for texture in texture_vocab], dtype=object), texture_codes)
+        cols["hair_length"] = fixed("_generate_hair_length", {}, gender)
+        cols["hair_style"] = self._draw_by("_generate_hair_style", cols["hair_length"], lambda length: ({}, gender, length))
+        cols["hair_density"] = by_age("_generate_hair_density", lambda age: ({}, gender, age))
+        cols["hair_shine"] = fixed("_generate_hair_shine", "", beauty_control)
+        cols["hair_thickness"] = fixed("_generate_hair_thickness", {}, gender)
+        cols["hairline"] = by_age("_generate_hairline", lambda age: ({}, gender, age))
+
+        # Edad, belleza y herencia
+        cols["age_characteristics"] = self._sample_age_characteristics(age_col)
+        cols["beauty_level"] = self._sample_beauty_level(n, beauty_control)
+        cols["attractiveness_factors"] = self._sample_attractiveness_factors(cols["beauty_level"])
+        cols["ethnic_beauty_features"] = self._sample_ethnic_beauty_features(nationality, n)
+        cols["ethnic_features"] = self._sample_ethnic_features(region_col, region_data)
+        cols["genetic_heritage"] = self._sample_genetic_heritage(n)
+        cols["uniqueness_score"] = np.round(self.rng.uniform(0.95, 1.0, size=n), 3)
+
+        return cols
+
+    def _sample_skin_imperfections(self, n: int, beauty_control: str) -> Tuple[List[str], np.ndarray]:
+        base = self.engine.skin_engine["skin_imperfections"]
+        probabilities = np.array(list(base.values()), dtype=np.float64)
+
+        if beauty_control == "attractive":
+            probabilities = probabilities * 0.5
+        elif beauty_control == "random":
+            probabilities = probabilities * self.rng.uniform(0.5, 1.5, size=(n, len(probabilities)))
+
+        return list(base.keys()), self._bernoulli(probabilities, n)
+
+    def _sample_age_characteristics(self, age_col: Categorical) -> Tuple[List[str], np.ndarray]:
+        """Solo las entradas numéricas de age_engine actúan como probabilidades (igual que el motor)"""
+        age_vocab, age_codes = age_col
+        per_age = []
+        keys: Dict[str, int] = {}
+        for age in age_vocab.tolist():
+            chars = {k: v for k, v in self.engine.age_engine.get(self.engine._get_age_range(age), {}).items() if isinstance(v, (int, float))}
+            for key in chars:
+                keys.setdefault(key, len(keys))
+            per_age.append(chars)
+
+        probabilities = np.zeros((len(age_vocab), len(keys)))
+        for row, chars in enumerate(per_age):
+            for key, probability in chars.items():
+                probabilities[row, keys[key]] = probability
+
+        return list(keys), self._bernoulli(probabilities[age_codes], len(age_codes))
+
+    def _sample_beauty_level(self, n: int, control: str) -> Categorical:
+        if control in ("normal", "attractive", "realistic"):
+            return self._draw([self._table("_generate_beauty_level", control)], None, n)
+
+        # Rama "random" del motor: pesos uniformes por perfil, normalizados
+        levels = np.array(["common", "average", "attractive", "very_attractive", "exceptionally_beautiful"], dtype=object)
+        low = np.array([0.2, 0.2, 0.1, 0.02, 0.0])
+        high = np.array([0.6, 0.4, 0.3, 0.1, 0.05])
+        weights = self.rng.uniform(low, high, size=(n, len(levels)))
+        cdf = np.cumsum(weights / weights.sum(axis=1, keepdims=True), axis=1)
+        idx = (cdf < self.rng.random(n)[:, None]).sum(axis=1)
+        idx[idx >= len(levels)] = 0
+        return levels, idx
+
+    def _sample_attractiveness_factors(self, beauty_level: Categorical) -> Tuple[List[str], np.ndarray]:
+        factors = self.engine.beauty_engine["attractiveness_factors"]
+        level_vocab, level_codes = beauty_level
+        multiplier = np.array([
+            1.5 if level in ("very_attractive", "exceptionally_beautiful") else 1.0 if level == "attractive" else 0.5
+            for level in level_vocab.tolist()
+        ])[level_codes]
+        probabilities = multiplier[:, None] * np.array(list(factors.values()))[None, :]
+        return list(factors.keys()), self._bernoulli(probabilities, len(level_codes))
+
+    def _sample_ethnic_beauty_features(self, nationality: str, n: int) -> Tuple[List[List[str]], np.ndarray]:
+        """Devuelve las listas de rasgos por herencia y la máscara de herencias incluidas (30% cada una)"""
+        heritages = list(self.engine.beauty_engine["ethnic_beauty_features"].get(nationality, {}).values())
+        return heritages, self._bernoulli(np.full(len(heritages), 0.3), n)
+
+    def _sample_ethnic_features(self, region_col: Categorical, region_data: Callable[[str], Dict]) -> Tuple[List[str], np.ndarray]:
+        region_vocab, region_codes = region_col
+        keys: Dict[str, int] = {}
+        per_region = []
+        for name in region_vocab.tolist():
+            region_keys = [f"{key}_characteristics" for key, value in region_data(name).items() if isinstance(value, dict)]
+            for key in region_keys:
+                keys.setdefault(key, len(keys))
+            per_region.append(region_keys)
+
+        probabilities = np.zeros((len(region_vocab), len(keys)))
+        for row, region_keys in enumerate(per_region):
+            for key in region_keys:
+                probabilities[row, keys[key]] = 0.3
+
+        return list(keys), self._bernoulli(probabilities[region_codes], len(region_codes))
+
+    def _sample_genetic_heritage(self, n: int) -> Tuple[List[str], np.ndarray]:
+        options = {"mestizo": 0.4, "afrodescendant": 0.2, "indigenous": 0.2, "european": 0.15, "mixed": 0.05}
+        return list(options.keys()), self._bernoulli(np.array(list(options.values())), n)
+
+    def sample_profiles(self, n: int, nationality: str, region: str, gender: str, **kwargs) -> List[AdvancedGeneticProfile]:
+        """
+        Genera n AdvancedGeneticProfile (mismos argumentos que sample_columns)
+
+        Returns:
+            Lista de perfiles genéticos
+        """
+        cols = self.sample_columns(n, nationality, region, gender, **kwargs)
+        engine = self.engine
+
+        list_fields = ("skin_imperfections", "age_characteristics", "attractiveness_factors", "ethnic_features", "genetic_heritage", "ethnic_beauty_features")
+        values: Dict[str, list] = {}
+        for name, column in cols.items():
+            if name not in list_fields and name != "uniqueness_score":
+                vocab, codes = column
+                values[name] = vocab[codes].tolist()
+
+        for name in ("skin_imperfections", "age_characteristics", "attractiveness_factors", "ethnic_features", "genetic_heritage"):
+            keys, mask = cols[name]
+            values[name] = _Subsets(keys).lists(mask)
+        values["genetic_heritage"] = [heritage if heritage else ["mestizo"] for heritage in values["genetic_heritage"]]
+
+        # Rasgos de belleza: los del tono de piel seguidos de los de cada herencia incluida
+        skin_beauty = engine.beauty_engine["skin_tone_beauty"]
+        heritages, heritage_mask = cols["ethnic_beauty_features"]
+        flat_keys = [(h, feature) for h, features in enumerate(heritages) for feature in features]
+        flat_mask = heritage_mask[:, [h for h, _ in flat_keys]] if flat_keys else np.zeros((n, 0), dtype=bool)
+        values["ethnic_beauty_features"] = _Subsets([feature for _, feature in flat_keys]).lists(
+            flat_mask, prefix=[skin_beauty.get(tone, []) for tone in values["skin_tone"]]
+        )
+
+        values["uniqueness_score"] = cols["uniqueness_score"].tolist()
+        values["beauty_score"] = [
+            engine._calculate_beauty_score(level, tone, factors)
+            for level, tone, factors in zip(values["beauty_level"], values["skin_tone"], values["attractiveness_factors"])
+        ]
+
+        generated_at = datetime.now().isoformat()
+        first_index = self.next_index
+        self.next_index += n
+        fields = [name for name in AdvancedGeneticProfile.__dataclass_fields__ if name in values]
+
+        return [
+            AdvancedGeneticProfile(
+                image_id=f"{nationality}_{values['region'][i]}_{gender}_{values['age'][i]}_{self.master_seed:016x}_{index:06d}",
+                nationality=nationality,
+                gender=gender,
+                generated_at=generated_at,
+                generation_type="advanced_genetic_diversity",
+                master_seed=self.master_seed,
+                profile_index=index,
+                sampler="numpy",
+                **{name: values[name][i] for name in fields}
+            )
+            for i, index in enumerate(range(first_index, first_index + n))
+        ]
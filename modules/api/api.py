@@ -1,7 +1,14 @@
 import base64
+import contextvars
+import hashlib
 import io
+import json
 import os
+import queue
+import re
+import threading
 import time
+import uuid
 import datetime
 import uvicorn
 import ipaddress
@@ -12,18 +19,18 @@ from io import BytesIO
 from fastapi import APIRouter, Depends, FastAPI, Request, Response
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.exceptions import HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
 from secrets import compare_digest
 
 import modules.shared as shared
-from modules import sd_samplers, deepbooru, sd_hijack, images, scripts, ui, postprocessing, errors, restart, shared_items, script_callbacks, infotext_utils, sd_models, sd_schedulers
+from modules import sd_samplers, deepbooru, sd_hijack, images, scripts, ui, postprocessing, errors, restart, shared_items, script_callbacks, infotext_utils, sd_models, sd_schedulers, sd_models_pool, job_queue, call_queue
 from modules.api import models
 from modules.shared import opts
-from modules.processing import StableDiffusionProcessingTxt2Img, StableDiffusionProcessingImg2Img, process_images
+from modules.processing import StableDiffusionProcessingTxt2Img, StableDiffusionProcessingImg2Img, process_images, get_fixed_seed
 from modules.textual_inversion.textual_inversion import create_embedding, train_embedding
 from modules.hypernetworks.hypernetwork import create_hypernetwork, train_hypernetwork
-from PIL import PngImagePlugin
+from PIL import Image, PngImagePlugin
 from modules.sd_models_config import find_checkpoint_config_near_filename
 from modules.realesrgan_model import get_realesrgan_models
 from modules import devices
@@ -31,7 +38,7 @@ from typing import Any
 import piexif
 import piexif.helper
 from contextlib import closing
-from modules.progress import create_task_id, add_task_to_queue, start_task, finish_task, current_task
+from modules.progress import create_task_id, add_task_to_queue, start_task, finish_task, current_task, pending_tasks
 
 def script_name_to_index(name, scripts):
     try:
@@ -74,7 +81,57 @@ def verify_url(url):
     return True
 
 
+re_image_hash = re.compile(r"^[0-9a-f]{64}$")
+
+image_media_types = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+
+def stored_images_dir():
+    return opts.outdir_api_images or os.path.join(opts.outdir_samples or opts.outdir_txt2img_samples, "api")
+
+
+def store_image_bytes(data, extension):
+    """Writes an encoded image to the API images directory under the sha256 of its contents; returns (hash, filename)."""
+
+    sha256 = hashlib.sha256(data).hexdigest()
+    directory = stored_images_dir()
+    filename = os.path.join(directory, f"{sha256}.{extension}")
+
+    if not os.path.exists(filename):
+        os.makedirs(directory, exist_ok=True)
+        temp_filename = f"{filename}.{uuid.uuid4().hex}.tmp"
+        with open(temp_filename, "wb") as file:
+            file.write(data)
+        os.replace(temp_filename, filename)
+
+    return sha256, filename
+
+
+def find_stored_image(sha256):
+    """Returns filename of an image stored by store_image_bytes, or None."""
+
+    for extension in image_media_types:
+        filename = os.path.join(stored_images_dir(), f"{sha256}.{extension}")
+        if os.path.isfile(filename):
+            return filename
+
+    return None
+
+
 def decode_base64_to_image(encoding):
+    if re_image_hash.match(encoding):
+        # an image returned earlier with response_format "hash", or uploaded to /sdapi/v1/images
+        filename = find_stored_image(encoding)
+        if filename is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+
+        return images.read(filename)
+
     if encoding.startswith("http://") or encoding.startswith("https://"):
         if not opts.api_enable_requests:
             raise HTTPException(status_code=500, detail="Requests not allowed")
@@ -99,10 +156,10 @@ def decode_base64_to_image(encoding):
         raise HTTPException(status_code=500, detail="Invalid encoded image") from e
 
 
-def encode_pil_to_base64(image):
+def encode_pil_to_bytes(image):
+    """Encodes image in opts.samples_format, keeping its generation parameters; returns (bytes, file extension)."""
+
     with io.BytesIO() as output_bytes:
-        if isinstance(image, str):
-            return image
         if opts.samples_format.lower() == 'png':
             use_metadata = False
             metadata = PngImagePlugin.PngInfo()
@@ -110,7 +167,7 @@ def encode_pil_to_base64(image):
                 if isinstance(key, str) and isinstance(value, str):
                     metadata.add_text(key, value)
                     use_metadata = True
-            image.save(output_bytes, format="PNG", pnginfo=(metadata if use_metadata else None), quality=opts.jpeg_quality)
+            image.save(output_bytes, format="PNG", pnginfo=(metadata if use_metadata else None), quality=opts.jpeg_quality, **images.png_save_kwargs())
 
         elif opts.samples_format.lower() in ("jpg", "jpeg", "webp"):
             if image.mode in ("RGBA", "P"):
@@ -129,7 +186,74 @@ def encode_pil_to_base64(image):
 
         bytes_data = output_bytes.getvalue()
 
-    return base64.b64encode(bytes_data)
+    return bytes_data, opts.samples_format.lower()
+
+
+def encode_pil_to_base64(image):
+    if isinstance(image, str):
+        return image
+
+    return base64.b64encode(encode_pil_to_bytes(image)[0])
+
+
+def encode_image_reference(image, response_format):
+    """Returns image as a string for JSON: base64 for response_format "base64", otherwise path or sha256 of the file written to the API images directory."""
+
+    if response_format == "base64":
+        return encode_pil_to_base64(image).decode()
+
+    sha256, filename = store_image_bytes(*encode_pil_to_bytes(image))
+    return filename if response_format == "path" else sha256
+
+
+def multipart_response(fields, encoded_images):
+    """multipart/mixed response: a JSON part with fields, followed by one part per image"""
+
+    boundary = uuid.uuid4().hex
+    parts = [(b"application/json", b"", json.dumps(jsonable_encoder(fields)).encode("utf8"))]
+    for i, (data, extension) in enumerate(encoded_images):
+        parts.append((image_media_types[extension].encode(), f'Content-Disposition: attachment; filename="{i}.{extension}"\r\n'.encode(), data))
+
+    body = bytearray()
+    for media_type, headers, data in parts:
+        body += b"--" + boundary.encode() + b"\r\nContent-Type: " + media_type + b"\r\n" + headers + b"\r\n" + data + b"\r\n"
+    body += b"--" + boundary.encode() + b"--\r\n"
+
+    return Response(content=bytes(body), media_type=f"multipart/mixed; boundary={boundary}")
+
+
+def images_response(response_model, response_format, pil_images, **fields):
+    """
+    Response of an endpoint that returns generated images, in one of the formats of the response_format request field:
+     - base64: response_model with images as base64 strings
+     - multipart: multipart/mixed with parameters and info as JSON, followed by the images
+     - image: bytes of the only image; generation parameters are in its PNG info/EXIF. Requests that would produce more
+       than one image (and so also a grid) are rejected by validate_response_format before generation
+     - path, hash: response_model with filenames or sha256 hashes of images written to the API images directory;
+       a hash can be used in place of base64 for input images, or fetched from /sdapi/v1/images/{hash}
+    """
+
+    if response_format not in ("multipart", "image"):
+        return response_model(images=[encode_image_reference(x, response_format) for x in pil_images], **fields)
+
+    encoded_images = [encode_pil_to_bytes(x) for x in pil_images]
+
+    if response_format == "multipart":
+        return multipart_response(fields, encoded_images)
+
+    if not encoded_images:
+        return Response(status_code=204)
+
+    if len(encoded_images) > 1:  # e.g. a script that adds images; the others would be lost silently
+        raise HTTPException(status_code=422, detail="response_format image can only return a single image; use multipart")
+
+    data, extension = encoded_images[0]
+    return Response(content=data, media_type=image_media_types[extension])
+
+
+def validate_response_format(req):
+    if req.response_format == "image" and req.send_images and (req.batch_size or 1) * (req.n_iter or 1) > 1:
+        raise HTTPException(status_code=422, detail="response_format image can only return a single image; use multipart for batch_size or n_iter above 1")
 
 
 def api_middleware(app: FastAPI):
@@ -164,6 +288,13 @@ def api_middleware(app: FastAPI):
             ))
         return res
 
+    @app.middleware("http")
+    async def job_client_and_priority(req: Request, call_next):
+        # used by the queue for jobs started by this request; clients can name themselves so that several of them behind one address take turns
+        job_queue.request_client.set(req.headers.get("X-Client-Id") or (req.client.host if req.client else None))
+        job_queue.request_priority.set(req.headers.get("X-Priority"))
+        return await call_next(req)
+
     def handle_exception(request: Request, e: Exception):
         err = {
             "error": type(e).__name__,
@@ -171,7 +302,7 @@ def api_middleware(app: FastAPI):
             "body": vars(e).get('body', ''),
             "errors": str(e),
         }
-        if not isinstance(e, HTTPException):  # do not print backtrace on known httpexceptions
+        if not isinstance(e, (HTTPException, job_queue.JobCancelled)):  # do not print backtrace on known httpexceptions
             message = f"API error: {request.method}: {request.url} {err}"
             if rich_available:
                 print(message)
@@ -209,12 +340,18 @@ class Api:
         self.queue_lock = queue_lock
         api_middleware(self.app)
         self.add_api_route("/sdapi/v1/txt2img", self.text2imgapi, methods=["POST"], response_model=models.TextToImageResponse)
+        self.add_api_route("/sdapi/v1/txt2img-stream", self.text2img_stream_api, methods=["POST"])
+        self.add_api_route("/sdapi/v1/txt2img-batch", self.text2img_batch_api, methods=["POST"], response_model=models.TextToImageBatchResponse)
         self.add_api_route("/sdapi/v1/img2img", self.img2imgapi, methods=["POST"], response_model=models.ImageToImageResponse)
         self.add_api_route("/sdapi/v1/extra-single-image", self.extras_single_image_api, methods=["POST"], response_model=models.ExtrasSingleImageResponse)
         self.add_api_route("/sdapi/v1/extra-batch-images", self.extras_batch_images_api, methods=["POST"], response_model=models.ExtrasBatchImagesResponse)
+        self.add_api_route("/sdapi/v1/images", self.upload_image_api, methods=["POST"], response_model=models.StoredImageResponse)
+        self.add_api_route("/sdapi/v1/images/{sha256}", self.get_image_api, methods=["GET"])
         self.add_api_route("/sdapi/v1/png-info", self.pnginfoapi, methods=["POST"], response_model=models.PNGInfoResponse)
         self.add_api_route("/sdapi/v1/progress", self.progressapi, methods=["GET"], response_model=models.ProgressResponse)
         self.add_api_route("/sdapi/v1/interrogate", self.interrogateapi, methods=["POST"])
+        self.add_api_route("/sdapi/v1/queue", self.get_queue, methods=["GET"], response_model=models.QueueResponse)
+        self.add_api_route("/sdapi/v1/queue/cancel", self.cancel_queued_job, methods=["POST"])
         self.add_api_route("/sdapi/v1/interrupt", self.interruptapi, methods=["POST"])
         self.add_api_route("/sdapi/v1/skip", self.skip, methods=["POST"])
         self.add_api_route("/sdapi/v1/options", self.get_config, methods=["GET"], response_model=models.OptionsModel)
@@ -234,6 +371,7 @@ class Api:
         self.add_api_route("/sdapi/v1/refresh-embeddings", self.refresh_embeddings, methods=["POST"])
         self.add_api_route("/sdapi/v1/refresh-checkpoints", self.refresh_checkpoints, methods=["POST"])
         self.add_api_route("/sdapi/v1/refresh-vae", self.refresh_vae, methods=["POST"])
+        self.add_api_route("/sdapi/v1/refresh-all", self.refresh_all, methods=["POST"])
         self.add_api_route("/sdapi/v1/create/embedding", self.create_embedding, methods=["POST"], response_model=models.CreateResponse)
         self.add_api_route("/sdapi/v1/create/hypernetwork", self.create_hypernetwork, methods=["POST"], response_model=models.CreateResponse)
         self.add_api_route("/sdapi/v1/train/embedding", self.train_embedding, methods=["POST"], response_model=models.TrainResponse)
@@ -241,6 +379,8 @@ class Api:
         self.add_api_route("/sdapi/v1/memory", self.get_memory, methods=["GET"], response_model=models.MemoryResponse)
         self.add_api_route("/sdapi/v1/unload-checkpoint", self.unloadapi, methods=["POST"])
         self.add_api_route("/sdapi/v1/reload-checkpoint", self.reloadapi, methods=["POST"])
+        self.add_api_route("/sdapi/v1/model-pool", self.get_model_pool, methods=["GET"], response_model=list[models.ModelPoolItem])
+        self.add_api_route("/sdapi/v1/model-pool/preload", self.preload_checkpoint, methods=["POST"], response_model=list[models.ModelPoolItem])
         self.add_api_route("/sdapi/v1/scripts", self.get_scripts_list, methods=["GET"], response_model=models.ScriptsList)
         self.add_api_route("/sdapi/v1/script-info", self.get_script_info, methods=["GET"], response_model=list[models.ScriptInfo])
         self.add_api_route("/sdapi/v1/extensions", self.get_extensions_list, methods=["GET"], response_model=list[models.ExtensionItem])
@@ -429,8 +569,8 @@ class Api:
 
         return params
 
-    def text2imgapi(self, txt2imgreq: models.StableDiffusionTxt2ImgProcessingAPI):
-        task_id = txt2imgreq.force_task_id or create_task_id("txt2img")
+    def prepare_txt2img(self, txt2imgreq: models.StableDiffusionTxt2ImgProcessingAPI):
+        """Resolves infotext, scripts and sampler of a txt2img request; returns (args for StableDiffusionProcessingTxt2Img, script_args, selectable_scripts)."""
 
         script_runner = scripts.scripts_txt2img
 
@@ -459,18 +599,25 @@ class Api:
 
         script_args = self.init_script_args(txt2imgreq, self.default_script_arg_txt2img, selectable_scripts, selectable_script_idx, script_runner, input_script_args=infotext_script_args)
 
-        send_images = args.pop('send_images', True)
+        args.pop('send_images', None)
         args.pop('save_images', None)
+        args.pop('response_format', None)
 
-        add_task_to_queue(task_id)
+        return args, script_args, selectable_scripts
 
-        with self.queue_lock:
+    def run_txt2img(self, task_id, args, script_args, selectable_scripts, setup=None):
+        """Generates images for a txt2img request prepared by prepare_txt2img; setup, if given, is called with the processing object before generation."""
+
+        with self.queue_lock.job(id_task=task_id):
             with closing(StableDiffusionProcessingTxt2Img(sd_model=shared.sd_model, **args)) as p:
                 p.is_api = True
-                p.scripts = script_runner
+                p.scripts = scripts.scripts_txt2img
                 p.outpath_grids = opts.outdir_txt2img_grids
                 p.outpath_samples = opts.outdir_txt2img_samples
 
+                if setup is not None:
+                    setup(p)
+
                 try:
                     shared.state.begin(job="scripts_txt2img")
                     start_task(task_id)
@@ -485,13 +632,227 @@ class Api:
                     shared.state.end()
                     shared.total_tqdm.clear()
 
-        b64images = list(map(encode_pil_to_base64, processed.images)) if send_images else []
+        return processed
+
+    def text2imgapi(self, txt2imgreq: models.StableDiffusionTxt2ImgProcessingAPI):
+        task_id = txt2imgreq.force_task_id or create_task_id("txt2img")
+
+        validate_response_format(txt2imgreq)
+
+        args, script_args, selectable_scripts = self.prepare_txt2img(txt2imgreq)
+
+        add_task_to_queue(task_id)
+
+        processed = self.run_txt2img(task_id, args, script_args, selectable_scripts)
+
+        return images_response(models.TextToImageResponse, txt2imgreq.response_format, processed.images if txt2imgreq.send_images else [], parameters=vars(txt2imgreq), info=processed.js())
+
+    def text2img_stream_api(self, txt2imgreq: models.StableDiffusionTxt2ImgProcessingAPI):
+        """
+        Server-sent events with each image as soon as it is finished, instead of all images at the end:
+         - "image" events: {"index", "image", "info"}, with image as base64, path or hash according to response_format
+         - a final "done" event: {"parameters", "info"}, or an "error" event: {"error"}
+
+        Images are not kept after they are sent, and grids are not made; if the client disconnects, generation is interrupted.
+        """
+
+        if txt2imgreq.response_format not in ("base64", "path", "hash"):
+            raise HTTPException(status_code=422, detail="response_format must be base64, path or hash for streaming")
+
+        task_id = txt2imgreq.force_task_id or create_task_id("txt2img")
+
+        args, script_args, selectable_scripts = self.prepare_txt2img(txt2imgreq)
+        args["do_not_save_grid"] = True
+
+        # a small queue: when the client reads slower than images are generated, generation waits instead of keeping images in memory
+        events = queue.Queue(maxsize=4)
+        disconnected = threading.Event()
+
+        def put(event):
+            while not disconnected.is_set():
+                try:
+                    events.put(event, timeout=1)
+                    return
+                except queue.Full:
+                    pass
+
+        def on_image(image, infotext):
+            if disconnected.is_set():
+                shared.state.interrupt()
+                return
+
+            put(("image", image, infotext))
+
+        def setup(p):
+            p.image_callback = on_image
+            p.keep_images = False
+
+        def generate():
+            try:
+                processed = self.run_txt2img(task_id, args, script_args, selectable_scripts, setup)
+                put(("done", processed.js()))
+            except Exception as e:
+                errors.report("Error generating txt2img stream", exc_info=True)
+                put(("error", str(e) or type(e).__name__))
+
+        add_task_to_queue(task_id)
+        # the copied context carries client and priority of the request to the queue
+        threading.Thread(target=contextvars.copy_context().run, args=(generate,), daemon=True, name="txt2img stream").start()
+
+        def stream():
+            index = 0
+            try:
+                while True:
+                    kind, *data = events.get()
+                    if kind == "image":
+                        image, infotext = data
+                        payload = {"index": index, "image": encode_image_reference(image, txt2imgreq.response_format), "info": infotext}
+                        index += 1
+                    elif kind == "done":
+                        payload = {"parameters": vars(txt2imgreq), "info": data[0]}
+                    else:
+                        payload = {"error": data[0]}
+
+                    yield f"event: {kind}\ndata: {json.dumps(jsonable_encoder(payload))}\n\n"
+
+                    if kind != "image":
+                        break
+            finally:
+                disconnected.set()
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    def text2img_batch_api(self, req: models.TextToImageBatchRequest):
+        txt2imgreq = req.parameters or models.StableDiffusionTxt2ImgProcessingAPI()
+        task_id = txt2imgreq.force_task_id or create_task_id("txt2img")
+
+        root = os.path.abspath(opts.outdir_txt2img_samples or opts.outdir_samples)
+        output_dir = os.path.abspath(os.path.join(root, req.output_dir))
+        if os.path.commonpath([root, output_dir]) != root:
+            raise HTTPException(status_code=400, detail="output_dir must be inside the txt2img output directory")
 
-        return models.TextToImageResponse(images=b64images, parameters=vars(txt2imgreq), info=processed.js())
+        filenames = [images.sanitize_filename_part(job.id) or str(i) for i, job in enumerate(req.jobs)]
+        if len(set(filenames)) != len(filenames):
+            raise HTTPException(status_code=422, detail="Job ids must be unique")
+
+        # infotext, script args and sampler are resolved once for the whole batch, not once per image
+        script_runner = scripts.scripts_txt2img
+
+        infotext_script_args = {}
+        self.apply_infotext(txt2imgreq, "txt2img", script_runner=script_runner, mentioned_script_args=infotext_script_args)
+
+        selectable_scripts, selectable_script_idx = self.get_selectable_script(txt2imgreq.script_name, script_runner)
+        sampler, scheduler = sd_samplers.get_sampler_and_scheduler(txt2imgreq.sampler_name or txt2imgreq.sampler_index, txt2imgreq.scheduler)
+
+        populate = txt2imgreq.copy(update={
+            "sampler_name": validate_sampler_name(sampler),
+            "do_not_save_samples": True,
+            "do_not_save_grid": True,
+        })
+        if populate.sampler_name:
+            populate.sampler_index = None
+
+        if not populate.scheduler and scheduler != "Automatic":
+            populate.scheduler = scheduler
+
+        args = vars(populate)
+        for key in ('script_name', 'script_args', 'alwayson_scripts', 'infotext', 'send_images', 'save_images', 'response_format'):
+            args.pop(key, None)
+
+        script_args = self.init_script_args(txt2imgreq, self.default_script_arg_txt2img, selectable_scripts, selectable_script_idx, script_runner, input_script_args=infotext_script_args)
+
+        per_pass = max(1, args.pop('batch_size', 1) or 1)
+        args.pop('n_iter', None)
+        negative_prompt = args.pop('negative_prompt', "") or ""
+        for key in ('prompt', 'seed'):
+            args.pop(key, None)
+
+        os.makedirs(output_dir, exist_ok=True)
+        manifest = [models.TextToImageBatchResult(id=job.id) for job in req.jobs]
+        started = time.perf_counter()
+
+        add_task_to_queue(task_id)
+
+        # a long job of many passes: batch priority unless asked otherwise, and other jobs can run between passes
+        with self.queue_lock.job(id_task=task_id, priority=job_queue.request_priority.get() or "batch"):
+            try:
+                shared.state.begin(job="scripts_txt2img_batch")
+                start_task(task_id)
+
+                for start in range(0, len(req.jobs), per_pass):
+                    if start > 0:
+                        call_queue.let_queued_jobs_run()
+
+                    if shared.state.interrupted:
+                        break
+
+                    jobs = req.jobs[start:start + per_pass]
+
+                    # A batch of heterogeneous prompts is a single pass; while the negative prompt stays the same,
+                    # the class-level conditioning cache of StableDiffusionProcessing keeps uc across passes
+                    pass_args = dict(
+                        args,
+                        prompt=[job.prompt for job in jobs],
+                        negative_prompt=[negative_prompt if job.negative_prompt is None else job.negative_prompt for job in jobs],
+                        seed=[get_fixed_seed(job.seed) for job in jobs],  # a list of seeds is used as-is, so -1 is resolved here
+                        batch_size=len(jobs),
+                        n_iter=1,
+                    )
+
+                    try:
+                        with closing(StableDiffusionProcessingTxt2Img(sd_model=shared.sd_model, **pass_args)) as p:
+                            p.is_api = True
+                            p.scripts = script_runner
+                            p.outpath_grids = opts.outdir_txt2img_grids
+                            p.outpath_samples = output_dir
+
+                            if selectable_scripts is not None:
+                                p.script_args = script_args
+                                processed = scripts.scripts_txt2img.run(p, *p.script_args)
+                            else:
+                                p.script_args = tuple(script_args)
+                                processed = process_images(p)
+                    except Exception as e:
+                        errors.report(f"Error generating txt2img batch jobs {start}-{start + len(jobs) - 1}", exc_info=True)
+                        for k in range(len(jobs)):
+                            manifest[start + k].error = str(e) or type(e).__name__
+                        continue
+
+                    offset = processed.index_of_first_image
+                    for k, job in enumerate(jobs):
+                        entry = manifest[start + k]
+                        image = processed.images[offset + k] if offset + k < len(processed.images) else None
+                        if image is None:
+                            entry.error = "No image was produced"
+                            continue
+
+                        infotext = processed.infotexts[offset + k] if offset + k < len(processed.infotexts) else ""
+                        entry.seed = processed.all_seeds[k] if k < len(processed.all_seeds) else job.seed
+                        entry.file = os.path.join(output_dir, f"{filenames[start + k]}.{opts.samples_format}")
+                        images.save_image_with_geninfo(image, infotext, entry.file)
+
+                        if req.sidecars:
+                            sidecar = {"id": job.id, "prompt": job.prompt, "seed": entry.seed, "infotext": infotext, "metadata": job.metadata}
+                            with open(os.path.splitext(entry.file)[0] + ".json", "w", encoding="utf8") as file:
+                                json.dump(sidecar, file, indent=2, ensure_ascii=False)
+
+                finish_task(task_id)
+            finally:
+                shared.state.end()
+                shared.total_tqdm.clear()
+
+        for entry in manifest:
+            if entry.file is None and entry.error is None:
+                entry.error = "Interrupted"
+
+        failed = sum(entry.file is None for entry in manifest)
+        return models.TextToImageBatchResponse(output_dir=output_dir, generated=len(manifest) - failed, failed=failed, time=time.perf_counter() - started, manifest=manifest)
 
     def img2imgapi(self, img2imgreq: models.StableDiffusionImg2ImgProcessingAPI):
         task_id = img2imgreq.force_task_id or create_task_id("img2img")
 
+        validate_response_format(img2imgreq)
+
         init_images = img2imgreq.init_images
         if init_images is None:
             raise HTTPException(status_code=404, detail="Init image not found")
@@ -531,10 +892,11 @@ class Api:
 
         send_images = args.pop('send_images', True)
         args.pop('save_images', None)
+        args.pop('response_format', None)
 
         add_task_to_queue(task_id)
 
-        with self.queue_lock:
+        with self.queue_lock.job(id_task=task_id):
             with closing(StableDiffusionProcessingImg2Img(sd_model=shared.sd_model, **args)) as p:
                 p.init_images = [decode_base64_to_image(x) for x in init_images]
                 p.is_api = True
@@ -556,13 +918,11 @@ class Api:
                     shared.state.end()
                     shared.total_tqdm.clear()
 
-        b64images = list(map(encode_pil_to_base64, processed.images)) if send_images else []
-
         if not img2imgreq.include_init_images:
             img2imgreq.init_images = None
             img2imgreq.mask = None
 
-        return models.ImageToImageResponse(images=b64images, parameters=vars(img2imgreq), info=processed.js())
+        return images_response(models.ImageToImageResponse, img2imgreq.response_format, processed.images if send_images else [], parameters=vars(img2imgreq), info=processed.js())
 
     def extras_single_image_api(self, req: models.ExtrasSingleImageRequest):
         reqDict = setUpscalers(req)
@@ -585,6 +945,29 @@ class Api:
 
         return models.ExtrasBatchImagesResponse(images=list(map(encode_pil_to_base64, result[0])), html_info=result[1])
 
+    async def upload_image_api(self, request: Request):
+        data = await request.body()
+
+        try:
+            with Image.open(BytesIO(data)) as image:
+                image.verify()
+                extension = (image.format or "").lower()
+        except Exception as e:
+            raise HTTPException(status_code=400, detail="Invalid image") from e
+
+        if extension not in image_media_types:
+            raise HTTPException(status_code=400, detail=f"Unsupported image format: {extension}")
+
+        sha256, filename = store_image_bytes(data, extension)
+        return models.StoredImageResponse(hash=sha256, path=filename)
+
+    def get_image_api(self, sha256: str):
+        filename = find_stored_image(sha256) if re_image_hash.match(sha256) else None
+        if filename is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+
+        return FileResponse(filename, media_type=image_media_types[os.path.splitext(filename)[1][1:]])
+
     def pnginfoapi(self, req: models.PNGInfoRequest):
         image = decode_base64_to_image(req.image.strip())
         if image is None:
@@ -646,6 +1029,17 @@ class Api:
 
         return models.InterrogateResponse(caption=processed)
 
+    def get_queue(self):
+        return models.QueueResponse(**self.queue_lock.stats())
+
+    def cancel_queued_job(self, req: models.QueueCancelRequest):
+        if not self.queue_lock.cancel(req.id_task):
+            raise HTTPException(status_code=404, detail="No queued job with this task id")
+
+        pending_tasks.pop(req.id_task, None)
+
+        return {}
+
     def interruptapi(self):
         shared.state.interrupt()
 
@@ -661,6 +1055,22 @@ class Api:
 
         return {}
 
+    def get_model_pool(self):
+        return sd_models_pool.status()
+
+    def preload_checkpoint(self, req: models.ModelPoolPreloadRequest):
+        checkpoint_info = sd_models.get_closet_checkpoint_match(req.sd_model_checkpoint)
+        if checkpoint_info is None:
+            raise HTTPException(status_code=404, detail=f"Checkpoint not found: {req.sd_model_checkpoint}")
+
+        with self.queue_lock:
+            try:
+                sd_models_pool.preload(checkpoint_info, to_device=req.to_device)
+            except RuntimeError as e:
+                raise HTTPException(status_code=409, detail=str(e)) from e
+
+        return sd_models_pool.status()
+
     def skip(self):
         shared.state.skip()
 
@@ -780,6 +1190,10 @@ class Api:
         with self.queue_lock:
             shared_items.refresh_vae_list()
 
+    def refresh_all(self):
+        with self.queue_lock:
+            shared_items.refresh_all()
+
     def create_embedding(self, args: dict):
         try:
             shared.state.begin(job="create_embedding")
@@ -881,7 +1295,9 @@ class Api:
                 cuda = {'error': 'unavailable'}
         except Exception as err:
             cuda = {'error': f'{err}'}
-        return models.MemoryResponse(ram=ram, cuda=cuda)
+        from modules import cond_cache, sd_hijack_clip
+        caches = {'conds': cond_cache.conds.info(), 'clip_chunks': sd_hijack_clip.chunk_cache.info()}
+        return models.MemoryResponse(ram=ram, cuda=cuda, caches=caches)
 
     def get_extensions_list(self):
         from modules import extensions
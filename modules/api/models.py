@@ -97,6 +97,9 @@ class PydanticModelGenerator:
         DynamicModel.__config__.allow_mutation = True
         return DynamicModel
 
+ResponseFormat = Literal["base64", "multipart", "image", "path", "hash"]
+"""how txt2img and img2img return images: base64 in JSON, binary multipart/mixed, the first image alone, or path or sha256 of a file written on the server"""
+
 StableDiffusionTxt2ImgProcessingAPI = PydanticModelGenerator(
     "StableDiffusionProcessingTxt2Img",
     StableDiffusionProcessingTxt2Img,
@@ -106,6 +109,7 @@ StableDiffusionTxt2ImgProcessingAPI = PydanticModelGenerator(
         {"key": "script_args", "type": list, "default": []},
         {"key": "send_images", "type": bool, "default": True},
         {"key": "save_images", "type": bool, "default": False},
+        {"key": "response_format", "type": ResponseFormat, "default": "base64"},
         {"key": "alwayson_scripts", "type": dict, "default": {}},
         {"key": "force_task_id", "type": str, "default": None},
         {"key": "infotext", "type": str, "default": None},
@@ -125,6 +129,7 @@ StableDiffusionImg2ImgProcessingAPI = PydanticModelGenerator(
         {"key": "script_args", "type": list, "default": []},
         {"key": "send_images", "type": bool, "default": True},
         {"key": "save_images", "type": bool, "default": False},
+        {"key": "response_format", "type": ResponseFormat, "default": "base64"},
         {"key": "alwayson_scripts", "type": dict, "default": {}},
         {"key": "force_task_id", "type": str, "default": None},
         {"key": "infotext", "type": str, "default": None},
@@ -132,15 +137,45 @@ StableDiffusionImg2ImgProcessingAPI = PydanticModelGenerator(
 ).generate_model()
 
 class TextToImageResponse(BaseModel):
-    images: list[str] = Field(default=None, title="Image", description="The generated image in base64 format.")
+    images: list[str] = Field(default=None, title="Image", description="The generated image in base64 format, or its path or hash, depending on response_format.")
     parameters: dict
     info: str
 
+class TextToImageBatchJob(BaseModel):
+    id: str = Field(title="Job ID", description="Identifier of the job, also used as the file name of its image.")
+    prompt: str = Field(title="Prompt", description="Prompt of this job.")
+    negative_prompt: Optional[str] = Field(default=None, title="Negative Prompt", description="Overrides the negative prompt of the batch for this job.")
+    seed: int = Field(default=-1, title="Seed", description="Seed of this job, -1 for random.")
+    metadata: dict = Field(default={}, title="Metadata", description="Written as-is into the sidecar JSON of this job.")
+
+class TextToImageBatchRequest(BaseModel):
+    parameters: StableDiffusionTxt2ImgProcessingAPI = Field(default=None, title="Parameters", description="txt2img parameters shared by every job; batch_size is the number of jobs generated per pass.")
+    jobs: list[TextToImageBatchJob] = Field(title="Jobs", description="Jobs to generate.")
+    output_dir: str = Field(default="", title="Output directory", description="Directory for the images and sidecars, relative to the txt2img output directory.")
+    sidecars: bool = Field(default=True, title="Sidecars", description="Write a JSON file with infotext, seed and metadata next to each image.")
+
+class TextToImageBatchResult(BaseModel):
+    id: str = Field(title="Job ID")
+    file: Optional[str] = Field(default=None, title="File", description="Path of the saved image.")
+    seed: Optional[int] = Field(default=None, title="Seed", description="Seed actually used.")
+    error: Optional[str] = Field(default=None, title="Error", description="Why the job produced no image.")
+
+class TextToImageBatchResponse(BaseModel):
+    output_dir: str = Field(title="Output directory")
+    generated: int = Field(title="Generated", description="Number of images saved.")
+    failed: int = Field(title="Failed", description="Number of jobs without an image.")
+    time: float = Field(title="Time", description="Seconds spent generating.")
+    manifest: list[TextToImageBatchResult] = Field(title="Manifest", description="One entry per job, in request order.")
+
 class ImageToImageResponse(BaseModel):
-    images: list[str] = Field(default=None, title="Image", description="The generated image in base64 format.")
+    images: list[str] = Field(default=None, title="Image", description="The generated image in base64 format, or its path or hash, depending on response_format.")
     parameters: dict
     info: str
 
+class StoredImageResponse(BaseModel):
+    hash: str = Field(title="Hash", description="sha256 of the image file; can be used in place of base64 for input images.")
+    path: str = Field(title="Path", description="Path of the image file on the server.")
+
 class ExtrasBaseRequest(BaseModel):
     resize_mode: Literal[0, 1] = Field(default=0, title="Resize Mode", description="Sets the resize mode: 0 to upscale by upscaling_resize amount, 1 to upscale up to upscaling_resize_h x upscaling_resize_w.")
     show_extras_results: bool = Field(default=True, title="Show results", description="Should the backend return the generated image?")
@@ -294,9 +329,41 @@ class EmbeddingsResponse(BaseModel):
     loaded: dict[str, EmbeddingItem] = Field(title="Loaded", description="Embeddings loaded for the current model")
     skipped: dict[str, EmbeddingItem] = Field(title="Skipped", description="Embeddings skipped for the current model (likely due to architecture incompatibility)")
 
+class ModelPoolItem(BaseModel):
+    title: str = Field(title="Title")
+    filename: str = Field(title="Filename")
+    active: bool = Field(title="Active", description="Whether this is the model in use.")
+    location: str = Field(title="Location", description="Where the weights are: device or cpu.")
+    pinned: bool = Field(title="Pinned", description="Whether the weights are in page-locked RAM.")
+    size_mb: float = Field(title="Size", description="Size of weights in MB.")
+
+class ModelPoolPreloadRequest(BaseModel):
+    sd_model_checkpoint: str = Field(title="Checkpoint", description="Title, name or hash of the checkpoint to preload.")
+    to_device: bool = Field(default=False, title="To device", description="Keep the preloaded model in VRAM rather than RAM.")
+
+class QueueJobItem(BaseModel):
+    id_task: Optional[str] = Field(title="Task ID")
+    priority: str = Field(title="Priority", description="Priority class: interactive, normal or batch.")
+    client: str = Field(title="Client", description="Client the job belongs to; jobs of different clients take turns.")
+    waiting: float = Field(title="Waiting", description="Seconds since the job was queued, or since it paused to let other jobs run.")
+    running: float = Field(title="Running", description="Seconds since the job first started.")
+
+class QueueResponse(BaseModel):
+    length: int = Field(title="Length", description="Number of jobs waiting to start or to continue.")
+    running: Optional[QueueJobItem] = Field(default=None, title="Running", description="Job that holds the GPU.")
+    waiting: list[QueueJobItem] = Field(title="Waiting", description="Waiting jobs, in the order in which they would start now.")
+    wait_times: dict = Field(title="Wait times", description="Count, mean and max of seconds waited by recently started jobs, per priority class.")
+    completed: int = Field(title="Completed", description="Number of jobs that finished.")
+    cancelled: int = Field(title="Cancelled", description="Number of jobs cancelled before they started.")
+    yields: int = Field(title="Yields", description="Number of times a long job paused between batches to let other jobs run.")
+
+class QueueCancelRequest(BaseModel):
+    id_task: str = Field(title="Task ID", description="Task of a job that has not started yet.")
+
 class MemoryResponse(BaseModel):
     ram: dict = Field(title="RAM", description="System memory stats")
     cuda: dict = Field(title="CUDA", description="nVidia CUDA memory stats")
+    caches: dict = Field(default={}, title="Caches", description="Size and hit rate of in-memory conditioning caches")
 
 
 class ScriptsList(BaseModel):
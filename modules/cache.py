@@ -1,7 +1,13 @@
+import ctypes
+import ctypes.util
+import errno
 import json
 import os
 import os.path
+import stat
+import struct
 import threading
+import time
 
 import diskcache
 import tqdm
@@ -102,7 +108,7 @@ def cached_data_for_file(subsection, title, filename, func):
     """
 
     existing_cache = cache(subsection)
-    ondisk_mtime = os.path.getmtime(filename)
+    ondisk_mtime = directory_index.stat(filename).st_mtime
 
     entry = existing_cache.get(title)
     if entry:
@@ -121,3 +127,257 @@ def cached_data_for_file(subsection, title, filename, func):
         dump_cache()
 
     return entry['value']
+
+
+class DirectoryListing:
+    def __init__(self, mtime_ns, dirs, files, scanned_at):
+        self.mtime_ns = mtime_ns
+        self.dirs = dirs
+        """names of subdirectories"""
+
+        self.files = files
+        """names of other entries mapped to their os.stat_result; None for broken symlinks"""
+
+        self.scanned_at = scanned_at
+        self.validated_at = scanned_at
+
+
+class InotifyWatcher:
+    """Marks directories as changed using Linux inotify, so that an unchanged directory does not need to be checked at all."""
+
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+
+    mask = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+    event_header = struct.Struct("iIII")
+
+    def __init__(self, on_change):
+        self.on_change = on_change
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+        self.watches = {}
+        self.paths = {}
+        self.lock = threading.Lock()
+
+        threading.Thread(target=self.read_events, daemon=True, name="inotify").start()
+
+    def is_watching(self, path):
+        return path in self.watches
+
+    def watch(self, path):
+        if path in self.watches:
+            return True
+
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.mask)
+        if wd < 0:
+            return False  # for example, when fs.inotify.max_user_watches is reached; the directory is then checked by mtime
+
+        with self.lock:
+            self.watches[path] = wd
+            self.paths.setdefault(wd, set()).add(path)
+
+        return True
+
+    def read_events(self):
+        while True:
+            data = os.read(self.fd, 64 * 1024)
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self.event_header.unpack_from(data, offset)
+                offset += self.event_header.size + length
+
+                if mask & self.IN_Q_OVERFLOW:
+                    self.on_change(None)
+                    continue
+
+                with self.lock:
+                    paths = self.paths.pop(wd, set()) if mask & self.IN_IGNORED else set(self.paths.get(wd, ()))
+                    if mask & self.IN_IGNORED:
+                        for path in paths:
+                            self.watches.pop(path, None)
+
+                for path in paths:
+                    self.on_change(path)
+
+
+class DirectoryIndex:
+    """
+    In-memory index of directory listings and file stats, shared by everything that lists model files.
+
+    A directory is listed again only when its mtime changes (adding, removing or renaming an entry changes it) or, with
+    watching enabled, only when inotify reports a change in it. A file overwritten in place without any change to its
+    directory is only noticed with watching enabled, or after invalidate().
+    """
+
+    racy_seconds = 2.0
+    """a listing made this soon after the directory's mtime is not trusted: a following change may keep the same mtime on filesystems with coarse timestamps"""
+
+    stat_max_age = 10.0
+    """stat() answers from a listing without checking its directory if the listing was validated this recently, so that listing files and then reading their stats does not check every directory twice"""
+
+    def __init__(self):
+        self.listings = {}
+        self.dirty = set()
+        self.watcher = None
+        self.watcher_failed = False
+        self.lock = threading.Lock()
+
+    def get_watcher(self):
+        from modules import shared
+
+        if not shared.opts.model_dirs_watch or self.watcher_failed:
+            return None
+
+        if self.watcher is None:
+            try:
+                self.watcher = InotifyWatcher(self.mark_changed)
+            except Exception as e:
+                self.watcher_failed = True
+                print(f"Watching model directories is not available: {e}")
+                return None
+
+        return self.watcher
+
+    def mark_changed(self, path):
+        with self.lock:
+            if path is None:
+                self.dirty.update(self.listings)
+            else:
+                self.dirty.add(path)
+
+    def is_watched(self, key):
+        return self.watcher is not None and self.watcher.is_watching(key) and key not in self.dirty
+
+    def listdir(self, path):
+        """Returns DirectoryListing for a directory, listing it again only if it changed; None if it is not a directory."""
+
+        key = os.path.normpath(path)
+        watcher = self.get_watcher()
+
+        with self.lock:
+            listing = self.listings.get(key)
+            if listing is not None and watcher is not None and self.is_watched(key):
+                listing.validated_at = time.time()
+                return listing
+
+            # inotify reported a change, possibly to a file in the directory, which does not change the directory's mtime
+            if key in self.dirty:
+                listing = None
+
+        try:
+            st = os.stat(key)
+        except OSError:
+            st = None
+
+        if st is None or not stat.S_ISDIR(st.st_mode):
+            with self.lock:
+                self.listings.pop(key, None)
+            return None
+
+        if listing is not None and listing.mtime_ns == st.st_mtime_ns and listing.scanned_at - st.st_mtime >= self.racy_seconds:
+            listing.validated_at = time.time()
+            return listing
+
+        if watcher is not None:
+            watcher.watch(key)
+
+        with self.lock:
+            self.dirty.discard(key)
+
+        scanned_at = time.time()
+        dirs = []
+        files = {}
+
+        try:
+            with os.scandir(key) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+
+                    if is_dir:
+                        dirs.append(entry.name)
+                        continue
+
+                    try:
+                        files[entry.name] = entry.stat()
+                    except OSError:
+                        files[entry.name] = None
+        except OSError:
+            with self.lock:
+                self.listings.pop(key, None)
+            return None
+
+        # st was taken before listing, so a change made during the listing makes the next check list the directory again
+        listing = DirectoryListing(st.st_mtime_ns, dirs, files, scanned_at)
+        with self.lock:
+            self.listings[key] = listing
+
+        return listing
+
+    def walk(self, top):
+        """
+        Same as os.walk(top, followlinks=True), using cached listings.
+
+        Yields (root, dirs, files) where files maps file names to their os.stat_result; yielded lists and dicts belong to
+        the index and must not be modified.
+        """
+
+        stack = [top]
+        while stack:
+            root = stack.pop()
+
+            listing = self.listdir(root)
+            if listing is None:
+                continue
+
+            yield root, listing.dirs, listing.files
+
+            stack.extend(os.path.join(root, name) for name in reversed(listing.dirs))
+
+    def stat(self, path):
+        """Same as os.stat(path), answered from the listing of the file's directory if it was validated recently."""
+
+        directory, name = os.path.split(os.path.normpath(path))
+
+        with self.lock:
+            listing = self.listings.get(directory)
+            is_fresh = listing is not None and name in listing.files and (self.is_watched(directory) or time.time() - listing.validated_at < self.stat_max_age)
+
+        if not is_fresh:
+            return os.stat(path)
+
+        st = listing.files[name]
+        if st is None:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+
+        return st
+
+    def invalidate(self, path=None):
+        """Forgets the listing of one directory, or of all directories if path is None."""
+
+        with self.lock:
+            if path is None:
+                self.listings.clear()
+            else:
+                self.listings.pop(os.path.normpath(path), None)
+
+
+directory_index = DirectoryIndex()
+"""directory listings shared by lists of checkpoints, VAEs, embeddings, hypernetworks, Lora networks and other models"""
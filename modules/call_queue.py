@@ -3,14 +3,14 @@ from functools import wraps
 import html
 import time
 
-from modules import shared, progress, errors, devices, fifo_lock, profiling
+from modules import shared, progress, errors, devices, job_queue, profiling
 
-queue_lock = fifo_lock.FIFOLock()
+queue_lock = job_queue.JobQueue()
 
 
 def wrap_queued_call(func):
     def f(*args, **kwargs):
-        with queue_lock:
+        with queue_lock.job(priority="interactive", client="ui"):
             res = func(*args, **kwargs)
 
         return res
@@ -18,6 +18,34 @@ def wrap_queued_call(func):
     return f
 
 
+def let_queued_jobs_run():
+    """
+    Called by long jobs at boundaries between whole jobs of their own (such as passes of txt2img-batch, each a separate
+    process_images call), where no per-job setup (overridden opts, tiling, unet, script hooks) is applied: if queued jobs
+    should go first (see JobQueue.should_yield), pauses the calling job until they finish.
+
+    Must not be called from inside process_images, since the job that runs in between would inherit that setup.
+
+    Returns True if other jobs ran.
+    """
+
+    if not shared.opts.queue_interleave_jobs or not queue_lock.should_yield():
+        return False
+
+    state = shared.state.snapshot()
+    id_task = progress.current_task
+    if id_task is not None:
+        progress.add_task_to_queue(id_task)
+
+    queue_lock.yield_to_waiting()
+
+    shared.state.restore(state)
+    if id_task is not None:
+        progress.start_task(id_task)
+
+    return True
+
+
 def wrap_gradio_gpu_call(func, extra_outputs=None):
     @wraps(func)
     def f(*args, **kwargs):
@@ -29,7 +57,7 @@ def wrap_gradio_gpu_call(func, extra_outputs=None):
         else:
             id_task = None
 
-        with queue_lock:
+        with queue_lock.job(id_task=id_task, priority="interactive", client="ui"):
             shared.state.begin(job=id_task)
             progress.start_task(id_task)
 
@@ -0,0 +1,126 @@
+import collections
+import threading
+
+import torch
+
+from modules import extra_networks, prompt_parser
+
+
+def hashable_params(value):
+    """Converts the result of StableDiffusionProcessing.cached_params into something that can be used as a dict key."""
+
+    if isinstance(value, prompt_parser.SdConditioning):
+        return tuple(value), value.is_negative_prompt, value.width, value.height
+    if isinstance(value, (list, tuple)):
+        return tuple(hashable_params(x) for x in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, hashable_params(v)) for k, v in value.items()))
+    if isinstance(value, extra_networks.ExtraNetworkParams):
+        return tuple(value.items)
+
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+
+    return value
+
+
+def tensors_size(value, seen=None):
+    """Total size in bytes of tensors referenced by a conditioning object; shared tensors are counted once."""
+
+    if seen is None:
+        seen = set()
+
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, torch.Tensor):
+        return value.nelement() * value.element_size()
+    if isinstance(value, dict):
+        return sum(tensors_size(x, seen) for x in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(tensors_size(x, seen) for x in value)
+    if hasattr(value, '__dict__'):
+        return sum(tensors_size(x, seen) for x in vars(value).values())
+
+    return 0
+
+
+class TensorCache:
+    """
+    LRU cache for tensors (or objects holding tensors) that lives across process_images calls.
+
+    The cache is bounded by the total size of stored tensors rather than by the number of entries;
+    keys must be hashable.
+    """
+
+    def __init__(self):
+        self.entries = collections.OrderedDict()
+        self.sizes = {}
+        self.total_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            res = self.entries.get(key)
+            if res is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return res
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def put(self, key, value, limit):
+        size = tensors_size(value)
+
+        with self.lock:
+            if key in self.entries:
+                self.total_size -= self.sizes.pop(key)
+                del self.entries[key]
+
+            if size > limit:
+                return
+
+            self.entries[key] = value
+            self.sizes[key] = size
+            self.total_size += size
+
+            while self.total_size > limit and self.entries:
+                old_key, _ = self.entries.popitem(last=False)
+                self.total_size -= self.sizes.pop(old_key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.total_size = 0
+
+    def info(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "size": self.total_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def conds_key(function, cached_params):
+    """Key for conds: cached_params already contains the checkpoint, so entries of different models never mix."""
+
+    return function, hashable_params(cached_params)
+
+
+conds = TensorCache()
+"""conds computed by StableDiffusionProcessing.get_conds_with_caching; a negative prompt shared by many jobs is only computed once per model"""
@@ -1,46 +1,105 @@
+import concurrent.futures
 import hashlib
 import os.path
+import queue
+import threading
 
-from modules import shared
+from modules import shared, errors
 import modules.cache
 
 dump_cache = modules.cache.dump_cache
 cache = modules.cache.cache
 
+blksize = 16 * 1024 * 1024
+"""size of reads when hashing; hashlib releases the GIL for large updates, so files hashed in different threads are processed in parallel"""
+
+in_progress = {}
+in_progress_lock = threading.Lock()
+
+background_queue = queue.Queue()
+background_threads = []
+background_lock = threading.Lock()
+
+
+def read_blocks(file):
+    """reads a file in large blocks into a single reusable buffer; each yielded block is only valid until the next one is read"""
+
+    buffer = bytearray(blksize)
+    view = memoryview(buffer)
+
+    while True:
+        size = file.readinto(buffer)
+        if not size:
+            break
+
+        yield view[:size]
+
 
 def calculate_sha256(filename):
     hash_sha256 = hashlib.sha256()
-    blksize = 1024 * 1024
 
-    with open(filename, "rb") as f:
-        for chunk in iter(lambda: f.read(blksize), b""):
+    with open(filename, "rb", buffering=0) as f:
+        for chunk in read_blocks(f):
             hash_sha256.update(chunk)
 
     return hash_sha256.hexdigest()
 
 
+def file_identity(filename):
+    """(size, mtime, inode) of a file; hashes stay valid as long as this does not change, even if the file is renamed"""
+
+    stat = os.stat(filename)
+    return stat.st_size, stat.st_mtime, stat.st_ino
+
+
+def identity_key(identity):
+    size, mtime, inode = identity
+    return f"file/{size}/{mtime}/{inode}"
+
+
 def sha256_from_cache(filename, title, use_addnet_hash=False):
     hashes = cache("hashes-addnet") if use_addnet_hash else cache("hashes")
     try:
-        ondisk_mtime = os.path.getmtime(filename)
+        stat = modules.cache.directory_index.stat(filename)
     except FileNotFoundError:
         return None
 
-    if title not in hashes:
-        return None
+    identity = stat.st_size, stat.st_mtime, stat.st_ino
 
-    cached_sha256 = hashes[title].get("sha256", None)
-    cached_mtime = hashes[title].get("mtime", 0)
+    size, ondisk_mtime, inode = identity
 
-    if ondisk_mtime > cached_mtime or cached_sha256 is None:
-        return None
+    entry = hashes.get(title)
+    if entry is not None and entry.get("sha256") is not None:
+        # entries written before size and inode were recorded are checked by mtime alone
+        unchanged = entry.get("size", size) == size and entry.get("inode", inode) == inode
+        if unchanged and ondisk_mtime <= entry.get("mtime", 0):
+            return entry["sha256"]
 
-    return cached_sha256
+    # same file under another title, or the file was moved
+    entry = hashes.get(identity_key(identity))
+    if entry is not None:
+        store_sha256(hashes, title, identity, entry["sha256"])
+        return entry["sha256"]
 
+    return None
+
+
+def store_sha256(hashes, title, identity, sha256_value):
+    size, mtime, inode = identity
+    entry = {
+        "mtime": mtime,
+        "size": size,
+        "inode": inode,
+        "sha256": sha256_value,
+    }
+
+    hashes[title] = entry
+    hashes[identity_key(identity)] = entry
+
+    dump_cache()
 
-def sha256(filename, title, use_addnet_hash=False):
-    hashes = cache("hashes-addnet") if use_addnet_hash else cache("hashes")
 
+def sha256(filename, title, use_addnet_hash=False):
     sha256_value = sha256_from_cache(filename, title, use_addnet_hash)
     if sha256_value is not None:
         return sha256_value
@@ -48,28 +107,114 @@ def sha256(filename, title, use_addnet_hash=False):
     if shared.cmd_opts.no_hashing:
         return None
 
-    print(f"Calculating sha256 for {filename}: ", end='')
+    key = (os.path.abspath(filename), use_addnet_hash)
+    with in_progress_lock:
+        future = in_progress.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = in_progress[key] = concurrent.futures.Future()
+
+    if not is_owner:
+        # another thread (possibly background hashing) is already reading this file
+        sha256_value = future.result()
+        if sha256_value is not None:
+            hashes = cache("hashes-addnet") if use_addnet_hash else cache("hashes")
+            store_sha256(hashes, title, file_identity(filename), sha256_value)
+
+        return sha256_value
+
+    try:
+        sha256_value = calculate_and_store(filename, title, use_addnet_hash)
+        future.set_result(sha256_value)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with in_progress_lock:
+            in_progress.pop(key, None)
+
+    return sha256_value
+
+
+def calculate_and_store(filename, title, use_addnet_hash):
+    hashes = cache("hashes-addnet") if use_addnet_hash else cache("hashes")
+
+    identity = file_identity(filename)
+
     if use_addnet_hash:
-        with open(filename, "rb") as file:
+        with open(filename, "rb", buffering=0) as file:
             sha256_value = addnet_hash_safetensors(file)
     else:
         sha256_value = calculate_sha256(filename)
-    print(f"{sha256_value}")
 
-    hashes[title] = {
-        "mtime": os.path.getmtime(filename),
-        "sha256": sha256_value,
-    }
+    print(f"Calculated sha256 for {filename}: {sha256_value}")
 
-    dump_cache()
+    # the file changed while it was read; do not remember a hash that may belong to neither version
+    if file_identity(filename) == identity:
+        store_sha256(hashes, title, identity, sha256_value)
 
     return sha256_value
 
 
+def sha256_many(items, threads=None):
+    """
+    Hashes many files concurrently, waiting for all of them.
+
+    items is a list of (filename, title, use_addnet_hash); returns a list of hashes in the same order, with None for files that could not be hashed.
+    """
+
+    def hash_item(item):
+        filename, title, use_addnet_hash = item
+        try:
+            return sha256(filename, title, use_addnet_hash)
+        except Exception as e:
+            errors.display(e, f"calculating sha256 for {filename}")
+            return None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads or shared.opts.hashing_threads, thread_name_prefix="hashing") as executor:
+        return list(executor.map(hash_item, items))
+
+
+def background_worker():
+    while True:
+        filename, title, use_addnet_hash = background_queue.get()
+
+        try:
+            sha256(filename, title, use_addnet_hash)
+        except Exception as e:
+            errors.display(e, f"calculating sha256 for {filename}")
+
+
+def prehash(items):
+    """
+    Queues files for hashing in background threads, so that they are already in cache when a generation needs their hash.
+
+    items is a list of (filename, title, use_addnet_hash); files with a cached hash are skipped.
+    """
+
+    if shared.cmd_opts.no_hashing:
+        return
+
+    count = 0
+    for filename, title, use_addnet_hash in items:
+        if sha256_from_cache(filename, title, use_addnet_hash) is None:
+            background_queue.put((filename, title, use_addnet_hash))
+            count += 1
+
+    if count == 0:
+        return
+
+    # workers are daemon threads so that an unfinished queue does not prevent the program from exiting
+    with background_lock:
+        while len(background_threads) < max(1, shared.opts.hashing_threads):
+            thread = threading.Thread(target=background_worker, daemon=True, name="background hashing")
+            thread.start()
+            background_threads.append(thread)
+
+
 def addnet_hash_safetensors(b):
     """kohya-ss hash for safetensors from https://github.com/kohya-ss/sd-scripts/blob/main/library/train_util.py"""
     hash_sha256 = hashlib.sha256()
-    blksize = 1024 * 1024
 
     b.seek(0)
     header = b.read(8)
@@ -77,8 +222,7 @@ def addnet_hash_safetensors(b):
 
     offset = n + 8
     b.seek(offset)
-    for chunk in iter(lambda: b.read(blksize), b""):
+    for chunk in read_blocks(b):
         hash_sha256.update(chunk)
 
     return hash_sha256.hexdigest()
-
@@ -1,5 +1,4 @@
 import datetime
-import glob
 import html
 import os
 import inspect
@@ -311,7 +310,7 @@ class Hypernetwork:
 
 def list_hypernetworks(path):
     res = {}
-    for filename in sorted(glob.iglob(os.path.join(path, '**/*.pt'), recursive=True), key=str.lower):
+    for filename in sorted(shared.walk_files(path, allowed_extensions=[".pt"]), key=str.lower):
         name = os.path.splitext(os.path.basename(filename))[0]
         # Prevent a hypothetical "None.pt" from being listed.
         if name != "None":
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import collections
+import concurrent.futures
 import datetime
 import functools
 import pytz
@@ -18,6 +20,7 @@ import pillow_avif # noqa: F401
 import string
 import json
 import hashlib
+import threading
 
 from modules import sd_samplers, shared, script_callbacks, errors
 from modules.paths_internal import roboto_ttf_file
@@ -551,7 +554,12 @@ def get_next_sequence_number(path, basename):
         basename = f"{basename}-"
 
     prefix_length = len(basename)
-    for p in os.listdir(path):
+
+    # images that are still being saved in background are not in the directory yet
+    with save_lock:
+        pending = [os.path.basename(x) for x in pending_saves if os.path.dirname(x) == path]
+
+    for p in os.listdir(path) + pending:
         if p.startswith(basename):
             parts = os.path.splitext(p[prefix_length:])[0].split('-')  # splits the filename (removing the basename first if one is defined, so the sequence number is always the first element)
             try:
@@ -562,6 +570,20 @@ def get_next_sequence_number(path, basename):
     return result + 1
 
 
+png_compression_levels = {
+    "Fast": 1,
+    "Balanced": 6,
+    "Max": 9,
+}
+"""zlib compression levels for opts.png_compression; 6 is PIL's default"""
+
+
+def png_save_kwargs():
+    """Returns arguments for PIL's Image.save for PNG images according to opts.png_compression."""
+
+    return {"compress_level": png_compression_levels.get(opts.png_compression, 6)}
+
+
 def save_image_with_geninfo(image, geninfo, filename, extension=None, existing_pnginfo=None, pnginfo_section_name='parameters'):
     """
     Saves image to filename, including geninfo as text information for generation info.
@@ -586,7 +608,7 @@ def save_image_with_geninfo(image, geninfo, filename, extension=None, existing_p
         else:
             pnginfo_data = None
 
-        image.save(filename, format=image_format, quality=opts.jpeg_quality, pnginfo=pnginfo_data)
+        image.save(filename, format=image_format, quality=opts.jpeg_quality, pnginfo=pnginfo_data, **png_save_kwargs())
 
     elif extension.lower() in (".jpg", ".jpeg", ".webp"):
         if image.mode == 'RGBA':
@@ -621,6 +643,147 @@ def save_image_with_geninfo(image, geninfo, filename, extension=None, existing_p
         image.save(filename, format=image_format, quality=opts.jpeg_quality)
 
 
+class ImageSaveTask:
+    def __init__(self, params, filename, previous):
+        self.params = params
+        self.filename = filename
+        self.previous = previous
+        """earlier task saving to the same filename, which must finish first"""
+
+        self.done = threading.Event()
+        self.failed = False
+        self.slot = None
+
+
+save_lock = threading.Lock()
+save_executor = None
+save_executor_threads = 0
+save_slots = None
+pending_saves = {}
+"""full filenames of images that are being saved in background, mapped to their ImageSaveTask"""
+
+saved_callbacks_queue = collections.deque()
+"""tasks in the order of save_image calls, waiting to run image_saved callbacks"""
+
+saved_callbacks_lock = threading.RLock()
+
+
+def is_pending_save(filename):
+    with save_lock:
+        return filename in pending_saves
+
+
+def get_save_executor():
+    """Returns executor for saving images in background and a semaphore limiting how many images can wait in it, or (None, None) if images are saved on the calling thread."""
+
+    global save_executor, save_executor_threads, save_slots
+
+    threads = max(0, int(opts.save_images_threads))
+
+    with save_lock:
+        if threads != save_executor_threads:
+            if save_executor is not None:
+                save_executor.shutdown(wait=False)  # already submitted images are still saved
+
+            save_executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads, thread_name_prefix="saving images") if threads > 0 else None
+            save_slots = threading.BoundedSemaphore(threads * 4) if threads > 0 else None
+            save_executor_threads = threads
+
+        return save_executor, save_slots
+
+
+def run_image_saved_callbacks():
+    """Runs image_saved callbacks for finished saves, in the order in which save_image was called."""
+
+    with saved_callbacks_lock:
+        while saved_callbacks_queue and saved_callbacks_queue[0].done.is_set():
+            task = saved_callbacks_queue.popleft()
+            if task.failed:
+                continue
+
+            try:
+                script_callbacks.image_saved_callback(task.params)
+            except Exception as e:
+                errors.display(e, f"image_saved callback for {task.filename}")
+
+
+def run_image_save(task, save, in_background):
+    try:
+        if task.previous is not None:
+            task.previous.done.wait()
+
+        save()
+    except Exception as e:
+        task.failed = True
+        if not in_background:
+            raise
+
+        errors.display(e, f"saving image {task.filename}")
+    finally:
+        with save_lock:
+            if pending_saves.get(task.filename) is task:
+                del pending_saves[task.filename]
+
+        task.done.set()
+
+        if task.slot is not None:
+            task.slot.release()
+
+        run_image_saved_callbacks()
+
+
+def submit_image_save(save, params, filename):
+    """Runs save() in background if opts.save_images_threads is above zero, otherwise right away; image_saved callback runs after it."""
+
+    executor, slots = get_save_executor()
+
+    with save_lock:
+        task = ImageSaveTask(params, filename, pending_saves.get(filename))
+        pending_saves[filename] = task
+
+    with saved_callbacks_lock:
+        saved_callbacks_queue.append(task)
+
+    if executor is None:
+        run_image_save(task, save, False)
+        return
+
+    # waits if too many images are already queued, so that unsaved images do not fill RAM when generating is faster than saving
+    slots.acquire()
+    task.slot = slots
+    executor.submit(run_image_save, task, save, True)
+
+
+def wait_for_saves(filenames=None):
+    """
+    Waits until images that are being saved in background are written to disk.
+
+    filenames is a list of full filenames as returned by save_image; if None, waits for all images.
+    """
+
+    with save_lock:
+        if filenames is None:
+            tasks = list(pending_saves.values())
+        else:
+            tasks = [pending_saves[x] for x in filenames if x in pending_saves]
+
+    for task in tasks:
+        task.done.wait()
+
+
+def reserve_filename(filename_without_extension, extension):
+    """returns filename to save an image to, with a number suffix if the file exists and the user chose not to replace files"""
+
+    filename = filename_without_extension + extension
+    if shared.opts.save_images_replace_action != "Replace":
+        n = 0
+        while os.path.exists(filename) or is_pending_save(filename):
+            n += 1
+            filename = f"{filename_without_extension}-{n}{extension}"
+
+    return filename
+
+
 def save_image(image, path, basename, seed=None, prompt=None, extension='png', info=None, short_filename=False, no_prompt=False, grid=False, pnginfo_section_name='parameters', p=None, existing_info=None, forced_filename=None, suffix="", save_to_dirs=None):
     """Save an image.
 
@@ -650,7 +813,8 @@ def save_image(image, path, basename, seed=None, prompt=None, extension='png', i
 
     Returns: (fullfn, txt_fullfn)
         fullfn (`str`):
-            The full path of the saved imaged.
+            The full path of the saved imaged. With opts.save_images_threads above zero, the file may still be being
+            written when this function returns; use wait_for_saves([fullfn]) before reading it.
         txt_fullfn (`str` or None):
             If a text file is saved for this image, this will be its full path. Otherwise None.
     """
@@ -691,7 +855,7 @@ def save_image(image, path, basename, seed=None, prompt=None, extension='png', i
             for i in range(500):
                 fn = f"{basecount + i:05}" if basename == '' else f"{basename}-{basecount + i:04}"
                 fullfn = os.path.join(path, f"{fn}{file_decoration}.{extension}")
-                if not os.path.exists(fullfn):
+                if not os.path.exists(fullfn) and not is_pending_save(fullfn):
                     break
         else:
             fullfn = os.path.join(path, f"{file_decoration}.{extension}")
@@ -709,60 +873,69 @@ def save_image(image, path, basename, seed=None, prompt=None, extension='png', i
     fullfn = params.filename
     info = params.pnginfo.get(pnginfo_section_name, None)
 
-    def _atomically_save_image(image_to_save, filename_without_extension, extension):
+    def _atomically_save_image(image_to_save, filename_without_extension, extension, filename=None):
         """
         save image with .tmp extension to avoid race condition when another process detects new image in the directory
         """
-        temp_file_path = f"{filename_without_extension}.tmp"
+        if filename is None:
+            filename = reserve_filename(filename_without_extension, extension)
+
+        temp_file_path = f"{os.path.splitext(filename)[0]}.tmp"
 
         save_image_with_geninfo(image_to_save, info, temp_file_path, extension, existing_pnginfo=params.pnginfo, pnginfo_section_name=pnginfo_section_name)
 
-        filename = filename_without_extension + extension
-        if shared.opts.save_images_replace_action != "Replace":
-            n = 0
-            while os.path.exists(filename):
-                n += 1
-                filename = f"{filename_without_extension}-{n}{extension}"
         os.replace(temp_file_path, filename)
 
     fullfn_without_extension, extension = os.path.splitext(params.filename)
     if hasattr(os, 'statvfs'):
         max_name_len = os.statvfs(path).f_namemax
         fullfn_without_extension = fullfn_without_extension[:max_name_len - max(4, len(extension))]
-        params.filename = fullfn_without_extension + extension
-        fullfn = params.filename
-    _atomically_save_image(image, fullfn_without_extension, extension)
 
-    image.already_saved_as = fullfn
+    # the filename is decided here rather than when the file is written, so that it can be returned before the image is saved
+    fullfn = reserve_filename(fullfn_without_extension, extension)
+    fullfn_without_extension = os.path.splitext(fullfn)[0]
+    params.filename = fullfn
 
-    oversize = image.width > opts.target_side_length or image.height > opts.target_side_length
-    if opts.export_for_4chan and (oversize or os.stat(fullfn).st_size > opts.img_downscale_threshold * 1024 * 1024):
-        ratio = image.width / image.height
-        resize_to = None
-        if oversize and ratio > 1:
-            resize_to = round(opts.target_side_length), round(image.height * opts.target_side_length / image.width)
-        elif oversize:
-            resize_to = round(image.width * opts.target_side_length / image.height), round(opts.target_side_length)
-
-        if resize_to is not None:
-            try:
-                # Resizing image with LANCZOS could throw an exception if e.g. image mode is I;16
-                image = image.resize(resize_to, LANCZOS)
-            except Exception:
-                image = image.resize(resize_to)
-        try:
-            _atomically_save_image(image, fullfn_without_extension, ".jpg")
-        except Exception as e:
-            errors.display(e, "saving image as downscaled JPG")
+    image.already_saved_as = fullfn
 
     if opts.save_txt and info is not None:
         txt_fullfn = f"{fullfn_without_extension}.txt"
-        with open(txt_fullfn, "w", encoding="utf8") as file:
-            file.write(f"{info}\n")
     else:
         txt_fullfn = None
 
-    script_callbacks.image_saved_callback(params)
+    if opts.save_images_threads > 0:
+        image = image.copy()  # the caller may change the image after this function returns
+
+    def save():
+        _atomically_save_image(image, fullfn_without_extension, extension, fullfn)
+
+        oversize = image.width > opts.target_side_length or image.height > opts.target_side_length
+        if opts.export_for_4chan and (oversize or os.stat(fullfn).st_size > opts.img_downscale_threshold * 1024 * 1024):
+            ratio = image.width / image.height
+            resize_to = None
+            if oversize and ratio > 1:
+                resize_to = round(opts.target_side_length), round(image.height * opts.target_side_length / image.width)
+            elif oversize:
+                resize_to = round(image.width * opts.target_side_length / image.height), round(opts.target_side_length)
+
+            image_to_save = image
+            if resize_to is not None:
+                try:
+                    # Resizing image with LANCZOS could throw an exception if e.g. image mode is I;16
+                    image_to_save = image.resize(resize_to, LANCZOS)
+                except Exception:
+                    image_to_save = image.resize(resize_to)
+            try:
+                _atomically_save_image(image_to_save, fullfn_without_extension, ".jpg")
+            except Exception as e:
+                errors.display(e, "saving image as downscaled JPG")
+
+        if txt_fullfn is not None:
+            with open(txt_fullfn, "w", encoding="utf8") as file:
+                file.write(f"{info}\n")
+
+    # encoding and writing happen in background if enabled; image_saved callbacks run afterwards, in the same order as calls to this function
+    submit_image_save(save, params, fullfn)
 
     return fullfn, txt_fullfn
 
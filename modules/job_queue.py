@@ -0,0 +1,239 @@
+import collections
+import contextlib
+import contextvars
+import threading
+import time
+
+priorities = {
+    "interactive": 0,
+    "normal": 1,
+    "batch": 2,
+}
+"""priority classes of jobs, lower runs first: UI requests are interactive, API requests are normal unless they ask otherwise"""
+
+request_client = contextvars.ContextVar("request_client", default=None)
+"""client of the API request being handled, set by API middleware; jobs of different clients of the same priority take turns"""
+
+request_priority = contextvars.ContextVar("request_priority", default=None)
+"""priority class asked for by the API request being handled"""
+
+
+class JobCancelled(Exception):
+    def __init__(self, id_task):
+        super().__init__(f"Job {id_task} was cancelled before it started")
+        self.status_code = 409
+
+
+class Job:
+    def __init__(self, id_task, priority, client, seq):
+        self.id_task = id_task
+        self.priority = priority
+        self.client = client
+        self.seq = seq
+        self.thread = threading.get_ident()
+        self.enqueued_at = time.time()
+        self.started_at = None
+        self.granted = False
+        self.cancelled = False
+
+    def dict(self, now):
+        return {
+            "id_task": self.id_task,
+            "priority": self.priority,
+            "client": self.client,
+            "waiting": now - self.enqueued_at if not self.granted else 0.0,
+            "running": now - self.started_at if self.started_at is not None else 0.0,
+        }
+
+
+class JobQueue:
+    """
+    Lock shared by UI and API calls that use the GPU; waiting jobs get it by priority class, and jobs of the same class
+    take turns between clients.
+
+    Works as a drop-in replacement for a lock (with queue_lock: ...), taking priority and client of an API request from
+    request_priority and request_client; queue_lock.job(...) names them and the task explicitly. A running job can let
+    waiting jobs run between its steps with yield_to_waiting().
+    """
+
+    aging_seconds = 60.0
+    """a waiting job counts as one priority class higher for each this many seconds it waits, so that batch jobs are not starved"""
+
+    wait_history = 200
+    """number of most recent started jobs used for wait time statistics"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.running = None
+        self.waiting = []
+        self.seq = 0
+        self.grants = 0
+        self.last_grant = {}
+        """client -> number of the grant its last job got"""
+
+        self.waits = collections.deque(maxlen=self.wait_history)
+        self.completed = 0
+        self.cancelled = 0
+        self.yields = 0
+
+    def rank(self, job, now):
+        aged = priorities[job.priority] - int((now - job.enqueued_at) / self.aging_seconds)
+        return aged, self.last_grant.get(job.client, -1), job.seq
+
+    def grant_next(self):
+        if self.running is not None or not self.waiting:
+            return
+
+        now = time.time()
+        job = min(self.waiting, key=lambda x: self.rank(x, now))
+        self.waiting.remove(job)
+
+        self.grants += 1
+        self.last_grant[job.client] = self.grants
+        self.waits.append((job.priority, now - job.enqueued_at))
+
+        if job.started_at is None:
+            job.started_at = now
+
+        job.granted = True
+        self.running = job
+        self.condition.notify_all()
+
+    def enqueue(self, id_task=None, priority=None, client=None):
+        priority = priority or request_priority.get()
+        if priority not in priorities:
+            priority = "normal"
+
+        with self.condition:
+            self.seq += 1
+            job = Job(id_task, priority, client or request_client.get() or "local", self.seq)
+            self.waiting.append(job)
+            self.grant_next()
+
+        return job
+
+    def wait(self, job):
+        with self.condition:
+            while not job.granted and not job.cancelled:
+                self.condition.wait()
+
+        if job.cancelled:
+            raise JobCancelled(job.id_task)
+
+    def acquire(self, blocking=True, id_task=None, priority=None, client=None):
+        if not blocking:
+            with self.condition:
+                if self.running is not None or self.waiting:
+                    return False
+
+        self.wait(self.enqueue(id_task, priority, client))
+        return True
+
+    def release(self):
+        with self.condition:
+            self.running = None
+            self.completed += 1
+            self.grant_next()
+
+    __enter__ = acquire
+
+    def __exit__(self, t, v, tb):
+        self.release()
+
+    @contextlib.contextmanager
+    def job(self, id_task=None, priority=None, client=None):
+        """Holds the lock for a job with the given task id, priority class and client."""
+
+        self.acquire(id_task=id_task, priority=priority, client=client)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def cancel(self, id_task):
+        """Removes a job that has not started yet from the queue; its caller gets JobCancelled. Returns False if there is no such job."""
+
+        with self.condition:
+            for job in self.waiting:
+                if job.id_task == id_task and job.started_at is None:
+                    self.waiting.remove(job)
+                    job.cancelled = True
+                    self.cancelled += 1
+                    self.condition.notify_all()
+                    return True
+
+        return False
+
+    def should_yield(self):
+        """True if the calling thread runs the current job, and a waiting job has higher priority or is of the same priority but from another client."""
+
+        with self.condition:
+            job = self.running
+            if job is None or job.thread != threading.get_ident():
+                return False
+
+            now = time.time()
+            priority = priorities[job.priority]
+            for x in self.waiting:
+                aged = self.rank(x, now)[0]
+                if aged < priority or aged == priority and x.client != job.client:
+                    return True
+
+        return False
+
+    def yield_to_waiting(self):
+        """Lets waiting jobs that should go first run, then waits until the lock is given back to the calling job."""
+
+        with self.condition:
+            job = self.running
+            if job is None or job.thread != threading.get_ident():
+                return
+
+            job.granted = False
+            job.enqueued_at = time.time()
+            self.waiting.append(job)
+            self.running = None
+            self.yields += 1
+            self.grant_next()
+
+        self.wait(job)
+
+    def position(self, id_task):
+        """1-based position of a waiting job in the order in which jobs would start now; None if it is not waiting."""
+
+        with self.condition:
+            now = time.time()
+            ordered = sorted(self.waiting, key=lambda x: self.rank(x, now))
+
+        for i, job in enumerate(ordered):
+            if job.id_task == id_task:
+                return i + 1
+
+        return None
+
+    def stats(self):
+        """Queue length, wait times and jobs in the queue, for monitoring."""
+
+        with self.condition:
+            now = time.time()
+            running = self.running.dict(now) if self.running is not None else None
+            waiting = [x.dict(now) for x in sorted(self.waiting, key=lambda x: self.rank(x, now))]
+            waits = list(self.waits)
+            counters = {"completed": self.completed, "cancelled": self.cancelled, "yields": self.yields}
+
+        wait_times = {}
+        for name in priorities:
+            values = [seconds for priority, seconds in waits if priority == name]
+            wait_times[name] = {
+                "count": len(values),
+                "mean": sum(values) / len(values) if values else 0.0,
+                "max": max(values, default=0.0),
+            }
+
+        return {
+            "length": len(waiting),
+            "running": running,
+            "waiting": waiting,
+            "wait_times": wait_times,
+            **counters,
+        }
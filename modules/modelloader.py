@@ -9,6 +9,7 @@ from urllib.parse import urlparse
 import torch
 
 from modules import shared
+from modules.cache import directory_index
 from modules.upscaler import Upscaler, UpscalerLanczos, UpscalerNearest, UpscalerNone
 
 if TYPE_CHECKING:
@@ -70,7 +71,9 @@ def load_models(model_path: str, model_url: str = None, command_path: str = None
 
         for place in places:
             for full_path in shared.walk_files(place, allowed_extensions=ext_filter):
-                if os.path.islink(full_path) and not os.path.exists(full_path):
+                try:
+                    directory_index.stat(full_path)
+                except FileNotFoundError:
                     print(f"Skipping broken symlink: {full_path}")
                     continue
                 if ext_blacklist is not None and any(full_path.endswith(x) for x in ext_blacklist):
@@ -98,6 +98,7 @@ def run_postprocessing(extras_mode, image, image_folder, input_dir, output_dir,
                 fullfn, _ = images.save_image(pp.image, path=outpath, basename=basename, extension=opts.samples_format, info=infotext, short_filename=True, no_prompt=True, grid=False, pnginfo_section_name="extras", existing_info=existing_pnginfo, forced_filename=forced_filename, suffix=suffix)
 
                 if pp.caption:
+                    images.wait_for_saves([fullfn])  # .txt file written by save_image with opts.save_txt
                     caption_filename = os.path.splitext(fullfn)[0] + ".txt"
                     existing_caption = ""
                     try:
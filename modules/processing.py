@@ -16,7 +16,7 @@ from skimage import exposure
 from typing import Any
 
 import modules.sd_hijack
-from modules import devices, prompt_parser, masking, sd_samplers, lowvram, infotext_utils, extra_networks, sd_vae_approx, scripts, sd_samplers_common, sd_unet, errors, rng, profiling
+from modules import devices, prompt_parser, masking, sd_samplers, lowvram, infotext_utils, extra_networks, sd_vae_approx, scripts, sd_samplers_common, sd_unet, errors, rng, profiling, cond_cache
 from modules.rng import slerp # noqa: F401
 from modules.sd_hijack import model_hijack
 from modules.sd_samplers_common import images_tensor_to_samples, decode_first_stage, approximation_indexes
@@ -225,6 +225,12 @@ class StableDiffusionProcessing:
 
     is_api: bool = field(default=False, init=False)
 
+    image_callback: Any = field(default=None, init=False)
+    """called as image_callback(image, infotext) for every finished image, as soon as it is ready"""
+
+    keep_images: bool = field(default=True, init=False)
+    """if False, finished images are only passed to image_callback and not kept in Processed.images, so that memory does not grow with the number of images"""
+
     def __post_init__(self):
         if self.sampler_index is not None:
             print("sampler_index argument for StableDiffusionProcessing does not do anything; use sampler_name", file=sys.stderr)
@@ -408,6 +414,7 @@ class StableDiffusionProcessing:
         if not opts.persistent_cond_cache:
             StableDiffusionProcessing.cached_c = [None, None]
             StableDiffusionProcessing.cached_uc = [None, None]
+            cond_cache.conds.clear()
 
     def get_token_merging_ratio(self, for_hr=False):
         if for_hr:
@@ -468,6 +475,9 @@ class StableDiffusionProcessing:
         computed result is stored.
 
         caches is a list with items described above.
+
+        Besides those single-entry caches, results are kept in the memory-bounded LRU cond_cache.conds,
+        so that alternating prompts (e.g. a shared negative prompt with varying batch sizes) are not recomputed.
         """
 
         if shared.opts.use_old_scheduling:
@@ -484,9 +494,17 @@ class StableDiffusionProcessing:
 
         cache = caches[0]
 
-        with devices.autocast():
-            cache[1] = function(shared.sd_model, required_prompts, steps, hires_steps, shared.opts.use_old_scheduling)
+        lru_limit = int(opts.cond_cache_size_mb * 1024 * 1024) if opts.persistent_cond_cache else 0
+        res = cond_cache.conds.get(cond_cache.conds_key(function, cached_params)) if lru_limit > 0 else None
+
+        if res is None:
+            with devices.autocast():
+                res = function(shared.sd_model, required_prompts, steps, hires_steps, shared.opts.use_old_scheduling)
+
+            if lru_limit > 0:
+                cond_cache.conds.put(cond_cache.conds_key(function, cached_params), res, lru_limit)
 
+        cache[1] = res
         cache[0] = cached_params
         return cache[1]
 
@@ -916,6 +934,14 @@ def process_images_inner(p: StableDiffusionProcessing) -> Processed:
 
     infotexts = []
     output_images = []
+
+    def add_output_image(image, text):
+        if p.image_callback is not None:
+            p.image_callback(image, text)
+
+        if p.keep_images:
+            output_images.append(image)
+
     with torch.no_grad(), p.sd_model.ema_scope():
         with devices.autocast():
             p.init(p.all_prompts, p.all_seeds, p.all_subseeds)
@@ -1088,7 +1114,7 @@ def process_images_inner(p: StableDiffusionProcessing) -> Processed:
                 infotexts.append(text)
                 if opts.enable_pnginfo:
                     image.info["parameters"] = text
-                output_images.append(image)
+                add_output_image(image, text)
 
                 if mask_for_overlay is not None:
                     if opts.return_mask or opts.save_mask:
@@ -1096,14 +1122,14 @@ def process_images_inner(p: StableDiffusionProcessing) -> Processed:
                         if save_samples and opts.save_mask:
                             images.save_image(image_mask, p.outpath_samples, "", p.seeds[i], p.prompts[i], opts.samples_format, info=infotext(i), p=p, suffix="-mask")
                         if opts.return_mask:
-                            output_images.append(image_mask)
+                            add_output_image(image_mask, text)
 
                     if opts.return_mask_composite or opts.save_mask_composite:
                         image_mask_composite = Image.composite(original_denoised_image.convert('RGBA').convert('RGBa'), Image.new('RGBa', image.size), images.resize_image(2, mask_for_overlay, image.width, image.height).convert('L')).convert('RGBA')
                         if save_samples and opts.save_mask_composite:
                             images.save_image(image_mask_composite, p.outpath_samples, "", p.seeds[i], p.prompts[i], opts.samples_format, info=infotext(i), p=p, suffix="-mask-composite")
                         if opts.return_mask_composite:
-                            output_images.append(image_mask_composite)
+                            add_output_image(image_mask_composite, text)
 
             del x_samples_ddim
 
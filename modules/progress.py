@@ -92,9 +92,14 @@ def progressapi(req: ProgressRequest):
     if not active:
         textinfo = "Waiting..."
         if queued:
-            sorted_queued = sorted(pending_tasks.keys(), key=lambda x: pending_tasks[x])
-            queue_index = sorted_queued.index(req.id_task)
-            textinfo = "In queue: {}/{}".format(queue_index + 1, len(sorted_queued))
+            from modules.call_queue import queue_lock
+
+            # position in the order in which the scheduler would start jobs now
+            position = queue_lock.position(req.id_task)
+            if position is None:
+                sorted_queued = sorted(pending_tasks.keys(), key=lambda x: pending_tasks[x])
+                position = sorted_queued.index(req.id_task) + 1
+            textinfo = "In queue: {}/{}".format(position, len(pending_tasks))
         return ProgressResponse(active=active, queued=queued, completed=completed, id_live_preview=-1, textinfo=textinfo)
 
     progress = 0
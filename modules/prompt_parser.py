@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import re
 from collections import namedtuple
+from functools import lru_cache
 import lark
 
 # a prompt like this: "fantasy landscape with a [mountain:lake:0.25] and [an oak:a christmas tree:0.75][ in foreground::0.6][: in background:0.25] [shoddy:masterful:0.5]"
@@ -63,6 +64,23 @@ def get_learned_conditioning_prompt_schedules(prompts, base_steps, hires_steps=N
     [[5, 'a  c'], [10, 'a b c']]
     """
 
+    steps = base_steps if hires_steps is None or use_old_scheduling else hires_steps
+
+    promptdict = {}
+    for prompt in set(prompts):
+        if '[' not in prompt:
+            # both scheduled and alternate syntax start with [, so Lark has nothing to find in this prompt
+            promptdict[prompt] = [[steps, prompt]]
+        else:
+            promptdict[prompt] = [[t, text] for t, text in get_prompt_schedule(prompt, base_steps, hires_steps, use_old_scheduling)]
+
+    return [promptdict[prompt] for prompt in prompts]
+
+
+@lru_cache(maxsize=4096)
+def get_prompt_schedule(prompt, base_steps, hires_steps=None, use_old_scheduling=False):
+    """Returns schedule for a single prompt as a tuple of (step, text) pairs; memoized, so repeated prompts are only parsed once."""
+
     if hires_steps is None or use_old_scheduling:
         int_offset = 0
         flt_offset = 0
@@ -126,11 +144,10 @@ def get_learned_conditioning_prompt_schedules(prompts, base_steps, hires_steps=N
             if 0:
                 import traceback
                 traceback.print_exc()
-            return [[steps, prompt]]
-        return [[t, at_step(t, tree)] for t in collect_steps(steps, tree)]
+            return ((steps, prompt),)
+        return tuple((t, at_step(t, tree)) for t in collect_steps(steps, tree))
 
-    promptdict = {prompt: get_schedule(prompt) for prompt in set(prompts)}
-    return [promptdict[prompt] for prompt in prompts]
+    return get_schedule(prompt)
 
 
 ScheduledPromptConditioning = namedtuple("ScheduledPromptConditioning", ["end_at_step", "cond"])
@@ -403,6 +420,16 @@ def parse_prompt_attention(text):
      ['.', 1.1]]
     """
 
+    return [[text, weight] for text, weight in parse_prompt_attention_cached(text)]
+
+
+@lru_cache(maxsize=4096)
+def parse_prompt_attention_cached(text):
+    """Memoized parse_prompt_attention; returns a tuple of (text, weight) pairs that must not be modified."""
+
+    if not any(c in text for c in '()[]\\') and 'BREAK' not in text:
+        return ((text, 1.0),)
+
     res = []
     round_brackets = []
     square_brackets = []
@@ -455,7 +482,7 @@ def parse_prompt_attention(text):
         else:
             i += 1
 
-    return res
+    return tuple((text, weight) for text, weight in res)
 
 if __name__ == "__main__":
     import doctest
@@ -22,4 +22,7 @@ def restart_program() -> None:
 
 
 def stop_program() -> None:
+    from modules import images
+
+    images.wait_for_saves()  # images that are still being saved in background would be lost
     os._exit(0)
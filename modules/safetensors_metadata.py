@@ -0,0 +1,164 @@
+import collections.abc
+import concurrent.futures
+import json
+import threading
+
+from modules import cache
+from modules.cache import directory_index
+
+summary_value_max_length = 1024
+"""string values up to this length are kept in the summary; longer ones (cover images, tag frequencies, merge recipes) are only read when used"""
+
+threads = 8
+"""threads used by prefetch() to parse headers of files that are not in cache"""
+
+summaries = {}
+summaries_lock = threading.Lock()
+
+
+def file_key(filename):
+    """Key for cached metadata: (size, mtime, inode) of the file, so that a renamed file keeps its entry and a changed one gets a new one."""
+
+    stat = directory_index.stat(filename)
+    return f"{stat.st_size}/{stat.st_mtime}/{stat.st_ino}"
+
+
+def is_small(value):
+    if isinstance(value, str):
+        return len(value) <= summary_value_max_length
+
+    return value is None or isinstance(value, (bool, int, float))
+
+
+def has_cover_images(metadata):
+    """True if the metadata has a non-empty ssmd_cover_images list; kept in the summary so that cards do not need the large value itself."""
+
+    try:
+        return any(json.loads(metadata.get('ssmd_cover_images', '[]')))
+    except (TypeError, ValueError):
+        return False
+
+
+def read_full(filename, key):
+    from modules import sd_models
+
+    metadata = sd_models.read_metadata_from_safetensors(filename)
+    cache.cache('safetensors-metadata')[key] = metadata
+
+    return metadata
+
+
+def read_summary(filename, key):
+    """Returns names of all metadata fields of a file, and values of small ones; read from memory, from cache, or by parsing the header."""
+
+    with summaries_lock:
+        summary = summaries.get(key)
+
+    if summary is not None:
+        return summary
+
+    summaries_cache = cache.cache('safetensors-metadata-summary')
+    summary = summaries_cache.get(key)
+    if summary is None or "has_cover_images" not in summary:  # summaries cached before the flag existed are made again
+        metadata = read_full(filename, key)
+        summary = {
+            "keys": list(metadata),
+            "values": {k: v for k, v in metadata.items() if is_small(v)},
+            "has_cover_images": has_cover_images(metadata),
+        }
+        summaries_cache[key] = summary
+
+    with summaries_lock:
+        summaries[key] = summary
+
+    return summary
+
+
+class SafetensorsMetadata(collections.abc.Mapping):
+    """
+    Read-only dict of the metadata of a .safetensors file.
+
+    Names of fields and small values come from the summary; the complete metadata is loaded, from cache or from the file,
+    only when a large value is accessed.
+    """
+
+    def __init__(self, filename, key, summary, exclude=(), order=None):
+        names = [x for x in summary["keys"] if x not in exclude]
+        if order is not None:
+            names.sort(key=lambda x: order.get(x, 999))
+
+        self.filename = filename
+        self.key = key
+        self.names = names
+        self.names_set = set(names)
+        self.values = summary["values"]
+        self.has_cover_images = summary["has_cover_images"]
+        self.full = None
+
+    def __getitem__(self, name):
+        if name not in self.names_set:
+            raise KeyError(name)
+
+        if name in self.values:
+            return self.values[name]
+
+        return self.load()[name]
+
+    def __contains__(self, name):
+        return name in self.names_set
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def load(self):
+        if self.full is None:
+            full = cache.cache('safetensors-metadata').get(self.key)
+            if full is None:
+                full = read_full(self.filename, self.key)
+
+            self.full = full
+
+        return self.full
+
+
+def read(filename, exclude=(), order=None):
+    """
+    Returns metadata of a .safetensors file as SafetensorsMetadata.
+
+    exclude is a collection of fields to leave out; order maps field names to sort keys for the order of fields, 999 for unlisted ones.
+    """
+
+    key = file_key(filename)
+    return SafetensorsMetadata(filename, key, read_summary(filename, key), exclude=exclude, order=order)
+
+
+def prefetch(filenames):
+    """Reads summaries for many files, parsing headers of files that are not in cache in parallel threads."""
+
+    missing = []
+    for filename in filenames:
+        if not filename.lower().endswith(".safetensors"):
+            continue
+
+        try:
+            key = file_key(filename)
+        except OSError:
+            continue
+
+        if key not in summaries:
+            missing.append((filename, key))
+
+    def read_one(item):
+        try:
+            read_summary(*item)
+        except Exception:
+            pass  # reported when the metadata of this file is read by read()
+
+    if not missing:
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads, thread_name_prefix="safetensors metadata") as executor:
+        list(executor.map(read_one, missing))
@@ -216,7 +216,11 @@ class LoadStateDictOnMeta(ReplaceHelper):
             """
 
             if state_dict is sd:
-                state_dict = {k: v.to(device="meta", dtype=v.dtype) for k, v in state_dict.items()}
+                if hasattr(state_dict, 'meta_tensor'):
+                    # streaming state dict: get shapes without reading weights from the file
+                    state_dict = {k: state_dict.meta_tensor(k) for k in state_dict}
+                else:
+                    state_dict = {k: v.to(device="meta", dtype=v.dtype) for k, v in state_dict.items()}
 
             original(module, state_dict, strict=strict)
 
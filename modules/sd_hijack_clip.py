@@ -3,7 +3,7 @@ from collections import namedtuple
 
 import torch
 
-from modules import prompt_parser, devices, sd_hijack, sd_emphasis
+from modules import prompt_parser, devices, sd_hijack, sd_emphasis, cond_cache, shared
 from modules.shared import opts
 
 
@@ -26,6 +26,14 @@ PromptChunkFix = namedtuple('PromptChunkFix', ['offset', 'embedding'])
 chunk. Those objects are found in PromptChunk.fixes and, are placed into FrozenCLIPEmbedderWithCustomWordsBase.hijack.fixes, and finally
 are applied by sd_hijack.EmbeddingsWithFixes's forward function."""
 
+chunk_cache = cond_cache.TensorCache()
+"""Outputs of the text encoder for single prompt chunks, keyed by tokens, multipliers and everything else that changes the result.
+Long prompts that share boilerplate only send the chunks that differ through the text encoder."""
+
+chunk_cache_key_callbacks = []
+"""Functions returning a hashable value describing extra state that changes text encoder output, such as Loras applied
+to the text encoder. The value is made part of the key for chunk_cache."""
+
 
 class TextConditionalModel(torch.nn.Module):
     def __init__(self):
@@ -224,7 +232,11 @@ class TextConditionalModel(torch.nn.Module):
                 for _position, embedding in fixes:
                     used_embeddings[embedding.name] = embedding
             devices.torch_npu_set_device()
-            z = self.process_tokens(tokens, multipliers)
+
+            if opts.clip_chunk_cache_size_mb > 0 and not torch.is_grad_enabled():
+                z = self.process_chunks_with_cache(batch_chunk)
+            else:
+                z = self.process_tokens(tokens, multipliers)
             zs.append(z)
 
         if opts.textual_inversion_add_hashes_to_infotext and used_embeddings:
@@ -250,6 +262,64 @@ class TextConditionalModel(torch.nn.Module):
         else:
             return torch.hstack(zs)
 
+    def chunk_cache_key(self, chunk):
+        fixes = tuple((fix.offset, fix.embedding.name, fix.embedding.hash or id(fix.embedding.vec)) for fix in chunk.fixes)
+        checkpoint_info = getattr(shared.sd_model, 'sd_checkpoint_info', None)
+
+        return (
+            type(self).__name__,
+            getattr(checkpoint_info, 'filename', None),
+            getattr(shared.sd_model, 'sd_model_hash', None),
+            opts.CLIP_stop_at_last_layers,
+            opts.emphasis,
+            opts.fp8_storage,
+            opts.cache_fp16_weight,
+            tuple(callback() for callback in chunk_cache_key_callbacks),
+            tuple(chunk.tokens),
+            tuple(chunk.multipliers),
+            fixes,
+        )
+
+    def process_chunks_with_cache(self, batch_chunk):
+        """
+        Same as process_tokens() for a batch of PromptChunk objects, but only chunks that are not in chunk_cache are
+        sent to the text encoder; results for those are stored in the cache one chunk at a time.
+
+        Missing chunks are encoded one at a time, each as a batch of one: emphasis implementations such as "Original" restore
+        the mean of the whole batch, so a chunk encoded alongside others would get a value that depends on its neighbours.
+        """
+
+        limit = int(opts.clip_chunk_cache_size_mb * 1024 * 1024)
+        keys = [self.chunk_cache_key(chunk) for chunk in batch_chunk]
+        results = {}
+        missing = {}
+
+        for key, chunk in zip(keys, batch_chunk):
+            if key in results or key in missing:
+                continue
+
+            cached = chunk_cache.get(key)
+            if cached is None:
+                missing[key] = chunk
+            else:
+                results[key] = cached
+
+        if missing:
+            for key, chunk in missing.items():
+                self.hijack.fixes = [chunk.fixes]
+                z = self.process_tokens([chunk.tokens], [chunk.multipliers])
+                res = (z, getattr(z, 'pooled', None))
+                chunk_cache.put(key, res, limit)
+                results[key] = res
+
+            self.hijack.fixes = [x.fixes for x in batch_chunk]
+
+        z = torch.cat([results[key][0] for key in keys])
+        if results[keys[0]][1] is not None:
+            z.pooled = torch.cat([results[key][1] for key in keys])
+
+        return z
+
     def process_tokens(self, remade_batch_tokens, batch_multipliers):
         """
         sends one single prompt chunk to be encoded by transformers neural network.
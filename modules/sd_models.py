@@ -1,4 +1,5 @@
 import collections
+import collections.abc
 import importlib
 import os
 import sys
@@ -12,7 +13,7 @@ from omegaconf import OmegaConf, ListConfig
 from urllib import request
 import ldm.modules.midas as midas
 
-from modules import paths, shared, modelloader, devices, script_callbacks, sd_vae, sd_disable_initialization, errors, hashes, sd_models_config, sd_unet, sd_models_xl, cache, extra_networks, processing, lowvram, sd_hijack, patches
+from modules import paths, shared, modelloader, devices, script_callbacks, sd_vae, sd_disable_initialization, errors, hashes, sd_models_config, sd_unet, sd_models_xl, safetensors_metadata, extra_networks, processing, lowvram, sd_hijack, patches, sd_models_pool
 from modules.timer import Timer
 from modules.shared import opts
 import tomesd
@@ -71,16 +72,10 @@ class CheckpointInfo:
         if name.startswith("\\") or name.startswith("/"):
             name = name[1:]
 
-        def read_metadata():
-            metadata = read_metadata_from_safetensors(filename)
-            self.modelspec_thumbnail = metadata.pop('modelspec.thumbnail', None)
-
-            return metadata
-
         self.metadata = {}
         if self.is_safetensors:
             try:
-                self.metadata = cache.cached_data_for_file('safetensors-metadata', "checkpoint/" + name, filename, read_metadata)
+                self.metadata = safetensors_metadata.read(filename, exclude=('modelspec.thumbnail',))
             except Exception as e:
                 errors.display(e, f"reading metadata for {filename}")
 
@@ -172,10 +167,15 @@ def list_models():
     elif cmd_ckpt is not None and cmd_ckpt != shared.default_sd_model_file:
         print(f"Checkpoint in --ckpt argument not found (Possible it was moved to {model_path}: {cmd_ckpt}", file=sys.stderr)
 
+    safetensors_metadata.prefetch(model_list)
+
     for filename in model_list:
         checkpoint_info = CheckpointInfo(filename)
         checkpoint_info.register()
 
+    if shared.opts.hash_models_in_background:
+        hashes.prehash([(info.filename, f"checkpoint/{info.name}", False) for info in checkpoints_list.values() if info.sha256 is None])
+
 
 re_strip_checksum = re.compile(r"\s*\[[^]]+]\s*$")
 
@@ -281,6 +281,85 @@ def get_state_dict_from_checkpoint(pl_sd):
     return pl_sd
 
 
+safetensors_dtypes = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+    "F8_E4M3": getattr(torch, "float8_e4m3fn", None),
+    "F8_E5M2": getattr(torch, "float8_e5m2", None),
+}
+
+
+class SafetensorsStateDict(collections.abc.MutableMapping):
+    """
+    State dict of a .safetensors checkpoint that reads each tensor from the memory-mapped file only when it is accessed.
+    Keys are converted with checkpoint_dict_replacements like in get_state_dict_from_checkpoint.
+
+    Used together with sd_disable_initialization.LoadStateDictOnMeta, which pops weights one module at a time and
+    casts them to the target dtype, the full checkpoint is never in memory at once; weights that the model does
+    not use (such as EMA) are never read at all.
+    """
+
+    def __init__(self, filename, device):
+        self.filename = filename
+        self.file = safetensors.safe_open(filename, framework="pt", device=str(device))
+        self.overrides = {}
+
+        keys = list(self.file.keys())
+        turbo_key = 'conditioner.embedders.0.model.ln_final.weight'
+        is_sd2_turbo = turbo_key in keys and self.file.get_slice(turbo_key).get_shape()[0] == 1024
+        replacements = checkpoint_dict_replacements_sd2_turbo if is_sd2_turbo else checkpoint_dict_replacements_sd1
+
+        self.file_keys = {}
+        for k in keys:
+            new_key = transform_checkpoint_dict_key(k, replacements)
+            if new_key is not None:
+                self.file_keys[new_key] = k
+
+    def __getitem__(self, key):
+        if key in self.overrides:
+            return self.overrides[key]
+
+        return self.file.get_tensor(self.file_keys[key])
+
+    def __setitem__(self, key, value):
+        self.file_keys.pop(key, None)
+        self.overrides[key] = value
+
+    def __delitem__(self, key):
+        if key in self.overrides:
+            del self.overrides[key]
+        else:
+            del self.file_keys[key]
+
+    def __contains__(self, key):
+        return key in self.overrides or key in self.file_keys
+
+    def __iter__(self):
+        yield from list(self.file_keys)
+        yield from list(self.overrides)
+
+    def __len__(self):
+        return len(self.file_keys) + len(self.overrides)
+
+    def meta_tensor(self, key):
+        """Returns a tensor on meta device with shape and dtype of the weight, without reading it from the file."""
+
+        if key in self.overrides:
+            value = self.overrides[key]
+            return value.to(device="meta", dtype=value.dtype)
+
+        tensor_slice = self.file.get_slice(self.file_keys[key])
+        return torch.empty(tensor_slice.get_shape(), dtype=safetensors_dtypes[tensor_slice.get_dtype()], device="meta")
+
+
 def read_metadata_from_safetensors(filename):
     import json
 
@@ -341,6 +420,14 @@ def get_checkpoint_state_dict(checkpoint_info: CheckpointInfo, timer):
         return checkpoints_loaded[checkpoint_info]
 
     print(f"Loading weights [{sd_model_hash}] from {checkpoint_info.filename}")
+
+    # streaming only works when the state dict is not kept in the obsolete checkpoint cache, which copies it
+    _, extension = os.path.splitext(checkpoint_info.filename)
+    if extension.lower() == ".safetensors" and shared.opts.sd_checkpoint_streaming_load and not shared.opts.disable_mmap_load_safetensors and shared.opts.sd_checkpoint_cache == 0:
+        res = SafetensorsStateDict(checkpoint_info.filename, device=shared.weight_load_location or devices.get_optimal_device_name())
+        timer.record("open weights file")
+        return res
+
     res = read_state_dict(checkpoint_info.filename)
     timer.record("load weights from disk")
 
@@ -783,11 +870,22 @@ def get_obj_from_str(string, reload=False):
     return getattr(importlib.import_module(module, package=None), cls)
 
 
+def get_weight_dtype_conversion():
+    if shared.cmd_opts.no_half:
+        return None
+
+    return {
+        'first_stage_model': None,
+        'alphas_cumprod': None,
+        '': torch.float16,
+    }
+
+
 def load_model(checkpoint_info=None, already_loaded_state_dict=None):
     from modules import sd_hijack
     checkpoint_info = checkpoint_info or select_checkpoint()
 
-    timer = Timer()
+    timer = Timer(track_memory=True)
 
     if model_data.sd_model:
         send_model_to_trash(model_data.sd_model)
@@ -832,16 +930,7 @@ def load_model(checkpoint_info=None, already_loaded_state_dict=None):
 
     timer.record("create model")
 
-    if shared.cmd_opts.no_half:
-        weight_dtype_conversion = None
-    else:
-        weight_dtype_conversion = {
-            'first_stage_model': None,
-            'alphas_cumprod': None,
-            '': torch.float16,
-        }
-
-    with sd_disable_initialization.LoadStateDictOnMeta(state_dict, device=model_target_device(sd_model), weight_dtype_conversion=weight_dtype_conversion):
+    with sd_disable_initialization.LoadStateDictOnMeta(state_dict, device=model_target_device(sd_model), weight_dtype_conversion=get_weight_dtype_conversion()):
         load_model_weights(sd_model, checkpoint_info, state_dict, timer)
 
     timer.record("load weights from state dict")
@@ -856,6 +945,7 @@ def load_model(checkpoint_info=None, already_loaded_state_dict=None):
     sd_model.eval()
     model_data.set_sd_model(sd_model)
     model_data.was_loaded_at_least_once = True
+    sd_models_pool.enforce_limits(sd_model, timer)
 
     sd_hijack.model_hijack.embedding_db.load_textual_inversion_embeddings(force_reload=True)  # Reload embeddings after model load as they may or may not fit the model
 
@@ -870,6 +960,7 @@ def load_model(checkpoint_info=None, already_loaded_state_dict=None):
 
     timer.record("calculate empty prompt")
 
+    timer.stop_tracking_memory()
     print(f"Model loaded in {timer.summary()}.")
 
     return sd_model
@@ -888,7 +979,7 @@ def reuse_model_from_already_loaded(sd_model, checkpoint_info, timer):
         return sd_model
 
     if shared.opts.sd_checkpoints_keep_in_cpu:
-        send_model_to_cpu(sd_model)
+        sd_models_pool.park(sd_model)
         timer.record("send model to cpu")
 
     already_loaded = None
@@ -905,10 +996,11 @@ def reuse_model_from_already_loaded(sd_model, checkpoint_info, timer):
             timer.record("send model to trash")
 
     if already_loaded is not None:
-        send_model_to_device(already_loaded)
+        sd_models_pool.promote(already_loaded)
         timer.record("send model to device")
 
         model_data.set_sd_model(already_loaded, already_loaded=True)
+        sd_models_pool.enforce_limits(already_loaded, timer)
 
         if not SkipWritingToConfig.skip:
             shared.opts.data["sd_model_checkpoint"] = already_loaded.sd_checkpoint_info.title
@@ -940,7 +1032,7 @@ def reuse_model_from_already_loaded(sd_model, checkpoint_info, timer):
 def reload_model_weights(sd_model=None, info=None, forced_reload=False):
     checkpoint_info = info or select_checkpoint()
 
-    timer = Timer()
+    timer = Timer(track_memory=True)
 
     if not sd_model:
         sd_model = model_data.sd_model
@@ -978,7 +1070,12 @@ def reload_model_weights(sd_model=None, info=None, forced_reload=False):
         return model_data.sd_model
 
     try:
-        load_model_weights(sd_model, checkpoint_info, state_dict, timer)
+        if isinstance(state_dict, SafetensorsStateDict):
+            # reads weights module by module instead of letting torch's load_state_dict read all of them first
+            with sd_disable_initialization.LoadStateDictOnMeta(state_dict, device=model_target_device(sd_model), weight_dtype_conversion=get_weight_dtype_conversion()):
+                load_model_weights(sd_model, checkpoint_info, state_dict, timer)
+        else:
+            load_model_weights(sd_model, checkpoint_info, state_dict, timer)
     except Exception:
         print("Failed to load checkpoint, restoring previous")
         load_model_weights(sd_model, current_checkpoint_info, None, timer)
@@ -994,6 +1091,7 @@ def reload_model_weights(sd_model=None, info=None, forced_reload=False):
         script_callbacks.model_loaded_callback(sd_model)
         timer.record("script callbacks")
 
+    timer.stop_tracking_memory()
     print(f"Weights loaded in {timer.summary()}.")
 
     model_data.set_sd_model(sd_model)
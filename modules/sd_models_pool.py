@@ -0,0 +1,171 @@
+import itertools
+
+import torch
+
+from modules import devices, lowvram, shared
+
+
+def model_tensors(m):
+    return itertools.chain(m.parameters(), m.buffers())
+
+
+def model_size(m):
+    """Returns size in bytes of parameters and buffers of the model; the value is remembered in the model object."""
+
+    size = getattr(m, 'pool_size', None)
+    if size is None:
+        size = sum(t.nelement() * t.element_size() for t in model_tensors(m))
+        m.pool_size = size
+
+    return size
+
+
+def is_on_device(m):
+    """Returns True if the model's weights are on the compute device (models in lowvram mode are counted as being in RAM)."""
+
+    if getattr(m, 'lowvram', False):
+        return False
+
+    param = next(m.parameters(), None)
+    return param is not None and param.device.type not in ('cpu', 'meta')
+
+
+def is_pinned(m):
+    param = next(m.parameters(), None)
+    return param is not None and param.device.type == 'cpu' and param.is_pinned()
+
+
+def park(m):
+    """
+    Moves a model to RAM. With the sd_checkpoints_pin_memory setting, its weights are put into page-locked memory,
+    so that promote() can copy them back to the device asynchronously and faster.
+    """
+
+    if m is None:
+        return
+
+    if m.lowvram:
+        lowvram.send_everything_to_cpu()
+    else:
+        m.to(devices.cpu)
+
+        if shared.opts.sd_checkpoints_pin_memory and torch.cuda.is_available():
+            for t in model_tensors(m):
+                if not t.is_pinned():
+                    t.data = t.data.pin_memory()
+
+    devices.torch_gc()
+
+
+def promote(m):
+    """Moves a model to the compute device; copies from pinned memory do not block."""
+
+    lowvram.apply(m)
+
+    if not m.lowvram:
+        m.to(shared.device, non_blocking=is_pinned(m))
+
+
+def enforce_limits(active, timer=None):
+    """
+    Keeps models other than active within the memory budgets from settings, least recently used first:
+    models over sd_checkpoints_pool_vram_mb are moved to RAM, models over sd_checkpoints_pool_ram_mb are unloaded.
+    """
+
+    from modules import sd_models
+
+    loaded = sd_models.model_data.loaded_sd_models  # most recently used first
+    mb = 1024 * 1024
+
+    vram_limit = shared.opts.sd_checkpoints_pool_vram_mb * mb
+    if vram_limit > 0:
+        used = sum(model_size(m) for m in loaded if m is not active and is_on_device(m))
+        for m in reversed(loaded):
+            if used <= vram_limit:
+                break
+
+            if m is active or not is_on_device(m):
+                continue
+
+            print(f"Moving model {m.sd_checkpoint_info.title} to RAM: over the VRAM budget of {shared.opts.sd_checkpoints_pool_vram_mb} MB")
+            park(m)
+            used -= model_size(m)
+
+            if timer:
+                timer.record("send model to cpu")
+
+    ram_limit = shared.opts.sd_checkpoints_pool_ram_mb * mb
+    if ram_limit > 0:
+        used = sum(model_size(m) for m in loaded if m is not active and not is_on_device(m))
+        for m in list(reversed(loaded)):
+            if used <= ram_limit:
+                break
+
+            if m is active or is_on_device(m):
+                continue
+
+            print(f"Unloading model {m.sd_checkpoint_info.title}: over the RAM budget of {shared.opts.sd_checkpoints_pool_ram_mb} MB")
+            loaded.remove(m)
+            sd_models.send_model_to_trash(m)
+            used -= model_size(m)
+
+            if timer:
+                timer.record("send model to trash")
+
+
+def preload(checkpoint_info, to_device=False):
+    """
+    Loads a checkpoint into the pool of loaded models without switching to it, so that a later switch only has to
+    move it to device. The model in use stays the same. Requires sd_checkpoints_limit of at least 2.
+    """
+
+    from modules import sd_models
+
+    model_data = sd_models.model_data
+
+    for m in model_data.loaded_sd_models:
+        if m.sd_checkpoint_info.filename == checkpoint_info.filename:
+            if to_device and not is_on_device(m):
+                promote(m)
+                enforce_limits(model_data.sd_model)
+
+            return m
+
+    if shared.opts.sd_checkpoints_limit < 2:
+        raise RuntimeError("preloading a checkpoint requires 'Maximum number of checkpoints loaded at the same time' to be at least 2")
+
+    current = model_data.sd_model
+
+    with sd_models.SkipWritingToConfig():
+        m = sd_models.reload_model_weights(info=checkpoint_info)
+
+        if current is not None and current is not m:
+            sd_models.reload_model_weights(info=current.sd_checkpoint_info)
+
+    if m is not model_data.sd_model:
+        if to_device:
+            promote(m)
+        elif is_on_device(m):
+            park(m)
+
+    enforce_limits(model_data.sd_model)
+
+    return m
+
+
+def status():
+    """Returns a list of dicts describing loaded models, most recently used first."""
+
+    from modules import sd_models
+
+    return [
+        {
+            "title": m.sd_checkpoint_info.title,
+            "filename": m.sd_checkpoint_info.filename,
+            "active": m is sd_models.model_data.sd_model,
+            "location": "device" if is_on_device(m) else "cpu",
+            "pinned": is_pinned(m),
+            "size_mb": model_size(m) / 1024 / 1024,
+        }
+        for m in sd_models.model_data.loaded_sd_models
+    ]
@@ -4,7 +4,6 @@ from dataclasses import dataclass
 
 from modules import paths, shared, devices, script_callbacks, sd_models, extra_networks, lowvram, sd_hijack, hashes
 
-import glob
 from copy import deepcopy
 
 
@@ -72,32 +71,23 @@ def get_filename(filepath):
 def refresh_vae_list():
     vae_dict.clear()
 
+    vae_suffixes = ('.vae.ckpt', '.vae.pt', '.vae.safetensors')
+    any_suffixes = ('.ckpt', '.pt', '.safetensors')
+
     paths = [
-        os.path.join(sd_models.model_path, '**/*.vae.ckpt'),
-        os.path.join(sd_models.model_path, '**/*.vae.pt'),
-        os.path.join(sd_models.model_path, '**/*.vae.safetensors'),
-        os.path.join(vae_path, '**/*.ckpt'),
-        os.path.join(vae_path, '**/*.pt'),
-        os.path.join(vae_path, '**/*.safetensors'),
+        (sd_models.model_path, vae_suffixes),
+        (vae_path, any_suffixes),
     ]
 
-    if shared.cmd_opts.ckpt_dir is not None and os.path.isdir(shared.cmd_opts.ckpt_dir):
-        paths += [
-            os.path.join(shared.cmd_opts.ckpt_dir, '**/*.vae.ckpt'),
-            os.path.join(shared.cmd_opts.ckpt_dir, '**/*.vae.pt'),
-            os.path.join(shared.cmd_opts.ckpt_dir, '**/*.vae.safetensors'),
-        ]
+    if shared.cmd_opts.ckpt_dir is not None:
+        paths.append((shared.cmd_opts.ckpt_dir, vae_suffixes))
 
-    if shared.cmd_opts.vae_dir is not None and os.path.isdir(shared.cmd_opts.vae_dir):
-        paths += [
-            os.path.join(shared.cmd_opts.vae_dir, '**/*.ckpt'),
-            os.path.join(shared.cmd_opts.vae_dir, '**/*.pt'),
-            os.path.join(shared.cmd_opts.vae_dir, '**/*.safetensors'),
-        ]
+    if shared.cmd_opts.vae_dir is not None:
+        paths.append((shared.cmd_opts.vae_dir, any_suffixes))
 
     candidates = []
-    for path in paths:
-        candidates += glob.iglob(path, recursive=True)
+    for path, suffixes in paths:
+        candidates += [filepath for filepath in shared.walk_files(path, allowed_extensions=any_suffixes) if filepath.endswith(suffixes)]
 
     for filepath in candidates:
         name = get_filename(filepath)
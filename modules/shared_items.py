@@ -62,6 +62,25 @@ def refresh_checkpoints():
     return modules.sd_models.list_models()
 
 
+refresh_callbacks = []
+"""functions called by refresh_all(); extensions that list their own models add a function here"""
+
+
+def refresh_all():
+    """Refreshes lists of all model types. Only directories that changed since the previous refresh are listed again."""
+
+    import modules.sd_hijack
+
+    refresh_checkpoints()
+    refresh_vae_list()
+    refresh_unet_list()
+    reload_hypernetworks()
+    modules.sd_hijack.model_hijack.embedding_db.load_textual_inversion_embeddings()
+
+    for callback in refresh_callbacks:
+        callback()
+
+
 def list_samplers():
     import modules.sd_samplers
     return modules.sd_samplers.all_samplers
@@ -20,6 +20,7 @@ restricted_opts = {
     "outdir_txt2img_grids",
     "outdir_save",
     "outdir_init_images",
+    "outdir_api_images",
     "temp_dir",
     "clean_temp_dir_at_start",
 }
@@ -56,10 +57,12 @@ options_templates.update(options_section(('saving-images', "Saving images/grids"
     "save_mask_composite": OptionInfo(False, "For inpainting, save a masked composite"),
     "jpeg_quality": OptionInfo(80, "Quality for saved jpeg and avif images", gr.Slider, {"minimum": 1, "maximum": 100, "step": 1}),
     "webp_lossless": OptionInfo(False, "Use lossless compression for webp images"),
+    "png_compression": OptionInfo("Balanced", "PNG compression", gr.Radio, {"choices": ["Fast", "Balanced", "Max"]}).info("for saved images, grids and API responses; Fast = quickest to encode, largest files; Max = slowest, smallest files"),
     "export_for_4chan": OptionInfo(True, "Save copy of large images as JPG").info("if the file size is above the limit, or either width or height are above the limit"),
     "img_downscale_threshold": OptionInfo(4.0, "File size limit for the above option, MB", gr.Number),
     "target_side_length": OptionInfo(4000, "Width/height limit for the above option, in pixels", gr.Number),
     "img_max_size_mp": OptionInfo(200, "Maximum image size", gr.Number).info("in megapixels"),
+    "save_images_threads": OptionInfo(2, "Threads for saving images in background", gr.Slider, {"minimum": 0, "maximum": 8, "step": 1}).info("0 = save on the generation thread; otherwise compressing and writing images overlaps with generating the next ones"),
 
     "use_original_name_batch": OptionInfo(True, "Use original name for output filename during batch process in extras tab"),
     "use_upscaler_name_as_suffix": OptionInfo(False, "Use upscaler name as filename suffix in the extras tab"),
@@ -86,6 +89,7 @@ options_templates.update(options_section(('saving-paths', "Paths for saving", "s
     "outdir_img2img_grids": OptionInfo(util.truncate_path(os.path.join(default_output_dir, 'img2img-grids')), 'Output directory for img2img grids', component_args=hide_dirs),
     "outdir_save": OptionInfo(util.truncate_path(os.path.join(data_path, 'log', 'images')), "Directory for saving images using the Save button", component_args=hide_dirs),
     "outdir_init_images": OptionInfo(util.truncate_path(os.path.join(default_output_dir, 'init-images')), "Directory for saving init images when using img2img", component_args=hide_dirs),
+    "outdir_api_images": OptionInfo(util.truncate_path(os.path.join(default_output_dir, 'api-images')), "Directory for images returned by the API as a path or hash, and for images uploaded to the API", component_args=hide_dirs),
 }))
 
 options_templates.update(options_section(('saving-to-dirs', "Saving to a directory", "saving"), {
@@ -126,6 +130,11 @@ options_templates.update(options_section(('system', "System", "system"), {
     "print_hypernet_extra": OptionInfo(False, "Print extra hypernetwork information to console."),
     "list_hidden_files": OptionInfo(True, "Load models/files in hidden directories").info("directory is hidden if its name starts with \".\""),
     "disable_mmap_load_safetensors": OptionInfo(False, "Disable memmapping for loading .safetensors files.").info("fixes very slow loading speed in some cases"),
+    "sd_checkpoint_streaming_load": OptionInfo(True, "Stream .safetensors checkpoints into the model").info("reads weights from the memory-mapped file one layer at a time, casting dtype on the fly, instead of loading the whole file first; needs memmapping and 'Checkpoints to cache in RAM' set to 0"),
+    "model_dirs_watch": OptionInfo(False, "Watch model directories for changes").info("Linux only; uses inotify so that refreshing lists of models does not need to check directories that did not change"),
+    "hash_models_in_background": OptionInfo(False, "Calculate hashes of checkpoints and Lora networks in background").info("after the list of models is refreshed, hashes that are not in cache are calculated by background threads, so that generation does not wait for them"),
+    "hashing_threads": OptionInfo(4, "Threads used to calculate hashes", gr.Slider, {"minimum": 1, "maximum": 16, "step": 1}).info("more threads help on SSDs; use 1 for a spinning disk"),
+    "queue_interleave_jobs": OptionInfo(True, "Let queued jobs run between passes of long API batch jobs").info("txt2img-batch pauses between passes for queued jobs of higher priority, or of the same priority from another client"),
     "hide_ldm_prints": OptionInfo(True, "Prevent Stability-AI's ldm/sgm modules from printing noise to console."),
     "dump_stacks_on_signal": OptionInfo(False, "Print stack traces before exiting the program with ctrl+c."),
 }))
@@ -171,6 +180,9 @@ options_templates.update(options_section(('sd', "Stable Diffusion", "sd"), {
     "sd_model_checkpoint": OptionInfo(None, "Stable Diffusion checkpoint", gr.Dropdown, lambda: {"choices": shared_items.list_checkpoint_tiles(shared.opts.sd_checkpoint_dropdown_use_short)}, refresh=shared_items.refresh_checkpoints, infotext='Model hash'),
     "sd_checkpoints_limit": OptionInfo(1, "Maximum number of checkpoints loaded at the same time", gr.Slider, {"minimum": 1, "maximum": 10, "step": 1}),
     "sd_checkpoints_keep_in_cpu": OptionInfo(True, "Only keep one model on device").info("will keep models other than the currently used one in RAM rather than VRAM"),
+    "sd_checkpoints_pool_vram_mb": OptionInfo(0, "VRAM budget for checkpoints not in use (MB)", gr.Number, {"precision": 0}).info("with the setting above disabled, least recently used models are moved to RAM when they take more VRAM than this; 0=no limit"),
+    "sd_checkpoints_pool_ram_mb": OptionInfo(0, "RAM budget for checkpoints not in use (MB)", gr.Number, {"precision": 0}).info("least recently used models kept in RAM are unloaded when they take more than this; 0=no limit"),
+    "sd_checkpoints_pin_memory": OptionInfo(False, "Pin checkpoints kept in RAM").info("page-locked memory makes switching back to a model faster, but cannot be swapped out; CUDA only"),
     "sd_checkpoint_cache": OptionInfo(0, "Checkpoints to cache in RAM", gr.Slider, {"minimum": 0, "maximum": 10, "step": 1}).info("obsolete; set to 0 and use the two settings above instead"),
     "sd_unet": OptionInfo("Automatic", "SD Unet", gr.Dropdown, lambda: {"choices": shared_items.sd_unet_items()}, refresh=shared_items.refresh_unet_list).info("choose Unet model: Automatic = use one with same filename as checkpoint; None = use Unet from checkpoint"),
     "enable_quantization": OptionInfo(False, "Enable quantization in K samplers for sharper and cleaner results. This may change existing seeds").needs_reload_ui(),
@@ -239,6 +251,8 @@ options_templates.update(options_section(('optimizations', "Optimizations", "sd"
     "pad_cond_uncond": OptionInfo(False, "Pad prompt/negative prompt", infotext='Pad conds').info("improves performance when prompt and negative prompt have different lengths; changes seeds"),
     "pad_cond_uncond_v0": OptionInfo(False, "Pad prompt/negative prompt (v0)", infotext='Pad conds v0').info("alternative implementation for the above; used prior to 1.6.0 for DDIM sampler; overrides the above if set; WARNING: truncates negative prompt if it's too long; changes seeds"),
     "persistent_cond_cache": OptionInfo(True, "Persistent cond cache").info("do not recalculate conds from prompts if prompts have not changed since previous calculation"),
+    "cond_cache_size_mb": OptionInfo(128, "Cond cache size (MB)", gr.Number, {"precision": 0}).info("memory for conds of recently used prompts, kept across generations while persistent cond cache is enabled; 0=only remember the previous prompt"),
+    "clip_chunk_cache_size_mb": OptionInfo(64, "Text encoder chunk cache size (MB)", gr.Number, {"precision": 0}).info("memory for text encoder outputs of 75-token prompt chunks; only chunks not seen before are encoded; 0=disable"),
     "batch_cond_uncond": OptionInfo(True, "Batch cond/uncond").info("do both conditional and unconditional denoising in one batch; uses a bit more VRAM during sampling, but improves speed; previously this was controlled by --always-batch-cond-uncond commandline argument"),
     "fp8_storage": OptionInfo("Disable", "FP8 weight", gr.Radio, {"choices": ["Disable", "Enable for SDXL", "Enable"]}).info("Use FP8 to store Linear/Conv layers' weight. Require pytorch>=2.1.0."),
     "cache_fp16_weight": OptionInfo(False, "Cache FP16 weight for LoRA").info("Cache fp16 weight when enabling FP8, will increase the quality of LoRA. Use more system ram."),
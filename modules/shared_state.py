@@ -107,6 +107,15 @@ class State:
 
         return obj
 
+    def snapshot(self):
+        """progress of the current job, to be put back with restore() after another job ran in between its batches"""
+
+        return {k: getattr(self, k) for k in ("skipped", "interrupted", "stopping_generation", "job", "job_no", "job_count", "processing_has_refined_job_count", "job_timestamp", "sampling_step", "sampling_steps", "textinfo", "time_start")}
+
+    def restore(self, snapshot):
+        for k, v in snapshot.items():
+            setattr(self, k, v)
+
     def begin(self, job: str = "(unknown)"):
         self.sampling_step = 0
         self.time_start = time.time()
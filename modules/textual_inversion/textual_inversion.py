@@ -13,6 +13,7 @@ import numpy as np
 from PIL import Image, PngImagePlugin
 
 from modules import shared, devices, sd_hijack, sd_models, images, sd_samplers, sd_hijack_checkpoint, errors, hashes
+from modules.cache import directory_index
 import modules.textual_inversion.dataset
 from modules.textual_inversion.learn_schedule import LearnRateScheduler
 
@@ -193,15 +194,12 @@ class EmbeddingDatabase:
 
 
     def load_from_dir(self, embdir):
-        if not os.path.isdir(embdir.path):
-            return
-
-        for root, _, fns in os.walk(embdir.path, followlinks=True):
-            for fn in fns:
+        for root, _, fns in directory_index.walk(embdir.path):
+            for fn, stat in fns.items():
                 try:
                     fullfn = os.path.join(root, fn)
 
-                    if os.stat(fullfn).st_size == 0:
+                    if stat is None or stat.st_size == 0:
                         continue
 
                     self.load_from_file(fullfn, fn)
@@ -657,7 +655,7 @@ def train_embedding(id_task, embedding_name, learn_rate, batch_size, gradient_st
                         captioned_image = caption_image_overlay(image, title, footer_left, footer_mid, footer_right)
                         captioned_image = insert_image_data_embed(captioned_image, data)
 
-                        captioned_image.save(last_saved_image_chunks, "PNG", pnginfo=info)
+                        captioned_image.save(last_saved_image_chunks, "PNG", pnginfo=info, **images.png_save_kwargs())
                         embedding_yet_to_be_embedded = False
 
                     last_saved_image, last_text_info = images.save_image(image, images_dir, "", p.seed, p.prompt, shared.opts.samples_format, processed.infotexts[0], p=p, forced_filename=forced_filename, save_to_dirs=False)
@@ -1,5 +1,7 @@
 import time
 import argparse
+import threading
+import weakref
 
 
 class TimerSubcategory:
@@ -25,8 +27,26 @@ class TimerSubcategory:
         self.timer.record(self.category, disable_log=True)
 
 
+def track_memory_of(timer_ref, interval=0.02):
+    """Samples RSS of the process into the timer's memory_peak until the timer is stopped or garbage collected."""
+
+    import psutil
+
+    process = psutil.Process()
+
+    while True:
+        timer = timer_ref()
+        if timer is None or not timer.tracking_memory:
+            return
+
+        timer.memory_peak = max(timer.memory_peak, process.memory_info().rss)
+        del timer
+
+        time.sleep(interval)
+
+
 class Timer:
-    def __init__(self, print_log=False):
+    def __init__(self, print_log=False, track_memory=False):
         self.start = time.time()
         self.records = {}
         self.total = 0
@@ -34,6 +54,15 @@ class Timer:
         self.print_log = print_log
         self.subcategory_level = 0
 
+        self.memory_records = {}
+        """peak RSS of the process, in bytes, while each category was running; only filled with track_memory"""
+
+        self.memory_peak = 0
+        self.peak_rss = 0
+        self.tracking_memory = track_memory
+        if track_memory:
+            threading.Thread(target=track_memory_of, args=(weakref.ref(self),), daemon=True).start()
+
     def elapsed(self):
         end = time.time()
         res = end - self.start
@@ -53,9 +82,24 @@ class Timer:
 
         self.total += e + extra_time
 
+        if self.tracking_memory:
+            self.record_memory(self.base_category + category)
+
         if self.print_log and not disable_log:
             print(f"{'  ' * self.subcategory_level}{category}: done in {e + extra_time:.3f}s")
 
+    def record_memory(self, category):
+        import psutil
+
+        peak = max(self.memory_peak, psutil.Process().memory_info().rss)
+        self.memory_peak = 0
+
+        self.memory_records[category] = max(self.memory_records.get(category, 0), peak)
+        self.peak_rss = max(self.peak_rss, peak)
+
+    def stop_tracking_memory(self):
+        self.tracking_memory = False
+
     def subcategory(self, name):
         self.elapsed()
 
@@ -66,17 +110,23 @@ class Timer:
         res = f"{self.total:.1f}s"
 
         additions = [(category, time_taken) for category, time_taken in self.records.items() if time_taken >= 0.1 and '/' not in category]
-        if not additions:
-            return res
+        if additions:
+            res += " ("
+            res += ", ".join([f"{category}: {time_taken:.1f}s" for category, time_taken in additions])
+            res += ")"
 
-        res += " ("
-        res += ", ".join([f"{category}: {time_taken:.1f}s" for category, time_taken in additions])
-        res += ")"
+        if self.peak_rss:
+            res += f", peak RAM: {self.peak_rss / 1024 ** 3:.2f} GB"
 
         return res
 
     def dump(self):
-        return {'total': self.total, 'records': self.records}
+        res = {'total': self.total, 'records': self.records}
+        if self.peak_rss:
+            res['peak_rss'] = self.peak_rss
+            res['memory_records'] = self.memory_records
+
+        return res
 
     def reset(self):
         self.__init__()
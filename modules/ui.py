@@ -701,19 +701,16 @@ def create_ui():
                         print(f"Error actualizando dropdown de plantillas: {e}")
                         return gr.update(choices=[], value=None)
                 
-                def generar_caracteristicas_etnicas_diversas(nacionalidad, genero, edad, region="aleatorio"):
+                def generar_caracteristicas_etnicas_diversas(nacionalidad, genero, edad, region="aleatorio", rng=None):
                     """Genera características étnicas diversas para el método masivo básico."""
                     import random
-                    import time
                     
-                    # Agregar timestamp y múltiples factores para máxima aleatoriedad
-                    import hashlib
-                    unique_seed = int(time.time() * 1000000) + random.randint(1, 999999) + hash(f"{nacionalidad}{genero}{edad}{region}") % 1000000
-                    random.seed(unique_seed)
+                    # Generador propio: no altera el estado global de random (None = entropía del sistema)
+                    rng = rng or random.Random()
                     
                     # SIEMPRE usar región aleatoria para máxima diversidad
                     regiones_disponibles = ["caracas", "maracaibo", "valencia", "barquisimeto", "ciudad_guayana", "maturin", "merida", "san_cristobal", "barcelona", "puerto_la_cruz", "ciudad_bolivar", "tucupita", "porlamar", "valera", "acarigua", "guanare", "san_fernando", "trujillo", "el_tigre", "cabimas", "punto_fijo", "ciudad_ojeda", "puerto_cabello", "valle_de_la_pascua", "san_juan_de_los_morros", "carora", "tocuyo", "duaca", "siquisique", "araure", "turen", "guanarito", "santa_elena", "el_venado", "san_rafael", "san_antonio", "la_fria", "rubio", "colon", "san_cristobal", "tachira", "apure", "amazonas", "delta_amacuro", "yacambu", "lara", "portuguesa", "cojedes", "guarico", "anzoategui", "monagas", "sucre", "nueva_esparta", "falcon", "zulia", "merida", "trujillo", "barinas", "yaracuy", "carabobo", "aragua", "miranda", "vargas", "distrito_capital"]
-                    region = random.choice(regiones_disponibles)
+                    region = rng.choice(regiones_disponibles)
                     
                     # Características regionales que influyen en la apariencia
                     caracteristicas_regionales = {
@@ -779,27 +776,27 @@ def create_ui():
                     region_traits = caracteristicas_regionales.get(region, {"skin_modifier": "standard", "hair_modifier": "standard"})
                     
                     # Seleccionar características aleatorias con influencia regional
-                    skin_tone = random.choice(skin_tones.get(nacionalidad, ["medium", "olive", "tan"]))
-                    hair_color = random.choice(hair_colors.get(nacionalidad, ["black", "dark brown", "brown"]))
-                    eye_color = random.choice(eye_colors.get(nacionalidad, ["dark brown", "brown", "hazel"]))
-                    hair_style = random.choice(hair_styles)
-                    face_shape = random.choice(face_shapes)
-                    nose_shape = random.choice(facial_features["nose"])
-                    lip_shape = random.choice(facial_features["lips"])
-                    eye_shape = random.choice(facial_features["eyes"])
+                    skin_tone = rng.choice(skin_tones.get(nacionalidad, ["medium", "olive", "tan"]))
+                    hair_color = rng.choice(hair_colors.get(nacionalidad, ["black", "dark brown", "brown"]))
+                    eye_color = rng.choice(eye_colors.get(nacionalidad, ["dark brown", "brown", "hazel"]))
+                    hair_style = rng.choice(hair_styles)
+                    face_shape = rng.choice(face_shapes)
+                    nose_shape = rng.choice(facial_features["nose"])
+                    lip_shape = rng.choice(facial_features["lips"])
+                    eye_shape = rng.choice(facial_features["eyes"])
                     
                     # Agregar variaciones adicionales ULTRA DIVERSAS para máxima unicidad
                     additional_traits = {
-                        "freckles": random.choice(["none", "light", "moderate", "heavy", "scattered", "concentrated", "bridge", "cheeks", "forehead"]) if random.random() < 0.4 else "none",
-                        "eyebrows": random.choice(["thick", "medium", "thin", "arched", "straight", "defined", "natural", "bushy", "sparse", "uneven", "perfect", "asymmetric", "high", "low", "close", "wide", "angled", "curved"]),
-                        "jawline": random.choice(["strong", "soft", "defined", "rounded", "angular", "delicate", "square", "pointed", "weak", "prominent", "recessed", "asymmetric", "perfect", "uneven", "wide", "narrow"]),
-                        "cheekbones": random.choice(["high", "medium", "low", "prominent", "subtle", "defined", "sharp", "soft", "angular", "rounded", "asymmetric", "perfect", "uneven", "wide", "narrow", "hollow", "full"]),
-                        "skin_texture": random.choice(["smooth", "textured", "natural", "mature", "youthful", "rough", "fine", "coarse", "porous", "tight", "loose", "elastic", "dry", "oily", "combination"]),
-                        "facial_hair": random.choice(["clean-shaven", "stubble", "beard", "mustache", "goatee", "sideburns", "full-beard", "trimmed", "unkempt", "styled", "patchy", "thick", "thin"]) if genero == "hombre" else "none",
-                        "moles": random.choice(["none", "small", "medium", "large", "multiple", "cheek", "chin", "forehead", "nose"]) if random.random() < 0.2 else "none",
-                        "scars": random.choice(["none", "small", "faint", "visible", "cheek", "chin", "forehead"]) if random.random() < 0.1 else "none",
-                        "acne": random.choice(["none", "mild", "moderate", "severe", "scattered", "concentrated"]) if random.random() < 0.15 else "none",
-                        "wrinkles": random.choice(["none", "fine", "moderate", "deep", "forehead", "eye", "mouth", "neck"]) if edad > 30 and random.random() < 0.3 else "none"
+                        "freckles": rng.choice(["none", "light", "moderate", "heavy", "scattered", "concentrated", "bridge", "cheeks", "forehead"]) if rng.random() < 0.4 else "none",
+                        "eyebrows": rng.choice(["thick", "medium", "thin", "arched", "straight", "defined", "natural", "bushy", "sparse", "uneven", "perfect", "asymmetric", "high", "low", "close", "wide", "angled", "curved"]),
+                        "jawline": rng.choice(["strong", "soft", "defined", "rounded", "angular", "delicate", "square", "pointed", "weak", "prominent", "recessed", "asymmetric", "perfect", "uneven", "wide", "narrow"]),
+                        "cheekbones": rng.choice(["high", "medium", "low", "prominent", "subtle", "defined", "sharp", "soft", "angular", "rounded", "asymmetric", "perfect", "uneven", "wide", "narrow", "hollow", "full"]),
+                        "skin_texture": rng.choice(["smooth", "textured", "natural", "mature", "youthful", "rough", "fine", "coarse", "porous", "tight", "loose", "elastic", "dry", "oily", "combination"]),
+                        "facial_hair": rng.choice(["clean-shaven", "stubble", "beard", "mustache", "goatee", "sideburns", "full-beard", "trimmed", "unkempt", "styled", "patchy", "thick", "thin"]) if genero == "hombre" else "none",
+                        "moles": rng.choice(["none", "small", "medium", "large", "multiple", "cheek", "chin", "forehead", "nose"]) if rng.random() < 0.2 else "none",
+                        "scars": rng.choice(["none", "small", "faint", "visible", "cheek", "chin", "forehead"]) if rng.random() < 0.1 else "none",
+                        "acne": rng.choice(["none", "mild", "moderate", "severe", "scattered", "concentrated"]) if rng.random() < 0.15 else "none",
+                        "wrinkles": rng.choice(["none", "fine", "moderate", "deep", "forehead", "eye", "mouth", "neck"]) if edad > 30 and rng.random() < 0.3 else "none"
                     }
                     
                     return {
@@ -824,7 +821,6 @@ def create_ui():
                 def obtener_parametros_nacionalidad(nacionalidad):
                     """Obtiene los parámetros técnicos específicos para cada nacionalidad."""
                     try:
-                        import json
                         consulta_dir = Path(__file__).parent.parent / "Consulta"
                         
                         # Parámetros por defecto - HOMOGÉNEOS para todas las nacionalidades
@@ -859,8 +855,8 @@ def create_ui():
                         # Opcional: Leer configuración específica solo para información
                         if config_path.exists():
                             try:
-                                with open(config_path, 'r', encoding='utf-8') as f:
-                                    config = json.load(f)
+                                import consulta_data
+                                config = consulta_data.load_json(config_path)
                                 # Solo usar steps y sampler de la configuración específica si están disponibles
                                 if "generation" in config:
                                     gen_config = config["generation"]
@@ -918,7 +914,7 @@ def create_ui():
                     generation_cancelled = True
                     return "🛑 Generación detenida por el usuario"
                 
-                def generar_masivo_genetico_func(nacionalidad, genero, edad, cantidad, region, edad_min, edad_max, beauty_control, skin_control, hair_control, eye_control, background_control, cfg_scale, steps, sampler_name, seed, width, height, batch_count, batch_size, denoising_strength, hr_second_pass_steps, hr_scale, hr_resize_x, hr_resize_y, hr_upscaler, hr_sampler_name, hr_scheduler, refiner_checkpoint, refiner_switch_at, progress=gr.Progress()):
+                def generar_masivo_genetico_func(nacionalidad, genero, edad, cantidad, region, edad_min, edad_max, beauty_control, skin_control, hair_control, eye_control, background_control, lote_heterogeneo, cfg_scale, steps, sampler_name, seed, width, height, batch_count, batch_size, denoising_strength, hr_second_pass_steps, hr_scale, hr_resize_x, hr_resize_y, hr_upscaler, hr_sampler_name, hr_scheduler, refiner_checkpoint, refiner_switch_at, progress=gr.Progress()):
                     """Inicia la generación masiva con motor genético dinámico."""
                     global generation_cancelled
                     generation_cancelled = False  # Resetear flag de cancelación
@@ -930,13 +926,12 @@ def create_ui():
                         import time
                         import json
                         import os
-                        import random
                         from datetime import datetime
                         import modules.processing
                         import modules.shared as shared
                         from modules.shared import opts
                         from contextlib import closing
-                        from modules import sd_samplers
+                        from modules import sd_samplers, images
                         
                         # Convertir valores a enteros
                         cantidad_int = int(cantidad)
@@ -976,17 +971,98 @@ def create_ui():
                         
                         # Inicializar motor genético avanzado
                         try:
+                            from genetic_diversity_engine import derive_seed
                             from genetic_diversity_engine_advanced import AdvancedGeneticDiversityEngine
-                            genetic_engine = AdvancedGeneticDiversityEngine()
+                            # Con seed fija la corrida completa es reproducible; con -1 se sortea una seed maestra
+                            genetic_engine = AdvancedGeneticDiversityEngine(seed=None if int(seed) == -1 else int(seed))
                         except Exception as e:
                             return "", "", 1, 1, f"❌ Error inicializando motor genético avanzado: {e}"
-                        
+
+                        # Modo de lotes heterogéneos: N perfiles distintos (cada uno con su seed) en una sola llamada a process_images
+                        perfiles_por_lote = max(1, int(batch_size)) if lote_heterogeneo else 1
+                        lote_pendiente = []
+
+                        def procesar_lote_heterogeneo(lote):
+                            """Genera todos los perfiles del lote en una sola pasada usando all_prompts/all_seeds por imagen."""
+                            nonlocal generated_count, failed_count
+
+                            p = modules.processing.StableDiffusionProcessingTxt2Img(
+                                sd_model=shared.sd_model,
+                                outpath_samples=str(standard_webui_dir),
+                                outpath_grids=None,
+                                prompt=[item['prompt'] for item in lote],
+                                negative_prompt=[item['negative_prompt'] for item in lote],
+                                seed=[item['seed'] for item in lote],
+                                batch_size=len(lote),
+                                n_iter=1,
+                                cfg_scale=cfg_scale,
+                                width=width,
+                                height=height,
+                                enable_hr=hr_second_pass_steps > 0,
+                                denoising_strength=denoising_strength,
+                                hr_scale=hr_scale,
+                                hr_upscaler=hr_upscaler,
+                                hr_second_pass_steps=hr_second_pass_steps,
+                                hr_resize_x=hr_resize_x,
+                                hr_resize_y=hr_resize_y,
+                                hr_checkpoint_name=hr_checkpoint_name,
+                                hr_sampler_name=hr_sampler_name,
+                                hr_scheduler=hr_scheduler,
+                                hr_prompt="",
+                                hr_negative_prompt="",
+                                do_not_save_grid=True,
+                                override_settings={
+                                    'save_to_dirs': False,
+                                    'save_images_replace_action': "Add number suffix"
+                                }
+                            )
+                            p.sampler_name = sd_samplers.samplers_map.get(str(sampler_name).lower(), list(sd_samplers.samplers_map.values())[0])
+                            p.steps = steps
+
+                            try:
+                                with closing(p):
+                                    processed = modules.processing.process_images(p)
+                            except Exception as e:
+                                failed_count += len(lote)
+                                print(f"❌ Error en lote genético de {len(lote)} perfiles: {e}")
+                                import traceback
+                                traceback.print_exc()
+                                return
+
+                            # Las imágenes pueden venir precedidas por un grid; index_of_first_image lo salta
+                            offset = processed.index_of_first_image if processed else 0
+                            result = processed.images[offset:] if processed else []
+
+                            for k, item in enumerate(lote):
+                                if k >= len(result) or result[k] is None:
+                                    failed_count += 1
+                                    print(f"❌ Error generando imagen genética {item['index'] + 1}: No se obtuvo resultado de la generación.")
+                                    continue
+
+                                infotext = processed.infotexts[offset + k] if offset + k < len(processed.infotexts) else ""
+                                filepath = batch_dir / item['filename']
+                                images.save_image_with_geninfo(result[k], infotext, str(filepath))
+
+                                json_genetico = item['json']
+                                json_genetico["infotext"] = infotext
+                                json_genetico["image_info"] = {
+                                    "filename": item['filename'],
+                                    "filepath": str(filepath),
+                                    "generation_successful": True,
+                                    "generation_time": datetime.now().isoformat()
+                                }
+                                with open(str(filepath.with_suffix('.json')), 'w', encoding='utf-8') as f:
+                                    json.dump(json_genetico, f, indent=2, ensure_ascii=False)
+
+                                generated_count += 1
+                                print(f"✅ Imagen genética {item['index'] + 1} generada: {item['filename']}")
+
                         # Generar perfiles genéticos únicos para cada imagen
                         for i in range(cantidad_int):
                             # Verificar si la generación fue cancelada
                             if generation_cancelled:
                                 return "", "", 1, 1, "🛑 Generación cancelada por el usuario"
-                            
+
                             try:
                                 # Debug: Inicio de generación
                                 print(f"🔍 Debug - Iniciando generación {i+1}/{cantidad_int}")
@@ -994,12 +1070,16 @@ def create_ui():
                                 # Actualizar progreso
                                 progress((i + 1) / cantidad_int, desc=f"Generando imagen {i+1}/{cantidad_int} con perfil genético único...")
                                 
+                                # Edad, región y seed de imagen salen del flujo del índice: (master_seed, i) basta para regenerar
+                                rng_perfil = genetic_engine.profile_rng(i, "inputs")
+                                
                                 # Generar edad aleatoria dentro del rango
-                                edad_aleatoria = random.randint(edad_min_int, edad_max_int)
+                                edad_aleatoria = rng_perfil.randint(edad_min_int, edad_max_int)
                                 
                                 # SIEMPRE usar región aleatoria para máxima diversidad
                                 regiones_disponibles = ["caracas", "maracaibo", "valencia", "barquisimeto", "ciudad_guayana", "maturin", "merida", "san_cristobal", "barcelona", "puerto_la_cruz", "ciudad_bolivar", "tucupita", "porlamar", "valera", "acarigua", "guanare", "san_fernando", "trujillo", "el_tigre", "cabimas", "punto_fijo", "ciudad_ojeda", "puerto_cabello", "valle_de_la_pascua", "san_juan_de_los_morros", "carora", "tocuyo", "duaca", "siquisique", "araure", "turen", "guanarito", "santa_elena", "el_venado", "san_rafael", "san_antonio", "la_fria", "rubio", "colon", "san_cristobal", "tachira", "apure", "amazonas", "delta_amacuro", "yacambu", "lara", "portuguesa", "cojedes", "guarico", "anzoategui", "monagas", "sucre", "nueva_esparta", "falcon", "zulia", "merida", "trujillo", "barinas", "yaracuy", "carabobo", "aragua", "miranda", "vargas", "distrito_capital"]
-                                region_genetica = random.choice(regiones_disponibles)
+                                region_genetica = rng_perfil.choice(regiones_disponibles)
+                                seed_imagen = rng_perfil.randint(1, 2147483647)
                                 
                                 # Generar perfil genético avanzado completo
                                 genetic_profile = genetic_engine.generate_advanced_genetic_profile(
@@ -1010,7 +1090,8 @@ def create_ui():
                                     beauty_control=beauty_control,
                                     skin_control=skin_control,
                                     hair_control=hair_control,
-                                    eye_control=eye_control
+                                    eye_control=eye_control,
+                                    index=i
                                 )
                                 
                                 # Debug: Perfil genético generado
@@ -1110,10 +1191,16 @@ def create_ui():
                                         "steps": 35,
                                         "cfg_scale": 12.0,
                                         "sampler_name": "DPM++ 2M Karras",
-                                        "seed": random.randint(1, 2147483647),  # Seed único para cada imagen
+                                        "seed": seed_imagen,  # Seed único para cada imagen
                                         "batch_size": 1,
                                         "n_iter": 1
                                     },
+                                    "reproducibility": {
+                                        "master_seed": genetic_profile.master_seed,
+                                        "profile_index": genetic_profile.profile_index,
+                                        "profile_seed": genetic_profile.profile_seed,
+                                        "inputs_seed": derive_seed(genetic_profile.master_seed, i, "inputs")
+                                    },
                                     "controls_used": {
                                         "beauty_control": beauty_control,
                                         "skin_control": skin_control,
@@ -1139,11 +1226,39 @@ def create_ui():
                                     'steps': steps,
                                     'cfg_scale': cfg_scale,
                                     'sampler_name': sampler_name,
-                                    'seed': seed,
+                                    'seed': seed_imagen,  # La misma seed que registra el JSON: derivada de (seed maestra, índice)
                                     'batch_size': batch_size,
                                     'n_iter': batch_count
                                 }
                                 
+                                if lote_heterogeneo:
+                                    # Cada perfil conserva su propia seed dentro del lote
+                                    seed_perfil = seed_imagen
+                                    json_genetico["generation_parameters"].update({
+                                        "width": width,
+                                        "height": height,
+                                        "steps": steps,
+                                        "cfg_scale": cfg_scale,
+                                        "sampler_name": sampler_name,
+                                        "seed": seed_perfil,
+                                        "batch_size": perfiles_por_lote,
+                                        "n_iter": 1,
+                                        "batch_mode": "heterogeneous",
+                                    })
+                                    lote_pendiente.append({
+                                        'index': i,
+                                        'prompt': prompt,
+                                        'negative_prompt': negative_prompt,
+                                        'seed': seed_perfil,
+                                        'filename': f"genetic_{nacionalidad}_{region}_{genero}_{edad_aleatoria}_{i+1}_{timestamp}.png",
+                                        'json': json_genetico,
+                                    })
+                                    
+                                    if len(lote_pendiente) >= perfiles_por_lote:
+                                        procesar_lote_heterogeneo(lote_pendiente)
+                                        lote_pendiente = []
+                                    continue
+                                
                                 # Generar imagen usando la API interna de WebUI
                                 try:
                                     # Debug: Antes de crear objeto de procesamiento
@@ -1281,6 +1396,11 @@ def create_ui():
                                 failed_count += 1
                                 print(f"❌ Error procesando perfil genético {i+1}: {e}")
                         
+                        # Procesar el último lote incompleto
+                        if lote_pendiente:
+                            procesar_lote_heterogeneo(lote_pendiente)
+                            lote_pendiente = []
+                        
                         # Resultado final
                         progress(1.0, desc="Generación genética completada")
                         
@@ -1384,6 +1504,10 @@ def create_ui():
                         # Configurar barra de progreso
                         progress(0, desc=f"Iniciando generación de {total_files} imágenes...")
                         
+                        # Seed maestra de la corrida: cada imagen usa su propio generador derivado de (semilla_maestra, i)
+                        from genetic_diversity_engine import derive_seed, new_master_seed
+                        semilla_maestra = new_master_seed() if int(seed) == -1 else int(seed)
+                        
                         # Generar JSONs dinámicos únicos para cada imagen
                         for i in range(cantidad_int):
                             # Verificar si la generación fue cancelada
@@ -1394,19 +1518,23 @@ def create_ui():
                                 # Actualizar progreso
                                 progress((i + 1) / cantidad_int, desc=f"Generando imagen {i+1}/{cantidad_int} con características únicas...")
                                 
+                                semilla_perfil = derive_seed(semilla_maestra, i)
+                                rng_perfil = random.Random(semilla_perfil)
+                                seed_imagen = rng_perfil.randint(1, 2147483647)
+                                
                                 # Generar características étnicas dinámicas únicas
                                 try:
                                     # Generar edad aleatoria dentro del rango especificado
                                     edad_min_int = int(edad_min)
                                     edad_max_int = int(edad_max)
-                                    edad_aleatoria = random.randint(edad_min_int, edad_max_int)
+                                    edad_aleatoria = rng_perfil.randint(edad_min_int, edad_max_int)
                                     
                                     # SIEMPRE usar región aleatoria para máxima diversidad
                                     regiones_disponibles = ["caracas", "maracaibo", "valencia", "barquisimeto", "ciudad_guayana", "maturin", "merida", "san_cristobal", "barcelona", "puerto_la_cruz", "ciudad_bolivar", "tucupita", "porlamar", "valera", "acarigua", "guanare", "san_fernando", "trujillo", "el_tigre", "cabimas", "punto_fijo", "ciudad_ojeda", "puerto_cabello", "valle_de_la_pascua", "san_juan_de_los_morros", "carora", "tocuyo", "duaca", "siquisique", "araure", "turen", "guanarito", "santa_elena", "el_venado", "san_rafael", "san_antonio", "la_fria", "rubio", "colon", "san_cristobal", "tachira", "apure", "amazonas", "delta_amacuro", "yacambu", "lara", "portuguesa", "cojedes", "guarico", "anzoategui", "monagas", "sucre", "nueva_esparta", "falcon", "zulia", "merida", "trujillo", "barinas", "yaracuy", "carabobo", "aragua", "miranda", "vargas", "distrito_capital"]
-                                    region = random.choice(regiones_disponibles)
+                                    region = rng_perfil.choice(regiones_disponibles)
                                     
                                     # Generar características étnicas diversas
-                                    caracteristicas = generar_caracteristicas_etnicas_diversas(nacionalidad, genero, edad_aleatoria, region)
+                                    caracteristicas = generar_caracteristicas_etnicas_diversas(nacionalidad, genero, edad_aleatoria, region, rng=rng_perfil)
                                     
                                     # Generar prompt estricto con diversidad étnica MEJORADA
                                     prompt_parts = [
@@ -2061,10 +2189,15 @@ def create_ui():
                                             "steps": 35,
                                             "cfg_scale": 12.0,
                                             "sampler_name": "DPM++ 2M Karras",
-                                            "seed": random.randint(1, 2147483647),  # Seed único para cada imagen
+                                            "seed": seed_imagen,  # Seed único para cada imagen
                                             "batch_size": 1,
                                             "n_iter": 1
                                         },
+                                        "reproducibility": {
+                                            "master_seed": semilla_maestra,
+                                            "profile_index": i,
+                                            "profile_seed": semilla_perfil
+                                        },
                                         "replication_info": {
                                             "description": "Configuración única para replicar esta imagen exacta",
                                             "ethnic_diversity": "Real basada en datos demográficos",
@@ -2096,7 +2229,7 @@ def create_ui():
                                             "steps": 35,
                                             "cfg_scale": 12.0,
                                             "sampler_name": "DPM++ 2M Karras",
-                                            "seed": random.randint(1, 2147483647),  # Seed único para cada imagen
+                                            "seed": seed_imagen,  # Seed único para cada imagen
                                             "batch_size": 1,
                                             "n_iter": 1
                                         }
@@ -2111,7 +2244,7 @@ def create_ui():
                                     'steps': steps,
                                     'cfg_scale': cfg_scale,
                                     'sampler_name': sampler_name,
-                                    'seed': seed,
+                                    'seed': seed_imagen,  # La misma seed que registra el JSON: derivada de (seed maestra, índice)
                                     'batch_size': batch_size,
                                     'n_iter': batch_count
                                 }
@@ -2764,6 +2897,14 @@ def create_ui():
                             info="Fondos sólidos para fácil modificación posterior (sin_fondo = transparente)",
                             elem_id="background_control"
                         )
+                    
+                    with gr.Row():
+                        lote_heterogeneo_control = gr.Checkbox(
+                            value=False,
+                            label="⚡ Lotes heterogéneos",
+                            info="Agrupa 'Batch size' perfiles distintos (cada uno con su seed) en una sola pasada del modelo",
+                            elem_id="lote_heterogeneo_control"
+                        )
                 
                 # Barra de progreso para generación masiva
                 progreso_masivo = gr.Progress()
@@ -3060,7 +3201,7 @@ def create_ui():
                 fn=generar_masivo_genetico_func,
                 inputs=[nacionalidad_pasaporte, genero_pasaporte, edad_pasaporte, cantidad_masiva_pasaporte, 
                        region_pasaporte, edad_min_pasaporte, edad_max_pasaporte, 
-                       beauty_control, skin_control, hair_control, eye_control, background_control,
+                       beauty_control, skin_control, hair_control, eye_control, background_control, lote_heterogeneo_control,
                        cfg_scale, steps, scripts.scripts_txt2img.script('Sampler').sampler_name, scripts.scripts_txt2img.script('Seed').seed, width, height, batch_count, batch_size, denoising_strength, hr_second_pass_steps, hr_scale, hr_resize_x, hr_resize_y, hr_upscaler, hr_sampler_name, hr_scheduler, refiner_checkpoint, refiner_switch_at],
                 outputs=[toprow.prompt, toprow.negative_prompt, batch_count, batch_size, info_pasaporte],
                 show_progress=True
@@ -135,6 +135,8 @@ def save_files(js_data, images, do_make_zip, index):
         if file:
             writer.writerow([parsed_infotexts[0]['Prompt'], parsed_infotexts[0]['Seed'], data["width"], data["height"], data["sampler_name"], data["cfg_scale"], data["steps"], filenames[0], parsed_infotexts[0]['Negative prompt'], data["sd_model_name"], data["sd_model_hash"]])
 
+    modules.images.wait_for_saves(fullfns)
+
     # Make Zip
     if do_make_zip:
         p.all_seeds = [parameters['Seed'] for parameters in parsed_infotexts]
@@ -7,7 +7,7 @@ from pathlib import Path
 from typing import Optional, Union
 from dataclasses import dataclass
 
-from modules import shared, ui_extra_networks_user_metadata, errors, extra_networks, util
+from modules import shared, ui_extra_networks_user_metadata, errors, extra_networks, util, safetensors_metadata
 from modules.images import read_info_from_image, save_image_with_geninfo
 import gradio as gr
 import json
@@ -663,7 +663,15 @@ class ExtraNetworksPage:
         """
 
         file = f"{path}.safetensors"
-        if self.lister.exists(file) and 'ssmd_cover_images' in metadata and len(list(filter(None, json.loads(metadata['ssmd_cover_images'])))) > 0:
+        if not self.lister.exists(file):
+            return None
+
+        # SafetensorsMetadata knows this from its summary; reading the cover images themselves would load the full metadata
+        has_cover_images = getattr(metadata, 'has_cover_images', None)
+        if has_cover_images is None:
+            has_cover_images = safetensors_metadata.has_cover_images(metadata)
+
+        if has_cover_images:
             return f"./sd_extra_networks/cover-images?page={self.extra_networks_tabname}&item={name}"
 
         return None
@@ -33,6 +33,11 @@ def check_tmp_file(gradio, filename):
 
 def save_pil_to_file(self, pil_image, dir=None, format="png"):
     already_saved_as = getattr(pil_image, 'already_saved_as', None)
+    if already_saved_as:
+        from modules import images
+
+        images.wait_for_saves([already_saved_as])
+
     if already_saved_as and os.path.isfile(already_saved_as):
         register_tmp_file(shared.demo, already_saved_as)
         filename_with_mtime = f'{already_saved_as}?{os.path.getmtime(already_saved_as)}'
@@ -51,8 +56,10 @@ def save_pil_to_file(self, pil_image, dir=None, format="png"):
             metadata.add_text(key, value)
             use_metadata = True
 
+    from modules import images
+
     file_obj = tempfile.NamedTemporaryFile(delete=False, suffix=".png", dir=dir)
-    pil_image.save(file_obj, pnginfo=(metadata if use_metadata else None))
+    pil_image.save(file_obj, pnginfo=(metadata if use_metadata else None), **images.png_save_kwargs())
     return file_obj.name
 
 
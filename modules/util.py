@@ -29,13 +29,12 @@ def html(filename):
 
 
 def walk_files(path, allowed_extensions=None):
-    if not os.path.exists(path):
-        return
+    from modules.cache import directory_index
 
     if allowed_extensions is not None:
         allowed_extensions = set(allowed_extensions)
 
-    items = list(os.walk(path, followlinks=True))
+    items = list(directory_index.walk(path))
     items = sorted(items, key=lambda x: natural_sort_key(x[0]))
 
     for root, _, files in items:
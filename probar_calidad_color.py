@@ -4,20 +4,18 @@ Script para probar la calidad y color de las fotos de pasaporte
 """
 
 import random
-import time
 import hashlib
 
-def generar_caracteristicas_etnicas_diversas(nacionalidad, genero, edad, region="aleatorio"):
+def generar_caracteristicas_etnicas_diversas(nacionalidad, genero, edad, region="aleatorio", rng=None):
     """Genera características étnicas diversas para el método masivo básico."""
     
-    # Agregar timestamp y múltiples factores para máxima aleatoriedad
-    unique_seed = int(time.time() * 1000000) + random.randint(1, 999999) + hash(f"{nacionalidad}{genero}{edad}{region}") % 1000000
-    random.seed(unique_seed)
+    # Generador propio: no altera el estado global de random (None = entropía del sistema)
+    rng = rng or random.Random()
     
     # Si la región es "aleatorio", seleccionar una región aleatoria
     if region == "aleatorio":
         regiones_disponibles = ["caracas", "maracaibo", "valencia", "barquisimeto"]
-        region = random.choice(regiones_disponibles)
+        region = rng.choice(regiones_disponibles)
     
     # Características de piel por nacionalidad
     skin_tones = {
@@ -48,27 +46,27 @@ def generar_caracteristicas_etnicas_diversas(nacionalidad, genero, edad, region=
     }
     
     # Seleccionar características aleatorias
-    skin_tone = random.choice(skin_tones.get(nacionalidad, ["medium", "olive", "tan"]))
-    hair_color = random.choice(hair_colors.get(nacionalidad, ["black", "dark brown", "brown"]))
-    eye_color = random.choice(eye_colors.get(nacionalidad, ["dark brown", "brown", "hazel"]))
-    hair_style = random.choice(hair_styles)
-    face_shape = random.choice(face_shapes)
-    nose_shape = random.choice(facial_features["nose"])
-    lip_shape = random.choice(facial_features["lips"])
-    eye_shape = random.choice(facial_features["eyes"])
+    skin_tone = rng.choice(skin_tones.get(nacionalidad, ["medium", "olive", "tan"]))
+    hair_color = rng.choice(hair_colors.get(nacionalidad, ["black", "dark brown", "brown"]))
+    eye_color = rng.choice(eye_colors.get(nacionalidad, ["dark brown", "brown", "hazel"]))
+    hair_style = rng.choice(hair_styles)
+    face_shape = rng.choice(face_shapes)
+    nose_shape = rng.choice(facial_features["nose"])
+    lip_shape = rng.choice(facial_features["lips"])
+    eye_shape = rng.choice(facial_features["eyes"])
     
     # Características adicionales
     additional_traits = {
-        "freckles": random.choice(["none", "light", "moderate", "heavy", "scattered", "concentrated", "bridge", "cheeks", "forehead"]) if random.random() < 0.4 else "none",
-        "eyebrows": random.choice(["thick", "medium", "thin", "arched", "straight", "defined", "natural", "bushy", "sparse", "uneven", "perfect", "asymmetric", "high", "low", "close", "wide", "angled", "curved"]),
-        "jawline": random.choice(["strong", "soft", "defined", "rounded", "angular", "delicate", "square", "pointed", "weak", "prominent", "recessed", "asymmetric", "perfect", "uneven", "wide", "narrow"]),
-        "cheekbones": random.choice(["high", "medium", "low", "prominent", "subtle", "defined", "sharp", "soft", "angular", "rounded", "asymmetric", "perfect", "uneven", "wide", "narrow", "hollow", "full"]),
-        "skin_texture": random.choice(["smooth", "textured", "natural", "mature", "youthful", "rough", "fine", "coarse", "porous", "tight", "loose", "elastic", "dry", "oily", "combination"]),
-        "facial_hair": random.choice(["clean-shaven", "stubble", "beard", "mustache", "goatee", "sideburns", "full-beard", "trimmed", "unkempt", "styled", "patchy", "thick", "thin"]) if genero == "hombre" else "none",
-        "moles": random.choice(["none", "small", "medium", "large", "multiple", "cheek", "chin", "forehead", "nose"]) if random.random() < 0.2 else "none",
-        "scars": random.choice(["none", "small", "faint", "visible", "cheek", "chin", "forehead"]) if random.random() < 0.1 else "none",
-        "acne": random.choice(["none", "mild", "moderate", "severe", "scattered", "concentrated"]) if random.random() < 0.15 else "none",
-        "wrinkles": random.choice(["none", "fine", "moderate", "deep", "forehead", "eye", "mouth", "neck"]) if edad > 30 and random.random() < 0.3 else "none"
+        "freckles": rng.choice(["none", "light", "moderate", "heavy", "scattered", "concentrated", "bridge", "cheeks", "forehead"]) if rng.random() < 0.4 else "none",
+        "eyebrows": rng.choice(["thick", "medium", "thin", "arched", "straight", "defined", "natural", "bushy", "sparse", "uneven", "perfect", "asymmetric", "high", "low", "close", "wide", "angled", "curved"]),
+        "jawline": rng.choice(["strong", "soft", "defined", "rounded", "angular", "delicate", "square", "pointed", "weak", "prominent", "recessed", "asymmetric", "perfect", "uneven", "wide", "narrow"]),
+        "cheekbones": rng.choice(["high", "medium", "low", "prominent", "subtle", "defined", "sharp", "soft", "angular", "rounded", "asymmetric", "perfect", "uneven", "wide", "narrow", "hollow", "full"]),
+        "skin_texture": rng.choice(["smooth", "textured", "natural", "mature", "youthful", "rough", "fine", "coarse", "porous", "tight", "loose", "elastic", "dry", "oily", "combination"]),
+        "facial_hair": rng.choice(["clean-shaven", "stubble", "beard", "mustache", "goatee", "sideburns", "full-beard", "trimmed", "unkempt", "styled", "patchy", "thick", "thin"]) if genero == "hombre" else "none",
+        "moles": rng.choice(["none", "small", "medium", "large", "multiple", "cheek", "chin", "forehead", "nose"]) if rng.random() < 0.2 else "none",
+        "scars": rng.choice(["none", "small", "faint", "visible", "cheek", "chin", "forehead"]) if rng.random() < 0.1 else "none",
+        "acne": rng.choice(["none", "mild", "moderate", "severe", "scattered", "concentrated"]) if rng.random() < 0.15 else "none",
+        "wrinkles": rng.choice(["none", "fine", "moderate", "deep", "forehead", "eye", "mouth", "neck"]) if edad > 30 and rng.random() < 0.3 else "none"
     }
     
     return {
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Script para medir la codificación PNG con cada perfil de compresión
+Reporta ms por megapíxel y tamaño de archivo para Fast, Balanced y Max (opción png_compression),
+sobre imágenes de prueba del repositorio y una imagen sintética tipo retrato
+"""
+
+import io
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+# Los mismos niveles de zlib que images.png_compression_levels
+NIVELES = {"Fast": 1, "Balanced": 6, "Max": 9}
+REPETICIONES = 5
+# Las imágenes más chicas que esto se codifican en microsegundos y su ms/MP es puro ruido
+MINIMO_PIXELES = 256 * 192
+CARPETA_PRUEBAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test", "test_files")
+
+
+def imagen_sintetica(ancho=832, alto=1216):
+    """Degradados suaves con grano, parecido a una foto generada (el ruido puro no se comprime y no es representativo)"""
+    generador = np.random.default_rng(1234)
+    y, x = np.mgrid[0:alto, 0:ancho].astype(np.float32)
+    fondo = np.stack([180 + 40 * np.sin(x / 90), 170 + 30 * np.cos(y / 120), 160 + 20 * np.sin((x + y) / 150)], axis=-1)
+    cara = 60 * np.exp(-(((x - ancho / 2) / (ancho / 5)) ** 2 + ((y - alto / 2.5) / (alto / 6)) ** 2))[..., None]
+    grano = generador.normal(0, 3, size=(alto, ancho, 3))
+    return Image.fromarray(np.clip(fondo + cara + grano, 0, 255).astype(np.uint8))
+
+
+def imagenes_de_prueba():
+    imagenes = {"retrato sintético": imagen_sintetica()}
+    for nombre in sorted(os.listdir(CARPETA_PRUEBAS)) if os.path.isdir(CARPETA_PRUEBAS) else []:
+        if nombre.lower().endswith((".png", ".jpg")):
+            with Image.open(os.path.join(CARPETA_PRUEBAS, nombre)) as imagen:
+                if imagen.width * imagen.height >= MINIMO_PIXELES:
+                    imagenes[nombre] = imagen.convert("RGB")
+    return imagenes
+
+
+def codificar(imagen, nivel):
+    with io.BytesIO() as salida:
+        imagen.save(salida, format="PNG", compress_level=nivel)
+        return salida.getvalue()
+
+
+def medir(imagen, nivel):
+    """Mejor tiempo de REPETICIONES codificaciones, en ms por megapíxel, y los bytes resultantes"""
+    mejor = None
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        datos = codificar(imagen, nivel)
+        tiempo = time.perf_counter() - inicio
+        mejor = tiempo if mejor is None else min(mejor, tiempo)
+    megapixeles = imagen.width * imagen.height / 1e6
+    return mejor * 1000 / megapixeles, datos
+
+
+if __name__ == "__main__":
+    print("🚀 PRUEBA DE PERFILES DE COMPRESIÓN PNG")
+    print("=" * 60)
+
+    correcto = True
+    totales = {perfil: [] for perfil in NIVELES}
+    for nombre, imagen in imagenes_de_prueba().items():
+        print(f"\n🖼️  {nombre} ({imagen.width}x{imagen.height})")
+        for perfil, nivel in NIVELES.items():
+            ms_por_mp, datos = medir(imagen, nivel)
+            totales[perfil].append(ms_por_mp)
+
+            with Image.open(io.BytesIO(datos)) as decodificada:
+                correcto = correcto and np.array_equal(np.asarray(decodificada), np.asarray(imagen))
+
+            print(f"   {perfil:<9} (nivel {nivel})  {ms_por_mp:8.1f} ms/MP  {len(datos) / 1024:9.0f} KB")
+
+    print("\n📊 RESUMEN")
+    print("=" * 60)
+    base = sum(totales["Balanced"]) / len(totales["Balanced"])
+    for perfil, tiempos in totales.items():
+        promedio = sum(tiempos) / len(tiempos)
+        print(f"   {perfil:<9} {promedio:8.1f} ms/MP en promedio  x{base / promedio:.2f} frente a Balanced")
+    if correcto:
+        print("✅ Todos los perfiles decodifican a los mismos píxeles")
+    else:
+        print("❌ Algún perfil no decodifica a los mismos píxeles")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Script de humo del generador masivo sin API
+Genera unos pocos perfiles, construye sus prompts y comprueba que los índices persistentes
+de firmas (perfiles y rasgos de prompt) detectan colisiones entre corridas; luego recorre el
+pipeline completo (prompt, muestreo, decodificación, escritura) con una API simulada
+"""
+
+import base64
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from webui_massive_generator import WebUIMassiveGenerator  # noqa: E402
+
+PERFILES = 6
+# Con una distancia alta casi cualquier par de perfiles cuenta como casi-duplicado: fuerza colisiones
+DISTANCIA_COLISIONES = 7
+
+
+class APISimulada:
+    """Responde como /sdapi/v1/txt2img con una imagen fija, sin GPU"""
+
+    def __init__(self):
+        self.llamadas = 0
+
+    def txt2img(self, **params):
+        self.llamadas += 1
+        return {"images": [base64.b64encode(b"\x89PNG\r\n\x1a\n simulada").decode()], "info": "{}"}
+
+
+def construir_prompts(generador, master_seed):
+    """Perfiles y prompts de una corrida, sin llamar a la API"""
+    perfiles = generador._generate_diversity_profiles("venezuelan", "mujer", 20, 45, PERFILES, master_seed, f"humo_{master_seed}")
+    return [(perfil, *generador._generate_unique_prompt(perfil)) for perfil in perfiles]
+
+
+if __name__ == "__main__":
+    print("🚀 PRUEBA DE HUMO DEL GENERADOR MASIVO (SIN API)")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        print(f"\n🧬 Corrida 1: {PERFILES} perfiles, solo duplicados exactos")
+        generador = WebUIMassiveGenerator(api_client=None, output_dir=carpeta)
+        resultados = construir_prompts(generador, master_seed=1)
+        for perfil, prompt, _ in resultados:
+            print(f"   #{perfil['profile_index']} {perfil['region']:<22} {prompt[-110:]}")
+
+        prompts_correctos = all(prompt and negativo and perfil['region'] in prompt for perfil, prompt, negativo in resultados)
+
+        print(f"\n🔁 Corrida 2: {PERFILES} perfiles sobre los mismos índices, distancia casi-duplicado {DISTANCIA_COLISIONES}")
+        generador = WebUIMassiveGenerator(api_client=None, output_dir=carpeta)
+        generador.near_duplicate_distance = DISTANCIA_COLISIONES
+        generador.signature_max_attempts = 3
+        construir_prompts(generador, master_seed=2)
+        colisiones = generador.stats['signature_collisions']
+        perfiles_indexados, prompts_indexados = (len(indice) for indice in generador._signature_indexes())
+        print(f"   Colisiones exactas: {colisiones['exact']}  casi-duplicados: {colisiones['near']}  sin resolver: {generador.stats['signature_unresolved']}")
+        print(f"   Firmas en índice: {perfiles_indexados} perfiles, {prompts_indexados} rasgos de prompt")
+
+        for indice in generador._signature_indexes():
+            indice.close()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        print(f"\n🏭 Pipeline completo con API simulada: {PERFILES} trabajos")
+        api = APISimulada()
+        generador = WebUIMassiveGenerator(api_client=api, output_dir=carpeta)
+        resultado = generador.generate_massive_diversity("venezuelan", "mujer", 20, 45, PERFILES, master_seed=3)
+        imagenes = list(Path(resultado['output_directory']).glob("*.png"))
+        print(f"   Generadas: {resultado['generated_count']}  fallidas: {resultado['failed_count']}  llamadas a la API: {api.llamadas}  PNG en disco: {len(imagenes)}")
+        pipeline_correcto = resultado['success'] and resultado['generated_count'] == PERFILES == len(imagenes) == resultado['ledger']['done']
+
+        print("\n💥 Error al construir el prompt: se abandona sin reintentos ni backoff")
+        generador = WebUIMassiveGenerator(api_client=APISimulada(), output_dir=carpeta)
+
+        def prompt_roto(profile, seed=-1):
+            raise KeyError("region")
+
+        generador._build_generation_params = prompt_roto
+        inicio = time.perf_counter()
+        resultado = generador.generate_massive_diversity("venezuelan", "mujer", 20, 45, 2, master_seed=4)
+        duracion = time.perf_counter() - inicio
+        print(f"   Abandonados: {resultado['failed_count']}  intentos: {resultado['failed_attempts']}  success: {resultado['success']}  {duracion:.2f}s")
+        # El primer reintento del ledger esperaría backoff_base (2s)
+        sin_reintentos = not resultado['success'] and resultado['failed_count'] == 2 == resultado['failed_attempts'] and duracion < 2
+
+        for indice in generador._signature_indexes():
+            indice.close()
+
+    print("\n📊 RESUMEN")
+    print("=" * 60)
+    detectadas = colisiones['exact'] + colisiones['near'] > 0
+    print(f"{'✅' if prompts_correctos else '❌'} Prompts construidos para todos los perfiles, con su región")
+    print(f"{'✅' if detectadas else '❌'} Colisiones detectadas contra la corrida anterior")
+    print(f"{'✅' if pipeline_correcto else '❌'} Pipeline completo: todos los trabajos generados y escritos")
+    print(f"{'✅' if sin_reintentos else '❌'} Errores de prompt abandonados sin reintentos")
+    sys.exit(0 if prompts_correctos and detectadas and pipeline_correcto and sin_reintentos else 1)
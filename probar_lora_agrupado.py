@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Script para medir la fusión agrupada de LoRA en CPU
+Compara el cálculo capa por capa y red por red (como network_apply_weights) con la suma de redes
+en una sola multiplicación por capa y los lotes bmm entre capas de igual forma, con 1, 4 y 8 redes apiladas
+"""
+
+import os
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "extensions-builtin", "Lora"))
+
+import lyco_helpers  # noqa: E402
+
+CANTIDADES_REDES = [1, 4, 8]
+RANGO = 32
+ALFA = 16
+MULTIPLICADOR = 0.8
+REPETICIONES = 3
+
+# Capas lineales de atención y feed-forward de un UNet tipo SD1.5 (salida, entrada, cantidad)
+CAPAS_UNET = [
+    (320, 320, 32), (320, 768, 8), (2560, 320, 4), (320, 1280, 4),
+    (640, 640, 32), (640, 768, 8), (5120, 640, 4), (640, 2560, 4),
+    (1280, 1280, 40), (1280, 768, 10), (10240, 1280, 5), (1280, 5120, 5),
+]
+
+
+def crear_capas():
+    generador = torch.Generator().manual_seed(1234)
+    return [torch.randn(salida, entrada, generator=generador) * 0.02 for salida, entrada, cantidad in CAPAS_UNET for _ in range(cantidad)]
+
+
+def crear_redes(capas, cantidad):
+    """Matrices up/down por red y por capa, con escala alfa/rango como NetworkModuleLora"""
+    generador = torch.Generator().manual_seed(cantidad)
+    return [
+        [(torch.randn(peso.shape[0], RANGO, generator=generador) * 0.01, torch.randn(RANGO, peso.shape[1], generator=generador) * 0.01) for peso in capas]
+        for _ in range(cantidad)
+    ]
+
+
+def fusion_secuencial(capas, redes):
+    """Una matmul y una suma de tamaño completo por red y por capa"""
+    escala = ALFA / RANGO * MULTIPLICADOR
+    for indice, peso in enumerate(capas):
+        for red in redes:
+            up, down = red[indice]
+            updown = lyco_helpers.rebuild_conventional(up, down, peso.shape, None) * escala
+            peso.copy_(peso + updown)
+
+
+def fusion_agrupada(capas, redes):
+    """Una matmul por capa para todas las redes, agrupadas en bmm entre capas de igual forma"""
+    escala = ALFA / RANGO * MULTIPLICADOR
+    pares = [lyco_helpers.stack_conventional([(*red[indice], escala, None) for red in redes]) for indice in range(len(capas))]
+    for indice, updown in lyco_helpers.rebuild_conventional_batched(pares):
+        capas[indice].copy_(capas[indice] + updown)
+
+
+def medir(funcion, capas, redes):
+    mejor = None
+    for _ in range(REPETICIONES):
+        copia = [peso.clone() for peso in capas]
+        inicio = time.perf_counter()
+        funcion(copia, redes)
+        tiempo = time.perf_counter() - inicio
+        mejor = tiempo if mejor is None else min(mejor, tiempo)
+    return mejor, copia
+
+
+if __name__ == "__main__":
+    torch.set_grad_enabled(False)
+
+    print("🚀 PRUEBA DE FUSIÓN AGRUPADA DE LORA (CPU)")
+    print("=" * 60)
+
+    capas = crear_capas()
+    parametros = sum(peso.numel() for peso in capas)
+    print(f"   {len(capas)} capas, {parametros / 1e6:.0f}M parámetros, rango {RANGO}, {torch.get_num_threads()} hilos")
+
+    correcto = True
+    for cantidad in CANTIDADES_REDES:
+        redes = crear_redes(capas, cantidad)
+
+        secuencial, esperado = medir(fusion_secuencial, capas, redes)
+        agrupado, obtenido = medir(fusion_agrupada, capas, redes)
+        diferencia = max((a - b).abs().max().item() for a, b in zip(esperado, obtenido))
+        correcto = correcto and diferencia < 1e-4
+
+        print(f"\n🧩 {cantidad} red{'es' if cantidad > 1 else ''} apilada{'s' if cantidad > 1 else ''}")
+        print(f"   Secuencial (por capa y red)   {secuencial:7.3f}s")
+        print(f"   Agrupada (bmm entre capas)    {agrupado:7.3f}s  x{secuencial / agrupado:.1f}")
+        print(f"   Diferencia máxima             {diferencia:.2e}")
+
+    print("\n📊 RESUMEN")
+    print("=" * 60)
+    if correcto:
+        print("✅ La fusión agrupada da los mismos pesos que la secuencial")
+    else:
+        print("❌ La fusión agrupada difiere de la secuencial")
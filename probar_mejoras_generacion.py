@@ -133,6 +133,56 @@ def test_massive_generator_prompts():
         print(f"❌ Error probando generador masivo: {e}")
         return False
 
+def test_massive_generator_seeded_prompts():
+    """Prueba que el prompt de un perfil con seed maestra sea reproducible"""
+    print("\n🎲 Probando prompts reproducibles del Generador Masivo...")
+    
+    try:
+        from webui_massive_generator import WebUIMassiveGenerator
+        
+        generator = WebUIMassiveGenerator()
+        
+        # Perfil como los de generate_massive_diversity: las variaciones salen de (master_seed, profile_index)
+        profile = {
+            'nationality': 'venezuelan',
+            'gender': 'hombre',
+            'age_range': '36-45 years old',
+            'region': 'aleatorio',
+            'skin_tone': 'olive',
+            'skin_texture': 'natural',
+            'hair_color': 'black',
+            'hair_style': 'short',
+            'eye_color': 'dark brown',
+            'eye_shape': 'almond',
+            'facial_structure': 'square',
+            'nose_shape': 'straight',
+            'lip_shape': 'full',
+            'eyebrows': 'thick',
+            'jawline': 'strong',
+            'cheekbones': 'high',
+            'master_seed': 1234,
+            'profile_index': 7
+        }
+        
+        first = generator._generate_unique_prompt(dict(profile))
+        second = generator._generate_unique_prompt(dict(profile))
+        
+        checks = [
+            (bool(first[0]) and bool(first[1]), "Genera prompt y negative prompt"),
+            (first == second, "Mismo perfil y seed maestra producen el mismo prompt")
+        ]
+        
+        print("\n🔍 Verificaciones:")
+        for check, description in checks:
+            status = "✅" if check else "❌"
+            print(f"   {status} {description}")
+        
+        return all(check for check, _ in checks)
+        
+    except Exception as e:
+        print(f"❌ Error probando prompts reproducibles: {e}")
+        return False
+
 def test_parameters():
     """Prueba que los parámetros estén correctos"""
     print("\n⚙️ Verificando Parámetros...")
@@ -162,6 +212,7 @@ def main():
     # Ejecutar pruebas
     results.append(("Motor Genético", test_genetic_engine_prompts()))
     results.append(("Generador Masivo", test_massive_generator_prompts()))
+    results.append(("Prompts reproducibles", test_massive_generator_seeded_prompts()))
     results.append(("Parámetros", test_parameters()))
     
     # Resumen de resultados
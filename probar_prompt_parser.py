@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Script para medir el front end memoizado de modules/prompt_parser
+Compara el análisis con Lark de cada prompt contra la ruta rápida y la caché,
+sobre corpus de 10k prompts de pasaporte
+"""
+
+import time
+
+from genetic_diversity_engine_advanced import AdvancedGeneticDiversityEngine
+from modules import prompt_parser
+
+CANTIDAD = 10000
+# Lark tarda decenas de ms por prompt de pasaporte: su velocidad se mide sobre una muestra
+MUESTRA_LARK = 200
+PASOS = 30
+NACIONALIDAD = "venezolana"
+CONTROLES = {"beauty_control": "normal", "skin_control": "auto", "hair_control": "dark", "eye_control": "auto"}
+
+
+def prompts_pasaporte(cantidad):
+    """Prompts positivos y negativos tal como los arma el motor genético avanzado"""
+    motor = AdvancedGeneticDiversityEngine(seed=1234)
+    perfiles = motor.generate_advanced_genetic_profiles(cantidad, NACIONALIDAD, "aleatorio", "female", **CONTROLES)
+    pares = [motor.generate_prompt_from_advanced_profile(perfil) for perfil in perfiles]
+    return [positivo for positivo, _ in pares], [negativo for _, negativo in pares]
+
+
+def limpiar_caches():
+    prompt_parser.get_prompt_schedule.cache_clear()
+    prompt_parser.parse_prompt_attention_cached.cache_clear()
+
+
+def medir(nombre, funcion, prompts, referencia=None):
+    """Mide prompts por segundo; referencia es la velocidad contra la que se calcula la aceleración"""
+    inicio = time.perf_counter()
+    for prompt in prompts:
+        funcion(prompt)
+    tiempo = time.perf_counter() - inicio
+    velocidad = len(prompts) / tiempo
+    aceleracion = f" x{velocidad / referencia:,.0f}" if referencia else ""
+    print(f"   {nombre:<38} {len(prompts):>6} prompts en {tiempo:7.3f}s ({velocidad:>12,.0f} prompts/s){aceleracion}")
+    return velocidad
+
+
+def programaciones(prompts):
+    """get_learned_conditioning_prompt_schedules frente al análisis de Lark de siempre (sin ruta rápida ni caché)"""
+    lark_sin_cache = prompt_parser.get_prompt_schedule.__wrapped__
+    front_end = lambda p: prompt_parser.get_learned_conditioning_prompt_schedules([p], PASOS)  # noqa: E731
+
+    print(f"\n📅 Programaciones ({len(prompts)} prompts, {len(set(prompts))} distintos)")
+    print("=" * 60)
+
+    base = medir("Lark en cada prompt (muestra)", lambda p: lark_sin_cache(p, PASOS), prompts[:MUESTRA_LARK])
+    limpiar_caches()
+    medir("Front end (primera pasada)", front_end, prompts, base)
+    medir("Front end (repetidos)", front_end, prompts, base)
+
+    # Con sintaxis de programación no hay ruta rápida: solo ayuda la caché, así que el corpus repite la muestra
+    programados = [f"{p}, [smiling:neutral expression:0.4]" for p in prompts[:MUESTRA_LARK]] * (len(prompts) // MUESTRA_LARK)
+    base = medir("Lark con [a:b:0.4] (muestra)", lambda p: lark_sin_cache(p, PASOS), programados[:MUESTRA_LARK])
+    limpiar_caches()
+    medir("Front end con [a:b:0.4] (primera)", front_end, programados, base)
+    medir("Front end con [a:b:0.4] (repetidos)", front_end, programados, base)
+
+
+def atencion(prompts):
+    """parse_prompt_attention con y sin memoización"""
+    regex_sin_cache = prompt_parser.parse_prompt_attention_cached.__wrapped__
+
+    print(f"\n🔎 Atención ({len(prompts)} prompts, {len(set(prompts))} distintos)")
+    print("=" * 60)
+
+    base = medir("Regex en cada prompt", regex_sin_cache, prompts)
+    limpiar_caches()
+    medir("parse_prompt_attention (primera)", prompt_parser.parse_prompt_attention, prompts, base)
+    medir("parse_prompt_attention (repetidos)", prompt_parser.parse_prompt_attention, prompts, base)
+
+
+def verificar(prompts):
+    """El front end debe devolver exactamente lo mismo que Lark y el regex"""
+    lark_sin_cache = prompt_parser.get_prompt_schedule.__wrapped__
+    regex_sin_cache = prompt_parser.parse_prompt_attention_cached.__wrapped__
+
+    for prompt in prompts:
+        esperado = [[t, texto] for t, texto in lark_sin_cache(prompt, PASOS)]
+        if prompt_parser.get_learned_conditioning_prompt_schedules([prompt], PASOS)[0] != esperado:
+            return False
+        if prompt_parser.parse_prompt_attention(prompt) != [[texto, peso] for texto, peso in regex_sin_cache(prompt)]:
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    print("🚀 PRUEBA DEL PARSER DE PROMPTS MEMOIZADO")
+    print("=" * 60)
+
+    positivos, negativos = prompts_pasaporte(CANTIDAD)
+    correcto = verificar(positivos[:MUESTRA_LARK] + negativos[:10])
+
+    programaciones(positivos)
+    programaciones(negativos)
+    atencion(positivos)
+    atencion(negativos)
+
+    print("\n📊 RESUMEN")
+    print("=" * 60)
+    if correcto:
+        print("✅ El front end devuelve los mismos resultados que Lark y el regex")
+    else:
+        print("❌ El front end difiere de Lark o del regex")
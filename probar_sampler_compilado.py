@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Script para comparar el sampler compilado (NumPy) con el motor genético escalar
+Verifica que las distribuciones coincidan y mide la velocidad de ambos
+"""
+
+import random
+import time
+from collections import Counter
+
+from genetic_diversity_engine_advanced import AdvancedGeneticDiversityEngine
+from genetic_profile_sampler import CompiledProfileSampler
+
+NACIONALIDAD = "venezolana"
+REGION = "aleatorio"
+GENERO = "female"
+EDAD_MIN = 18
+EDAD_MAX = 50
+# "dark" evita colores de región sin tonalidades definidas en el motor de cabello
+CONTROLES = {"beauty_control": "normal", "skin_control": "auto", "hair_control": "dark", "eye_control": "auto"}
+
+CAMPOS = ["region", "face_shape", "jawline", "eye_color", "eye_color_shade", "skin_tone", "skin_tone_shade",
+          "skin_undertone", "freckles", "wrinkles", "hair_color", "hair_texture", "hair_style", "beauty_level"]
+CAMPOS_LISTA = ["skin_imperfections", "attractiveness_factors", "genetic_heritage", "ethnic_features"]
+
+
+def perfiles_escalares(motor, cantidad):
+    """Genera perfiles con generate_advanced_genetic_profile (un perfil por llamada)"""
+    return [
+        motor.generate_advanced_genetic_profile(NACIONALIDAD, REGION, GENERO, random.randint(EDAD_MIN, EDAD_MAX), **CONTROLES)
+        for _ in range(cantidad)
+    ]
+
+
+def frecuencias(perfiles, campo):
+    total = len(perfiles)
+    if campo in CAMPOS_LISTA:
+        conteo = Counter(valor for perfil in perfiles for valor in getattr(perfil, campo))
+    else:
+        conteo = Counter(getattr(perfil, campo) for perfil in perfiles)
+    return {clave: valor / total for clave, valor in conteo.items()}
+
+
+def comparar_distribuciones(cantidad=20000):
+    """Compara frecuencias por campo; la diferencia máxima debería ser del orden del ruido de muestreo"""
+    print(f"🧬 Comparando distribuciones ({cantidad} perfiles)")
+    print("=" * 60)
+
+    motor = AdvancedGeneticDiversityEngine()
+    escalares = perfiles_escalares(motor, cantidad)
+    compilados = CompiledProfileSampler(motor, seed=1234).sample_profiles(
+        cantidad, NACIONALIDAD, REGION, GENERO, age_min=EDAD_MIN, age_max=EDAD_MAX, **CONTROLES
+    )
+
+    # Tolerancia ~4 desviaciones estándar de una proporción en 0.5
+    tolerancia = 4 * (0.25 / cantidad) ** 0.5 * 2 ** 0.5
+    fallos = 0
+    for campo in CAMPOS + CAMPOS_LISTA:
+        a = frecuencias(escalares, campo)
+        b = frecuencias(compilados, campo)
+        diferencia = max(abs(a.get(clave, 0.0) - b.get(clave, 0.0)) for clave in set(a) | set(b))
+        estado = "✅" if diferencia <= tolerancia else "❌"
+        if diferencia > tolerancia:
+            fallos += 1
+        print(f"   {estado} {campo:<24} diferencia máxima: {diferencia:.4f}")
+
+    print(f"\n   Tolerancia: {tolerancia:.4f}")
+    return fallos == 0
+
+
+def medir_velocidad(cantidad=100000):
+    """Mide perfiles por segundo del motor escalar y del sampler compilado"""
+    print(f"\n⚡ Velocidad ({cantidad} perfiles)")
+    print("=" * 60)
+
+    motor = AdvancedGeneticDiversityEngine()
+    sampler = CompiledProfileSampler(motor, seed=1)
+    # Compilar tablas antes de medir
+    sampler.sample_columns(10, NACIONALIDAD, REGION, GENERO, **CONTROLES)
+
+    inicio = time.time()
+    perfiles_escalares(motor, cantidad)
+    tiempo_escalar = time.time() - inicio
+
+    inicio = time.time()
+    sampler.sample_columns(cantidad, NACIONALIDAD, REGION, GENERO, age_min=EDAD_MIN, age_max=EDAD_MAX, **CONTROLES)
+    tiempo_columnas = time.time() - inicio
+
+    inicio = time.time()
+    sampler.sample_profiles(cantidad, NACIONALIDAD, REGION, GENERO, age_min=EDAD_MIN, age_max=EDAD_MAX, **CONTROLES)
+    tiempo_perfiles = time.time() - inicio
+
+    print(f"   Motor escalar:            {tiempo_escalar:.2f}s ({cantidad / tiempo_escalar:,.0f} perfiles/s)")
+    print(f"   Sampler (columnas NumPy): {tiempo_columnas:.2f}s ({cantidad / tiempo_columnas:,.0f} perfiles/s, x{tiempo_escalar / tiempo_columnas:.1f})")
+    print(f"   Sampler (perfiles):       {tiempo_perfiles:.2f}s ({cantidad / tiempo_perfiles:,.0f} perfiles/s, x{tiempo_escalar / tiempo_perfiles:.1f})")
+
+
+if __name__ == "__main__":
+    print("🚀 PRUEBA DEL SAMPLER GENÉTICO COMPILADO")
+    print("=" * 60)
+
+    correcto = comparar_distribuciones()
+    medir_velocidad()
+
+    print("\n📊 RESUMEN")
+    print("=" * 60)
+    if correcto:
+        print("✅ El sampler compilado reproduce las distribuciones del motor")
+    else:
+        print("❌ Hay campos con distribuciones distintas al motor")
@@ -0,0 +1,190 @@
+"""
+Índice persistente de firmas de perfiles para el generador masivo
+Detecta duplicados exactos y casi-duplicados (distancia de Hamming por campos)
+entre todas las corridas de un directorio de salida, usando SQLite
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Sequence
+
+# Tipos de colisión
+EXACT = "exact"
+NEAR = "near"
+
+
+class ProfileSignatureIndex:
+    """
+    Índice de firmas en disco (SQLite) compartido por todas las corridas
+
+    La firma de un perfil son los valores de `fields`. Dos perfiles están a distancia d
+    si difieren en d de esos campos. Para encontrar casi-duplicados sin recorrer todo el
+    índice, los campos se reparten en max_distance + 1 bandas: si dos firmas están a
+    distancia <= max_distance, al menos una banda coincide exactamente (principio del
+    palomar), así que solo se comparan los perfiles que comparten alguna banda.
+    """
+
+    filename = "profile_signatures.sqlite"
+
+    def __init__(self, root_dir, fields: Sequence[str], kind: str = "profile", max_distance: int = 0):
+        """
+        Abre (o crea) el índice de un directorio de salida
+
+        Args:
+            root_dir: Directorio raíz de las corridas (p.ej. outputs/pasaportes_masivos)
+            fields: Campos del perfil que forman la firma
+            kind: Espacio de nombres de las firmas (perfiles, prompts...)
+            max_distance: Campos distintos hasta los que dos perfiles se consideran casi-duplicados (0 = solo exactos)
+        """
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.root_dir / self.filename
+        self.fields = list(fields)
+        self.kind = kind
+        self.max_distance = max(0, min(int(max_distance), len(self.fields) - 1))
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+        self._sync_bands()
+
+    def _create_schema(self):
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS signatures ("
+                "kind TEXT, digest TEXT, fields TEXT, owner TEXT, batch TEXT, created_at REAL, "
+                "PRIMARY KEY (kind, digest))"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS bands (kind TEXT, band INTEGER, value TEXT, digest TEXT)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS bands_lookup ON bands (kind, band, value)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (kind TEXT PRIMARY KEY, fields TEXT, max_distance INTEGER)")
+
+    def _sync_bands(self):
+        """Recalcula las bandas si el índice se creó con otros campos u otra distancia"""
+        row = self._conn.execute("SELECT fields, max_distance FROM meta WHERE kind = ?", (self.kind,)).fetchone()
+        if row and json.loads(row[0]) == self.fields and row[1] == self.max_distance:
+            return
+
+        with self._conn:
+            self._conn.execute("DELETE FROM bands WHERE kind = ?", (self.kind,))
+            stored = self._conn.execute("SELECT digest, fields FROM signatures WHERE kind = ?", (self.kind,)).fetchall()
+            for digest, fields_json in stored:
+                signature = self._signature(json.loads(fields_json))
+                self._insert_bands(digest, signature)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (kind, fields, max_distance) VALUES (?, ?, ?)",
+                (self.kind, json.dumps(self.fields), self.max_distance)
+            )
+
+    def _signature(self, profile: Dict[str, Any]) -> List[str]:
+        return [str(profile.get(field, "")) for field in self.fields]
+
+    @staticmethod
+    def _digest(values: Sequence[str]) -> str:
+        return hashlib.sha1("\x1f".join(values).encode("utf-8")).hexdigest()
+
+    def _bands(self, signature: List[str]) -> List[str]:
+        count = self.max_distance + 1
+        return [self._digest(signature[band::count]) for band in range(count)]
+
+    def _insert_bands(self, digest: str, signature: List[str]):
+        if self.max_distance == 0:
+            return
+        self._conn.executemany(
+            "INSERT INTO bands (kind, band, value, digest) VALUES (?, ?, ?, ?)",
+            [(self.kind, band, value, digest) for band, value in enumerate(self._bands(signature))]
+        )
+
+    def _insert(self, signature: List[str], owner: Optional[str], batch: str):
+        digest = self._digest(signature)
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO signatures (kind, digest, fields, owner, batch, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (self.kind, digest, json.dumps(dict(zip(self.fields, signature)), ensure_ascii=False), owner, batch, time.time())
+        )
+        if cursor.rowcount:
+            self._insert_bands(digest, signature)
+
+    def _find(self, signature: List[str], owner: Optional[str]) -> Optional[Dict[str, Any]]:
+        digest = self._digest(signature)
+        row = self._conn.execute(
+            "SELECT owner, batch FROM signatures WHERE kind = ? AND digest = ?", (self.kind, digest)
+        ).fetchone()
+        if row:
+            if owner is not None and row[0] == owner:
+                # El mismo trabajo (reintento o reanudación) no choca consigo mismo
+                return None
+            return {"type": EXACT, "distance": 0, "owner": row[0], "batch": row[1]}
+
+        if self.max_distance == 0:
+            return None
+
+        bands = self._bands(signature)
+        clauses = " OR ".join("(b.band = ? AND b.value = ?)" for _ in bands)
+        params = [self.kind]
+        for band, value in enumerate(bands):
+            params.extend((band, value))
+        candidates = self._conn.execute(
+            f"SELECT DISTINCT s.fields, s.owner, s.batch FROM bands b "
+            f"JOIN signatures s ON s.kind = b.kind AND s.digest = b.digest "
+            f"WHERE b.kind = ? AND ({clauses})",
+            params
+        )
+
+        best = None
+        for fields_json, other_owner, batch in candidates:
+            if owner is not None and other_owner == owner:
+                continue
+            other = self._signature(json.loads(fields_json))
+            distance = sum(a != b for a, b in zip(signature, other))
+            if distance <= self.max_distance and (best is None or distance < best["distance"]):
+                best = {"type": NEAR, "distance": distance, "owner": other_owner, "batch": batch}
+        return best
+
+    def find(self, profile: Dict[str, Any], owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Busca un duplicado exacto o casi-duplicado de un perfil
+
+        Args:
+            profile: Perfil a consultar
+            owner: Identificador del trabajo dueño del perfil (sus propias firmas no cuentan como colisión)
+
+        Returns:
+            None si no hay colisión; si no, {'type', 'distance', 'owner', 'batch'}
+        """
+        with self._lock:
+            return self._find(self._signature(profile), owner)
+
+    def add(self, profile: Dict[str, Any], owner: Optional[str] = None, batch: str = ""):
+        """Registra la firma de un perfil (no hace nada si ya existía)"""
+        signature = self._signature(profile)
+        with self._lock, self._conn:
+            self._insert(signature, owner, batch)
+
+    def check_and_add(self, profile: Dict[str, Any], owner: Optional[str] = None, batch: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Consulta y, si no hay colisión, registra el perfil en una sola operación
+
+        Returns:
+            None si el perfil se registró; la colisión encontrada en caso contrario
+        """
+        signature = self._signature(profile)
+        with self._lock, self._conn:
+            collision = self._find(signature, owner)
+            if collision:
+                return collision
+            self._insert(signature, owner, batch)
+        return None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM signatures WHERE kind = ?", (self.kind,)).fetchone()[0]
@@ -1,7 +1,11 @@
 
+import os
+
 import pytest
 import requests
 
+from test.conftest import test_files_path
+
 
 @pytest.fixture()
 def url_img2img(base_url):
@@ -66,3 +70,12 @@ def test_img2img_sd_upscale_performed(url_img2img, simple_img2img_request):
     simple_img2img_request["script_name"] = "sd upscale"
     simple_img2img_request["script_args"] = ["", 8, "Lanczos", 2.0]
     assert requests.post(url_img2img, json=simple_img2img_request).status_code == 200
+
+
+def test_img2img_uploaded_init_image(base_url, url_img2img, simple_img2img_request):
+    with open(os.path.join(test_files_path, "img2img_basic.png"), "rb") as file:
+        response = requests.post(f"{base_url}/sdapi/v1/images", data=file.read())
+    assert response.status_code == 200
+
+    simple_img2img_request["init_images"] = [response.json()["hash"]]
+    assert requests.post(url_img2img, json=simple_img2img_request).status_code == 200
@@ -0,0 +1,59 @@
+import types
+
+import pytest
+import torch
+
+from modules import cond_cache, sd_hijack_clip
+
+
+class FakeTextModel(sd_hijack_clip.TextConditionalModel):
+    def __init__(self):
+        super().__init__()
+        self.hijack = types.SimpleNamespace(fixes=None)
+        self.id_start = self.id_end = self.id_pad = 0
+        self.table = torch.rand(10, 4, generator=torch.Generator().manual_seed(0)) + 0.1
+        self.encoded = 0
+
+    def encode_with_transformers(self, tokens):
+        self.encoded += len(tokens)
+        return self.table[tokens]
+
+
+def make_chunk(tokens, multipliers):
+    chunk = sd_hijack_clip.PromptChunk()
+    chunk.tokens = tokens
+    chunk.multipliers = multipliers
+    return chunk
+
+
+@pytest.fixture
+def model(monkeypatch):
+    opts = types.SimpleNamespace(
+        emphasis="Original",
+        clip_chunk_cache_size_mb=1,
+        CLIP_stop_at_last_layers=1,
+        fp8_storage="Disable",
+        cache_fp16_weight=False,
+    )
+    monkeypatch.setattr(sd_hijack_clip, "opts", opts)
+    monkeypatch.setattr(sd_hijack_clip, "chunk_cache", cond_cache.TensorCache())
+    return FakeTextModel()
+
+
+def test_cached_chunk_matches_uncached(model):
+    plain = make_chunk([0, 1, 2, 3, 4, 0], [1.0] * 6)
+    weighted = make_chunk([0, 5, 6, 7, 8, 0], [1.0, 1.5, 1.5, 0.5, 1.0, 1.0])
+
+    uncached = model.process_tokens([plain.tokens], [plain.multipliers])
+    cold = model.process_chunks_with_cache([plain, weighted])[0:1]
+    warm = model.process_chunks_with_cache([plain])
+    mixed = model.process_chunks_with_cache([weighted, plain])[1:2]
+
+    assert torch.equal(cold, uncached)
+    assert torch.equal(warm, uncached)
+    assert torch.equal(mixed, uncached)
+    assert model.encoded == 3
+
+    # "Original" emphasis restores the mean of the whole batch, so encoding the chunks together would not match
+    batched = model.process_tokens([plain.tokens, weighted.tokens], [plain.multipliers, weighted.multipliers])
+    assert not torch.equal(batched[0:1], uncached)
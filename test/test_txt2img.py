@@ -88,3 +88,55 @@ def test_txt2img_multiple_batches_performed(url_txt2img, simple_txt2img_request)
 def test_txt2img_batch_performed(url_txt2img, simple_txt2img_request):
     simple_txt2img_request["batch_size"] = 2
     assert requests.post(url_txt2img, json=simple_txt2img_request).status_code == 200
+
+
+def test_txt2img_batch_endpoint_writes_manifest(base_url, simple_txt2img_request):
+    simple_txt2img_request["batch_size"] = 2
+    request = {
+        "parameters": simple_txt2img_request,
+        "jobs": [{"id": f"job-{i}", "prompt": f"example prompt {i}", "seed": i, "metadata": {"index": i}} for i in range(3)],
+        "output_dir": "test-batch",
+    }
+    response = requests.post(f"{base_url}/sdapi/v1/txt2img-batch", json=request)
+    assert response.status_code == 200
+
+    result = response.json()
+    assert [entry["id"] for entry in result["manifest"]] == ["job-0", "job-1", "job-2"]
+    assert result["generated"] == 3
+    assert [entry["seed"] for entry in result["manifest"]] == [0, 1, 2]
+
+
+def test_txt2img_batch_endpoint_rejects_outside_dir(base_url, simple_txt2img_request):
+    request = {"parameters": simple_txt2img_request, "jobs": [{"id": "job", "prompt": "example prompt"}], "output_dir": "../../outside"}
+    assert requests.post(f"{base_url}/sdapi/v1/txt2img-batch", json=request).status_code == 400
+
+
+def test_txt2img_response_format_image(url_txt2img, simple_txt2img_request):
+    simple_txt2img_request["response_format"] = "image"
+    response = requests.post(url_txt2img, json=simple_txt2img_request)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("image/")
+
+
+def test_txt2img_response_format_image_rejects_batch(url_txt2img, simple_txt2img_request):
+    simple_txt2img_request["response_format"] = "image"
+    simple_txt2img_request["batch_size"] = 2
+    assert requests.post(url_txt2img, json=simple_txt2img_request).status_code == 422
+
+
+def test_txt2img_response_format_hash(base_url, url_txt2img, simple_txt2img_request):
+    simple_txt2img_request["response_format"] = "hash"
+    response = requests.post(url_txt2img, json=simple_txt2img_request)
+    assert response.status_code == 200
+
+    image_hash = response.json()["images"][0]
+    assert requests.get(f"{base_url}/sdapi/v1/images/{image_hash}").status_code == 200
+
+
+def test_txt2img_stream(base_url, simple_txt2img_request):
+    simple_txt2img_request["n_iter"] = 2
+    response = requests.post(f"{base_url}/sdapi/v1/txt2img-stream", json=simple_txt2img_request, stream=True)
+    assert response.status_code == 200
+
+    events = [line[len("event: "):] for line in response.iter_lines(decode_unicode=True) if line.startswith("event: ")]
+    assert events == ["image", "image", "done"]
@@ -28,6 +28,24 @@ def test_options_write(base_url):
     "sdapi/v1/realesrgan-models",
     "sdapi/v1/prompt-styles",
     "sdapi/v1/embeddings",
+    "sdapi/v1/model-pool",
+    "sdapi/v1/memory",
+    "sdapi/v1/queue",
 ])
 def test_get_api_url(base_url, url):
     assert requests.get(f"{base_url}/{url}").status_code == 200
+
+
+def test_queue_cancel_unknown_task(base_url):
+    response = requests.post(f"{base_url}/sdapi/v1/queue/cancel", json={"id_task": "task(no such task)"})
+    assert response.status_code == 404
+
+
+def test_model_pool_preload_unknown_checkpoint(base_url):
+    response = requests.post(f"{base_url}/sdapi/v1/model-pool/preload", json={"sd_model_checkpoint": "no such checkpoint"})
+    assert response.status_code == 404
+
+
+def test_refresh_all(base_url):
+    assert requests.post(f"{base_url}/sdapi/v1/refresh-all").status_code == 200
+    assert requests.get(f"{base_url}/sdapi/v1/sd-models").status_code == 200
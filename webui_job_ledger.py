@@ -0,0 +1,196 @@
+"""
+Registro persistente de trabajos para el generador masivo
+Ledger JSONL de solo-anexado que permite reanudar corridas interrumpidas
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+# Estados posibles de un trabajo
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobLedger:
+    """Registro de trabajos en disco (JSONL de solo-anexado) con reintentos y backoff"""
+
+    filename = "jobs.jsonl"
+
+    def __init__(self, batch_dir, max_attempts: int = 3, backoff_base: float = 2.0, backoff_max: float = 60.0):
+        """
+        Abre (o crea) el ledger de un directorio de lote y reproduce su historial
+
+        Args:
+            batch_dir: Directorio del lote donde vive jobs.jsonl
+            max_attempts: Intentos máximos por trabajo antes de abandonarlo
+            backoff_base: Segundos de espera tras el primer fallo (se duplica en cada reintento)
+            backoff_max: Espera máxima entre reintentos
+        """
+        self.batch_dir = Path(batch_dir)
+        self.batch_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.batch_dir / self.filename
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._order: List[str] = []
+
+        self._replay()
+
+    def _replay(self):
+        """Reconstruye el estado a partir del historial; los trabajos 'running' vuelven a 'pending'"""
+        if not self.path.exists():
+            return
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Última línea truncada por un crash: se ignora
+                    continue
+                self._apply(record)
+
+    def _apply(self, record: Dict[str, Any]):
+        event = record.get("event")
+        job_id = record.get("job_id")
+
+        if event == "add":
+            if job_id not in self._jobs:
+                self._order.append(job_id)
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "profile": record.get("profile", {}),
+                "seed": record.get("seed", -1),
+                "state": PENDING,
+                "attempts": 0,
+                "retry_at": 0.0,
+                "error": None,
+                "output": None,
+            }
+            return
+
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+
+        if event == "done":
+            job["state"] = DONE
+            job["output"] = record.get("output")
+        elif event == "failed":
+            job["attempts"] = record.get("attempts", job["attempts"] + 1)
+            job["error"] = record.get("error")
+            job["retry_at"] = record.get("retry_at", 0.0)
+            job["state"] = FAILED
+
+    def _append(self, record: Dict[str, Any]):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def add_jobs(self, profiles: List[Dict[str, Any]], seeds: List[int]):
+        """
+        Registra nuevos trabajos en el ledger
+
+        Args:
+            profiles: Perfiles de diversidad
+            seeds: Seed asignada a cada perfil
+        """
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                for profile, seed in zip(profiles, seeds):
+                    job_id = f"{len(self._order):06d}"
+                    record = {"event": "add", "job_id": job_id, "profile": profile, "seed": seed}
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    self._apply(record)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _is_claimable(self, job: Dict[str, Any], now: float) -> bool:
+        if job["state"] == PENDING:
+            return True
+        return job["state"] == FAILED and job["attempts"] < self.max_attempts and job["retry_at"] <= now
+
+    def claim(self, count: int) -> List[Dict[str, Any]]:
+        """
+        Toma hasta `count` trabajos listos (pendientes o fallidos cuyo backoff ya venció)
+
+        Returns:
+            Lista de copias de los trabajos reclamados
+        """
+        now = time.time()
+        claimed = []
+        with self._lock:
+            for job_id in self._order:
+                if len(claimed) >= count:
+                    break
+                job = self._jobs[job_id]
+                if self._is_claimable(job, now):
+                    job["state"] = RUNNING
+                    claimed.append(dict(job))
+        return claimed
+
+    def mark_done(self, job_id: str, output: Optional[str] = None):
+        """Marca un trabajo como completado"""
+        record = {"event": "done", "job_id": job_id, "output": output, "time": time.time()}
+        with self._lock:
+            self._append(record)
+            self._apply(record)
+
+    def mark_failed(self, job_id: str, error: str = "", retry: bool = True):
+        """
+        Marca un trabajo como fallido y programa su reintento con backoff exponencial
+
+        Args:
+            retry: False para errores deterministas (reintentar daría el mismo error): el trabajo se abandona de inmediato
+        """
+        with self._lock:
+            attempts = self._jobs[job_id]["attempts"] + 1
+            if not retry:
+                attempts = max(attempts, self.max_attempts)
+            delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+            record = {"event": "failed", "job_id": job_id, "attempts": attempts, "error": error, "retry_at": time.time() + delay}
+            self._append(record)
+            self._apply(record)
+
+    def next_retry_in(self) -> Optional[float]:
+        """
+        Segundos hasta que el próximo trabajo fallido pueda reintentarse
+
+        Returns:
+            None si no queda ningún trabajo reintentable
+        """
+        now = time.time()
+        with self._lock:
+            waits = [
+                job["retry_at"] - now
+                for job in self._jobs.values()
+                if job["state"] == FAILED and job["attempts"] < self.max_attempts
+            ]
+        return max(0.0, min(waits)) if waits else None
+
+    def counts(self) -> Dict[str, int]:
+        """Conteo de trabajos por estado (los fallidos sin intentos restantes cuentan como 'abandoned')"""
+        result = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0, "abandoned": 0, "total": len(self._order)}
+        with self._lock:
+            for job in self._jobs.values():
+                if job["state"] == FAILED and job["attempts"] >= self.max_attempts:
+                    result["abandoned"] += 1
+                else:
+                    result[job["state"]] += 1
+        return result
+
+    def __len__(self):
+        return len(self._order)
@@ -13,11 +13,25 @@ import random
 import json
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Callable
-from collections import deque
 import re
 from datetime import datetime
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+import consulta_data
+from genetic_diversity_engine import derive_seed, new_master_seed
+from webui_job_ledger import JobLedger
+from profile_signature_index import ProfileSignatureIndex
+
+# Campos que forman la firma de un perfil y de los rasgos aleatorios del prompt
+PROFILE_SIGNATURE_FIELDS = [
+    "nationality", "gender", "age", "skin_tone", "hair_color", "hair_style", "eye_color",
+    "facial_structure", "facial_features", "ethnic_characteristics", "natural_imperfections"
+]
+PROMPT_SIGNATURE_FIELDS = [
+    "region", "skin_tone", "hair_color", "hair_style", "eye_color", "eye_shape",
+    "face_shape", "nose_shape", "lip_shape", "eyebrows", "jawline", "cheekbones"
+]
 
 class WebUIMassiveGenerator:
     """Generador masivo integrado para WebUI con todas las funcionalidades avanzadas"""
@@ -43,17 +57,30 @@ class WebUIMassiveGenerator:
         # Configuración de optimización
         self.batch_size = 4  # Tamaño óptimo de lote
         self.max_workers = 2  # Número de workers paralelos
-        self.memory_threshold = 0.8  # Umbral de memoria (80%)
+        self.memory_threshold = 0.8  # Umbral alto de memoria (80%): por encima se limpia
+        self.memory_low_watermark = 0.6  # Umbral bajo (60%): objetivo de cada limpieza
+        self.memory_cleanup_cooldown = 16  # Trabajos a esperar si una limpieza no alcanzó el umbral bajo
+        self.queue_depth = 8  # Capacidad de cada cola entre etapas del pipeline
+        self.near_duplicate_distance = 0  # Campos distintos hasta los que un perfil cuenta como casi-duplicado (0 = solo exactos)
+        self.signature_max_attempts = 20  # Perfiles candidatos por índice antes de aceptar una colisión
         
         # Estadísticas
         self.stats = {
             'total_generated': 0,
             'total_failed': 0,
             'total_time': 0,
-            'memory_cleanups': 0
+            'memory_cleanups': 0,
+            'memory_reclaimed_bytes': 0,
+            'last_memory_cleanup': None,  # Solo la última limpieza: en corridas masivas una lista crecería sin límite
+            'signature_collisions': {'exact': 0, 'near': 0},
+            'signature_unresolved': 0,
+            'stages': {}
         }
-        # Mantener huella de combinaciones recientes para evitar repeticiones
-        self._recent_signatures: deque[str] = deque(maxlen=100)
+        self._cleanup_cooldown_left = 0
+        self._stage_lock = threading.Lock()
+        # Índices de firmas persistentes (perfiles y rasgos de prompt), compartidos por todas las corridas de output_dir
+        self._profile_index: Optional[ProfileSignatureIndex] = None
+        self._prompt_index: Optional[ProfileSignatureIndex] = None
         
         # Datos de diversidad étnica
         self.diversity_data = self._load_diversity_data()
@@ -107,6 +134,36 @@ class WebUIMassiveGenerator:
                 "natural skin texture", "subtle skin blemishes", "natural skin pores",
                 "freckles", "moles", "natural skin variations", "age spots",
                 "fine lines", "natural wrinkles", "realistic skin texture"
+            ],
+            # Rasgos que lee _generate_unique_prompt (sin el sufijo que agrega el propio prompt)
+            "regions": [
+                "Caracas", "La Guaira", "Valencia", "Maracay", "Maracaibo", "Barquisimeto",
+                "Ciudad Guayana", "Ciudad Bolívar", "Puerto Ayacucho", "San Fernando de Apure",
+                "Barinas", "Mérida", "San Cristóbal", "Trujillo", "Valera", "Cumaná",
+                "Maturín", "Barcelona", "Puerto La Cruz", "El Tigre", "Porlamar",
+                "Coro", "Punto Fijo", "Guanare", "San Juan de los Morros", "San Carlos",
+                "Yaritagua", "Tucupita"
+            ],
+            "skin_textures": [
+                "smooth", "natural", "textured", "fine", "porous", "mature", "youthful"
+            ],
+            "eye_shapes": [
+                "almond", "round", "slightly hooded", "slightly upturned", "slightly downturned", "deep set"
+            ],
+            "nose_shapes": [
+                "straight", "slightly aquiline", "button", "broad", "refined", "nubian"
+            ],
+            "lip_shapes": [
+                "full", "medium fullness", "defined", "thin upper lip", "balanced lips", "heart-shaped"
+            ],
+            "eyebrows": [
+                "natural", "slightly arched", "straight", "softly curved", "thick natural"
+            ],
+            "jawlines": [
+                "soft", "defined", "slightly rounded", "angular"
+            ],
+            "cheekbones": [
+                "subtle", "defined", "high", "prominent"
             ]
         }
         return diversity_data
@@ -117,7 +174,9 @@ class WebUIMassiveGenerator:
                                  age_min: int = 18,
                                  age_max: int = 80,
                                  quantity: int = 10,
-                                 progress_callback: Callable = None) -> Dict[str, Any]:
+                                 progress_callback: Callable = None,
+                                 resume_dir: Optional[str] = None,
+                                 master_seed: Optional[int] = None) -> Dict[str, Any]:
         """
         Genera múltiples imágenes con diversidad étnica real
         
@@ -128,26 +187,41 @@ class WebUIMassiveGenerator:
             age_max: Edad máxima
             quantity: Cantidad de imágenes a generar
             progress_callback: Callback de progreso
+            resume_dir: Directorio de un lote anterior para reanudarlo desde su jobs.jsonl
+            master_seed: Seed maestra de la corrida (None = aleatoria); cada perfil deriva la suya de (master_seed, índice)
             
         Returns:
             Diccionario con resultados y estadísticas
         """
         start_time = time.time()
-        self.logger.info(f"🚀 Iniciando generación masiva de {quantity} imágenes para {nationality}")
         
-        # Crear directorio de salida con timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        batch_dir = self.output_dir / f"batch_{nationality}_{gender}_{timestamp}"
-        batch_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Generar perfiles únicos de diversidad
-        diversity_profiles = self._generate_diversity_profiles(
-            nationality, gender, age_min, age_max, quantity
-        )
+        if resume_dir:
+            # Reanudar: los perfiles y seeds salen del ledger, no se regeneran
+            batch_dir = Path(resume_dir)
+            ledger = JobLedger(batch_dir)
+            self.logger.info(f"♻️ Reanudando lote {batch_dir.name}: {ledger.counts()}")
+        else:
+            self.logger.info(f"🚀 Iniciando generación masiva de {quantity} imágenes para {nationality}")
+            
+            # Crear directorio de salida con timestamp
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            batch_dir = self.output_dir / f"batch_{nationality}_{gender}_{timestamp}"
+            batch_dir.mkdir(parents=True, exist_ok=True)
+            
+            # Generar perfiles únicos de diversidad
+            if master_seed is None:
+                master_seed = new_master_seed()
+            diversity_profiles = self._generate_diversity_profiles(
+                nationality, gender, age_min, age_max, quantity, master_seed, batch_dir.name
+            )
+            
+            # Registrar cada perfil con su seed en el ledger persistente
+            ledger = JobLedger(batch_dir)
+            ledger.add_jobs(diversity_profiles, [profile["image_seed"] for profile in diversity_profiles])
         
-        # Generar imágenes por lotes
+        # Generar imágenes por lotes tomando trabajos del ledger
         results = self._process_diversity_batch(
-            diversity_profiles, 
+            ledger, 
             batch_dir, 
             progress_callback
         )
@@ -162,10 +236,20 @@ class WebUIMassiveGenerator:
         self.logger.info(f"✅ Generación masiva completada en {total_time:.2f}s")
         self.logger.info(f"📊 Estadísticas: {self.stats}")
         
+        # Un intento fallido que el ledger reintenta no es un trabajo fallido: solo cuentan los abandonados
+        ledger_counts = ledger.counts()
+        
         return {
-            'success': True,
+            'success': not (ledger_counts['abandoned'] > 0 and results['generated'] == 0),
             'generated_count': results['generated'],
-            'failed_count': results['failed'],
+            'failed_count': ledger_counts['abandoned'],
+            'failed_attempts': results['failed'],
+            'ledger': ledger_counts,
+            'signatures': {
+                'collisions': dict(self.stats['signature_collisions']),
+                'unresolved': self.stats['signature_unresolved'],
+                'indexed_profiles': len(self._signature_indexes()[0])
+            },
             'total_time': total_time,
             'stats': self.stats.copy(),
             'output_directory': str(batch_dir)
@@ -176,7 +260,9 @@ class WebUIMassiveGenerator:
                                    gender: str,
                                    age_min: int,
                                    age_max: int,
-                                   quantity: int) -> List[Dict[str, Any]]:
+                                   quantity: int,
+                                   master_seed: int,
+                                   batch: str = "") -> List[Dict[str, Any]]:
         """
         Genera perfiles únicos de diversidad para cada imagen
         
@@ -186,35 +272,61 @@ class WebUIMassiveGenerator:
             age_min: Edad mínima
             age_max: Edad máxima
             quantity: Cantidad de perfiles
+            master_seed: Seed maestra de la corrida
+            batch: Nombre del lote, registrado junto a cada firma
             
         Returns:
             Lista de perfiles de diversidad únicos
         """
         profiles = []
-        used_combinations = set()
+        profile_index, _ = self._signature_indexes()
         
         for i in range(quantity):
-            # Generar combinación única
-            attempts = 0
-            while attempts < 100:  # Evitar bucle infinito
-                age = random.randint(age_min, age_max)
+            # Cada índice tiene su propio generador; los reintentos por colisión siguen en ese mismo flujo
+            profile_seed = derive_seed(master_seed, i)
+            rng = random.Random(profile_seed)
+            owner = f"{master_seed}:{i}"
+            
+            # Generar combinación única respecto a todas las corridas anteriores
+            for attempt in range(self.signature_max_attempts):
+                age = rng.randint(age_min, age_max)
                 age_range = self._get_age_range(age)
-                skin_tone = random.choice(self.diversity_data["skin_tones"])
-                hair_color = random.choice(self.diversity_data["hair_colors"])
-                hair_style = random.choice(self.diversity_data["hair_styles"])
-                eye_color = random.choice(self.diversity_data["eye_colors"])
-                facial_structure = random.choice(self.diversity_data["facial_structures"])
-                facial_features = random.choice(self.diversity_data["facial_features"])
-                ethnic_characteristics = random.choice(self.diversity_data["ethnic_characteristics"])
-                natural_imperfections = random.choice(self.diversity_data["natural_imperfections"])
+                skin_tone = rng.choice(self.diversity_data["skin_tones"])
+                hair_color = rng.choice(self.diversity_data["hair_colors"])
+                hair_style = rng.choice(self.diversity_data["hair_styles"])
+                eye_color = rng.choice(self.diversity_data["eye_colors"])
+                facial_structure = rng.choice(self.diversity_data["facial_structures"])
+                facial_features = rng.choice(self.diversity_data["facial_features"])
+                ethnic_characteristics = rng.choice(self.diversity_data["ethnic_characteristics"])
+                natural_imperfections = rng.choice(self.diversity_data["natural_imperfections"])
                 
-                # Crear combinación única
-                combination = f"{age}_{skin_tone}_{hair_color}_{eye_color}_{facial_structure}"
-                
-                if combination not in used_combinations:
-                    used_combinations.add(combination)
+                candidate = {
+                    "nationality": nationality, "gender": gender, "age": age, "skin_tone": skin_tone,
+                    "hair_color": hair_color, "hair_style": hair_style, "eye_color": eye_color,
+                    "facial_structure": facial_structure, "facial_features": facial_features,
+                    "ethnic_characteristics": ethnic_characteristics, "natural_imperfections": natural_imperfections
+                }
+                collision = profile_index.check_and_add(candidate, owner=owner, batch=batch)
+                if collision is None:
                     break
-                attempts += 1
+                self._record_collision(collision, f"perfil {i}")
+            else:
+                # Espacio de combinaciones agotado: se acepta el último candidato y se deja constancia
+                self.stats['signature_unresolved'] += 1
+                profile_index.add(candidate, owner=owner, batch=batch)
+                self.logger.warning(f"⚠️ Perfil {i}: sin combinación libre tras {self.signature_max_attempts} intentos")
+            
+            # Rasgos del prompt fuera de la firma del perfil, del mismo flujo del índice (tras elegir la combinación)
+            prompt_traits = {
+                "region": rng.choice(self.diversity_data["regions"]),
+                "skin_texture": rng.choice(self.diversity_data["skin_textures"]),
+                "eye_shape": rng.choice(self.diversity_data["eye_shapes"]),
+                "nose_shape": rng.choice(self.diversity_data["nose_shapes"]),
+                "lip_shape": rng.choice(self.diversity_data["lip_shapes"]),
+                "eyebrows": rng.choice(self.diversity_data["eyebrows"]),
+                "jawline": rng.choice(self.diversity_data["jawlines"]),
+                "cheekbones": rng.choice(self.diversity_data["cheekbones"])
+            }
             
             # Crear perfil único
             profile = {
@@ -230,6 +342,11 @@ class WebUIMassiveGenerator:
                 "facial_features": facial_features,
                 "ethnic_characteristics": ethnic_characteristics,
                 "natural_imperfections": natural_imperfections,
+                **prompt_traits,
+                "master_seed": master_seed,
+                "profile_index": i,
+                "profile_seed": profile_seed,
+                "image_seed": derive_seed(master_seed, i, "image") % 2147483647 + 1,
                 "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
             }
             
@@ -237,6 +354,26 @@ class WebUIMassiveGenerator:
         
         return profiles
     
+    def _signature_indexes(self):
+        """Abre (una vez) los índices de firmas de perfiles y de prompts de output_dir"""
+        if self._profile_index is None:
+            self._profile_index = ProfileSignatureIndex(
+                self.output_dir, PROFILE_SIGNATURE_FIELDS, kind="profile", max_distance=self.near_duplicate_distance
+            )
+            self._prompt_index = ProfileSignatureIndex(
+                self.output_dir, PROMPT_SIGNATURE_FIELDS, kind="prompt", max_distance=self.near_duplicate_distance
+            )
+        return self._profile_index, self._prompt_index
+    
+    def _record_collision(self, collision: Dict[str, Any], what: str):
+        """Contabiliza una colisión de firma y la reporta"""
+        with self._stage_lock:
+            self.stats['signature_collisions'][collision['type']] += 1
+        self.logger.debug(
+            f"🔁 {what}: colisión {collision['type']} (distancia {collision['distance']}) "
+            f"con {collision['owner']} del lote {collision['batch']}"
+        )
+    
     def _get_age_range(self, age: int) -> str:
         """Convierte edad numérica a rango de edad"""
         if age <= 25:
@@ -253,176 +390,290 @@ class WebUIMassiveGenerator:
             return "66-75 years old"
     
     def _process_diversity_batch(self, 
-                               profiles: List[Dict[str, Any]], 
+                               ledger: JobLedger, 
                                output_dir: Path,
                                progress_callback: Callable = None) -> Dict[str, int]:
         """
-        Procesa lotes de perfiles de diversidad
+        Procesa los trabajos del ledger con un pipeline de etapas concurrentes
+        
+        Etapas (unidas por colas acotadas):
+            prompt  -> construcción de prompt y parámetros
+            sample  -> llamada txt2img (max_workers hilos, la GPU nunca espera al disco)
+            decode  -> decodificación base64 de la imagen
+            write   -> escritura de PNG + JSON y registro en el ledger
         
         Args:
-            profiles: Lista de perfiles de diversidad
+            ledger: Ledger de trabajos del lote
             output_dir: Directorio de salida
             progress_callback: Callback de progreso
             
         Returns:
-            Diccionario con conteos de éxito y fallos
+            Diccionario con trabajos generados e intentos fallidos (incluye los que el ledger reintentó)
         """
-        generated_count = 0
-        failed_count = 0
-        total_profiles = len(profiles)
+        total_jobs = len(ledger)
+        counters = {'generated': 0, 'failed': 0, 'in_flight': 0}
+        counters_lock = threading.Lock()
         
-        # Dividir en lotes para optimización de memoria
-        batch_size = min(self.batch_size, total_profiles)
-        batches = [profiles[i:i + batch_size] for i in range(0, total_profiles, batch_size)]
+        prompt_q: queue.Queue = queue.Queue(maxsize=self.queue_depth)
+        decode_q: queue.Queue = queue.Queue(maxsize=self.queue_depth)
+        write_q: queue.Queue = queue.Queue(maxsize=self.queue_depth)
+        stop = object()
         
-        for batch_idx, batch in enumerate(batches):
-            self.logger.info(f"🔄 Procesando lote {batch_idx + 1}/{len(batches)} ({len(batch)} perfiles)")
-            
-            # Verificar memoria antes del lote
-            if self._should_cleanup_memory():
-                self._perform_memory_cleanup()
-            
-            # Procesar lote
-            batch_results = self._process_single_batch(batch, output_dir)
-            
-            # Actualizar contadores
-            generated_count += batch_results['generated']
-            failed_count += batch_results['failed']
+        for stage in ('prompt', 'sample', 'decode', 'write'):
+            self.stats['stages'][stage] = {'items': 0, 'errors': 0, 'busy_time': 0.0}
+        
+        def finish(job, ok, error=None, output=None, retry=True):
+            with counters_lock:
+                counters['in_flight'] -= 1
+                if ok:
+                    counters['generated'] += 1
+                else:
+                    counters['failed'] += 1
+                self.stats['total_generated'] = counters['generated']
+                self.stats['total_failed'] = counters['failed']
             
-            # Actualizar estadísticas
-            self.stats['total_generated'] = generated_count
-            self.stats['total_failed'] = failed_count
+            if ok:
+                ledger.mark_done(job['job_id'], output=output)
+            else:
+                ledger.mark_failed(job['job_id'], error or "unknown error", retry=retry)
             
-            # Callback de progreso
             if progress_callback:
-                processed = (batch_idx + 1) * len(batch)
-                progress_callback(
-                    processed, 
-                    total_profiles, 
-                    f"Lote {batch_idx + 1}/{len(batches)} completado"
-                )
+                progress_callback(ledger.counts()['done'], total_jobs, f"Trabajo {job['job_id']} {'completado' if ok else 'fallido'}")
+        
+        def prompt_stage():
+            while True:
+                batch = ledger.claim(1)
+                if not batch:
+                    # Esperar reintentos pendientes o a que terminen los trabajos en vuelo
+                    wait = ledger.next_retry_in()
+                    with counters_lock:
+                        in_flight = counters['in_flight']
+                    if wait is None and in_flight == 0:
+                        break
+                    time.sleep(min(wait, 0.5) if wait is not None else 0.05)
+                    continue
+                
+                job = batch[0]
+                with counters_lock:
+                    counters['in_flight'] += 1
+                
+                # Verificar presión de memoria antes de cada trabajo (medición barata)
+                if self._should_cleanup_memory():
+                    self._perform_memory_cleanup()
+                
+                try:
+                    with self._stage_timer('prompt'):
+                        params = self._build_generation_params(job['profile'], job['seed'])
+                except Exception as e:
+                    self._stage_error('prompt')
+                    self.logger.error(f"❌ Error construyendo prompt: {e}")
+                    # El prompt sale solo del perfil y la seed: un reintento fallaría igual
+                    finish(job, False, f"{type(e).__name__}: {e}", retry=False)
+                    continue
+                
+                prompt_q.put((job, params))
+            
+            for _ in range(self.max_workers):
+                prompt_q.put(stop)
+        
+        def sample_stage():
+            while True:
+                item = prompt_q.get()
+                if item is stop:
+                    break
+                job, params = item
+                try:
+                    with self._stage_timer('sample'):
+                        result = self._sample_image(params)
+                    if not (result and result.get('images')):
+                        raise RuntimeError("no image returned")
+                except Exception as e:
+                    self._stage_error('sample')
+                    self.logger.error(f"❌ Error generando imagen: {e}")
+                    finish(job, False, str(e))
+                    continue
+                
+                decode_q.put((job, params, result))
+        
+        def decode_stage():
+            while True:
+                item = decode_q.get()
+                if item is stop:
+                    break
+                job, params, result = item
+                try:
+                    with self._stage_timer('decode'):
+                        image_data = self._decode_image(result)
+                except Exception as e:
+                    self._stage_error('decode')
+                    self.logger.error(f"❌ Error decodificando imagen: {e}")
+                    finish(job, False, str(e))
+                    continue
+                
+                write_q.put((job, params, result, image_data))
             
-            # Pausa entre lotes para liberar memoria
-            if batch_idx < len(batches) - 1:
-                time.sleep(0.5)
+            write_q.put(stop)
+        
+        def write_stage():
+            while True:
+                item = write_q.get()
+                if item is stop:
+                    break
+                job, params, result, image_data = item
+                try:
+                    with self._stage_timer('write'):
+                        filepath = self._write_image(job['profile'], params, result, image_data, output_dir)
+                except Exception as e:
+                    self._stage_error('write')
+                    self.logger.error(f"❌ Error guardando imagen: {e}")
+                    finish(job, False, str(e))
+                    continue
+                
+                finish(job, True, output=str(filepath))
+        
+        sample_threads = [threading.Thread(target=sample_stage, name=f"massive-sample-{i}", daemon=True) for i in range(self.max_workers)]
+        threads = [
+            threading.Thread(target=prompt_stage, name="massive-prompt", daemon=True),
+            *sample_threads,
+            threading.Thread(target=decode_stage, name="massive-decode", daemon=True),
+            threading.Thread(target=write_stage, name="massive-write", daemon=True),
+        ]
+        for t in threads:
+            t.start()
+        
+        # Cuando todos los hilos de muestreo terminan, se cierra la etapa de decodificación
+        for t in sample_threads:
+            t.join()
+        decode_q.put(stop)
+        
+        for t in threads:
+            t.join()
         
         return {
-            'generated': generated_count,
-            'failed': failed_count
+            'generated': counters['generated'],
+            'failed': counters['failed']
         }
     
-    def _process_single_batch(self, 
-                            batch: List[Dict[str, Any]], 
-                            output_dir: Path) -> Dict[str, int]:
+    @contextmanager
+    def _stage_timer(self, stage: str):
+        """Acumula tiempo ocupado e items procesados por etapa del pipeline"""
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._stage_lock:
+                stage_stats = self.stats['stages'].setdefault(stage, {'items': 0, 'errors': 0, 'busy_time': 0.0})
+                stage_stats['busy_time'] += elapsed
+                if ok:
+                    stage_stats['items'] += 1
+    
+    def _stage_error(self, stage: str):
+        with self._stage_lock:
+            self.stats['stages'].setdefault(stage, {'items': 0, 'errors': 0, 'busy_time': 0.0})['errors'] += 1
+    
+    def _build_generation_params(self, profile: Dict[str, Any], seed: int = -1) -> Dict[str, Any]:
         """
-        Procesa un solo lote de perfiles
+        Construye prompt y parámetros de generación para un perfil
         
         Args:
-            batch: Lote de perfiles
-            output_dir: Directorio de salida
+            profile: Perfil de diversidad
+            seed: Seed asignada al trabajo en el ledger
             
         Returns:
-            Diccionario con conteos de éxito y fallos
+            Parámetros para txt2img
         """
-        generated = 0
-        failed = 0
-        
-        # Usar ThreadPoolExecutor para procesamiento paralelo limitado
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Crear tareas
-            future_to_profile = {
-                executor.submit(
-                    self._generate_single_diversity_image, 
-                    profile, 
-                    output_dir
-                ): profile for profile in batch
-            }
-            
-            # Procesar resultados
-            for future in as_completed(future_to_profile):
-                profile = future_to_profile[future]
-                try:
-                    result = future.result()
-                    if result:
-                        generated += 1
-                    else:
-                        failed += 1
-                except Exception as e:
-                    self.logger.error(f"Error procesando perfil: {e}")
-                    failed += 1
+        # Generar prompt único basado en el perfil
+        prompt, negative_prompt = self._generate_unique_prompt(profile)
+        
+        # Parámetros con ligera aleatoriedad controlada para mayor diversidad (deterministas para una seed dada)
+        rng = random.Random(seed) if seed != -1 else random.Random()
+        cfg_val = round(rng.uniform(6.5, 8.0), 1)
+        steps_val = rng.randint(22, 30)
+        sampler_val = rng.choice(['DPM++ 2M Karras', 'DPM++ SDE Karras'])
+
+        return {
+            'prompt': prompt,
+            'negative_prompt': negative_prompt,
+            'width': 512,  # Resolución homogénea
+            'height': 512,  # Como misma cámara
+            'steps': steps_val,
+            'cfg_scale': cfg_val,
+            'sampler_name': sampler_val,
+            'seed': seed,
+            'batch_size': 1,
+            'n_iter': 1,
+            'save_images': False,
+            'send_images': True
+        }
+    
+    def _sample_image(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Genera la imagen usando la API de WebUI"""
+        if self.api:
+            return self.api.txt2img(**params)
         
-        return {'generated': generated, 'failed': failed}
+        # Fallback: simular resultado para testing
+        return {'images': ['fake_image_data']}
+    
+    def _decode_image(self, result: Dict[str, Any]) -> Optional[bytes]:
+        """Decodifica la primera imagen del resultado (None en modo simulado)"""
+        if self.api:
+            return base64.b64decode(result['images'][0])
+        return None
+    
+    def _write_image(self, 
+                     profile: Dict[str, Any], 
+                     params: Dict[str, Any], 
+                     result: Dict[str, Any], 
+                     image_data: Optional[bytes], 
+                     output_dir: Path) -> Path:
+        """Escribe la imagen y su configuración JSON en disco"""
+        # Generar nombre de archivo único
+        filename = self._generate_unique_filename(profile)
+        filepath = output_dir / filename
+        
+        if image_data is not None:
+            with open(filepath, 'wb') as f:
+                f.write(image_data)
+        else:
+            # Fallback: crear archivo vacío para testing
+            filepath.touch()
+        
+        # Guardar configuración JSON única
+        self._save_unique_json_config(profile, params, result, filepath)
+        
+        return filepath
     
     def _generate_single_diversity_image(self, 
                                        profile: Dict[str, Any], 
-                                       output_dir: Path) -> bool:
+                                       output_dir: Path,
+                                       seed: int = -1) -> Optional[Path]:
         """
-        Genera una sola imagen con diversidad étnica
+        Genera una sola imagen con diversidad étnica (todas las etapas en serie)
         
         Args:
             profile: Perfil de diversidad
             output_dir: Directorio de salida
+            seed: Seed asignada al trabajo
             
         Returns:
-            True si la generación fue exitosa
+            Ruta de la imagen generada, o None si la generación falló
         """
         try:
-            # Generar prompt único basado en el perfil
-            prompt, negative_prompt = self._generate_unique_prompt(profile)
-            
-            # Parámetros con ligera aleatoriedad controlada para mayor diversidad
-            import random
-            cfg_val = round(random.uniform(6.5, 8.0), 1)
-            steps_val = random.randint(22, 30)
-            sampler_val = random.choice(['DPM++ 2M Karras', 'DPM++ SDE Karras'])
-
-            params = {
-                'prompt': prompt,
-                'negative_prompt': negative_prompt,
-                'width': 512,  # Resolución homogénea
-                'height': 512,  # Como misma cámara
-                'steps': steps_val,
-                'cfg_scale': cfg_val,
-                'sampler_name': sampler_val,
-                'seed': -1,
-                'batch_size': 1,
-                'n_iter': 1,
-                'save_images': False,
-                'send_images': True
-            }
+            params = self._build_generation_params(profile, seed)
+            result = self._sample_image(params)
             
-            # Generar imagen usando la API de WebUI
-            if self.api:
-                result = self.api.txt2img(**params)
-            else:
-                # Fallback: simular resultado para testing
-                result = {'images': ['fake_image_data']}
-            
-            if result and result.get('images'):
-                # Generar nombre de archivo único
-                filename = self._generate_unique_filename(profile)
-                filepath = output_dir / filename
-                
-                # Decodificar y guardar imagen
-                if self.api:
-                    image_data = base64.b64decode(result['images'][0])
-                    with open(filepath, 'wb') as f:
-                        f.write(image_data)
-                else:
-                    # Fallback: crear archivo vacío para testing
-                    filepath.touch()
-                
-                # Guardar configuración JSON única
-                self._save_unique_json_config(profile, params, result, filepath)
-                
-                return True
-            else:
+            if not (result and result.get('images')):
                 self.logger.warning(f"⚠️ No se generó imagen para perfil: {profile['nationality']}")
-                return False
+                return None
+            
+            return self._write_image(profile, params, result, self._decode_image(result), output_dir)
                 
         except Exception as e:
             self.logger.error(f"❌ Error generando imagen: {e}")
-            return False
+            return None
     
     def _generate_unique_prompt(self, profile: Dict[str, Any]) -> tuple:
         """
@@ -434,6 +685,11 @@ class WebUIMassiveGenerator:
         Returns:
             Tupla (prompt, negative_prompt)
         """
+        # Variaciones del prompt reproducibles a partir de la seed del perfil
+        if 'master_seed' in profile:
+            rng = random.Random(derive_seed(profile['master_seed'], profile['profile_index'], "prompt"))
+        else:
+            rng = random.Random()
         nationality = profile['nationality']
         gender = profile['gender']
         age_range = profile['age_range']  # Usar age_range para generación masiva
@@ -456,25 +712,13 @@ class WebUIMassiveGenerator:
             consulta_dir = Path(__file__).parent / "Consulta"
             gui_config_path = consulta_dir / "gui_config.json"
             if gui_config_path.exists():
-                with open(gui_config_path, 'r', encoding='utf-8') as f:
-                    gui_cfg = json.load(f)
+                gui_cfg = consulta_data.load_json(gui_config_path)
                 base_prompt = gui_cfg.get('base_prompt', '')
                 neg_prompt = gui_cfg.get('negative_prompt', '')
 
-                # Sistema de diversidad regional automática
-                import random
-                regiones_venezuela = [
-                    "Caracas", "La Guaira", "Valencia", "Maracay", "Maracaibo", "Barquisimeto",
-                    "Ciudad Guayana", "Ciudad Bolívar", "Puerto Ayacucho", "San Fernando de Apure",
-                    "Barinas", "Mérida", "San Cristóbal", "Trujillo", "Valera", "Cumaná",
-                    "Maturín", "Barcelona", "Puerto La Cruz", "El Tigre", "Porlamar",
-                    "Coro", "Punto Fijo", "Guanare", "San Juan de los Morros", "San Carlos",
-                    "Yaritagua", "Tucupita"
-                ]
-                
                 # Seleccionar región aleatoria si no está especificada
                 if region == "aleatorio" or not region:
-                    region = random.choice(regiones_venezuela)
+                    region = rng.choice(self.diversity_data["regions"])
                 
                 # Selección aleatoria de rasgos físicos para mayor diversidad
                 skin_tones = [
@@ -518,11 +762,11 @@ class WebUIMassiveGenerator:
 
                 # Atributos opcionales (activación por probabilidad)
                 optional_traits = []
-                if random.random() < 0.25:
+                if rng.random() < 0.25:
                     optional_traits.append("light freckles")
-                if random.random() < 0.20:
+                if rng.random() < 0.20:
                     optional_traits.append("few moles")
-                if random.random() < 0.15:
+                if rng.random() < 0.15:
                     optional_traits.append("slight asymmetry")
 
                 # Edad aleatoria dentro del rango si es posible (acepta formatos como "18-25" o "18-25 years old")
@@ -533,33 +777,36 @@ class WebUIMassiveGenerator:
                         if len(nums) >= 2:
                             lo_i, hi_i = int(nums[0]), int(nums[1])
                             if lo_i <= hi_i:
-                                age_text = f"{random.randint(lo_i, hi_i)} years old"
+                                age_text = f"{rng.randint(lo_i, hi_i)} years old"
                 except Exception:
                     pass
 
-                # Intentar generar combinación no repetida
+                # Intentar generar combinación no repetida en todas las corridas
+                _, prompt_index = self._signature_indexes()
+                owner = f"{profile['master_seed']}:{profile['profile_index']}" if 'master_seed' in profile else None
                 for _ in range(6):
-                    rnd_skin_tone = random.choice(skin_tones)
-                    rnd_hair_color = random.choice(hair_colors)
-                    rnd_hair_style = random.choice(hair_styles)
-                    rnd_eye_color = random.choice(eye_colors)
-                    rnd_eye_shape = random.choice(eye_shapes)
-                    rnd_face_shape = random.choice(face_shapes)
-                    rnd_nose_shape = random.choice(nose_shapes)
-                    rnd_lip_shape = random.choice(lip_shapes)
-                    rnd_eyebrows = random.choice(eyebrow_styles)
-                    rnd_jawline = random.choice(jawlines)
-                    rnd_cheekbones = random.choice(cheekbone_defs)
+                    rnd_skin_tone = rng.choice(skin_tones)
+                    rnd_hair_color = rng.choice(hair_colors)
+                    rnd_hair_style = rng.choice(hair_styles)
+                    rnd_eye_color = rng.choice(eye_colors)
+                    rnd_eye_shape = rng.choice(eye_shapes)
+                    rnd_face_shape = rng.choice(face_shapes)
+                    rnd_nose_shape = rng.choice(nose_shapes)
+                    rnd_lip_shape = rng.choice(lip_shapes)
+                    rnd_eyebrows = rng.choice(eyebrow_styles)
+                    rnd_jawline = rng.choice(jawlines)
+                    rnd_cheekbones = rng.choice(cheekbone_defs)
 
-                    signature = ",".join([
-                        region, rnd_skin_tone, rnd_hair_color, rnd_hair_style,
-                        rnd_eye_color, rnd_eye_shape, rnd_face_shape,
-                        rnd_nose_shape, rnd_lip_shape, rnd_eyebrows,
-                        rnd_jawline, rnd_cheekbones
-                    ])
-                    if signature not in self._recent_signatures:
-                        self._recent_signatures.append(signature)
+                    traits = {
+                        "region": region, "skin_tone": rnd_skin_tone, "hair_color": rnd_hair_color,
+                        "hair_style": rnd_hair_style, "eye_color": rnd_eye_color, "eye_shape": rnd_eye_shape,
+                        "face_shape": rnd_face_shape, "nose_shape": rnd_nose_shape, "lip_shape": rnd_lip_shape,
+                        "eyebrows": rnd_eyebrows, "jawline": rnd_jawline, "cheekbones": rnd_cheekbones
+                    }
+                    collision = prompt_index.check_and_add(traits, owner=owner)
+                    if collision is None:
                         break
+                    self._record_collision(collision, "rasgos de prompt")
 
                 # Enriquecer con diversidad regional + rasgos aleatorios por imagen
                 enrichment = (
@@ -772,20 +1019,76 @@ class WebUIMassiveGenerator:
         except Exception as e:
             self.logger.error(f"❌ Error guardando configuración JSON: {e}")
     
+    def _measure_memory(self) -> Dict[str, Any]:
+        """
+        Mide la presión de memoria del proceso
+        
+        Returns:
+            Diccionario con RSS, memoria del allocator de torch (si hay CUDA) y la
+            fracción de uso más alta entre RAM y VRAM
+        """
+        usage = {'rss': 0, 'ram_total': 0, 'torch_reserved': 0, 'torch_allocated': 0, 'vram_total': 0, 'pressure': 0.0}
+        
+        try:
+            import psutil
+            usage['rss'] = psutil.Process().memory_info().rss
+            usage['ram_total'] = psutil.virtual_memory().total
+            usage['pressure'] = usage['rss'] / usage['ram_total']
+        except Exception:
+            pass
+        
+        try:
+            import torch
+            if torch.cuda.is_available():
+                usage['torch_reserved'] = torch.cuda.memory_reserved()
+                usage['torch_allocated'] = torch.cuda.memory_allocated()
+                usage['vram_total'] = torch.cuda.get_device_properties(torch.cuda.current_device()).total_memory
+                usage['pressure'] = max(usage['pressure'], usage['torch_reserved'] / usage['vram_total'])
+        except Exception:
+            pass
+        
+        return usage
+    
     def _should_cleanup_memory(self) -> bool:
-        """Determina si se debe realizar limpieza de memoria"""
-        # Implementación simple - se puede mejorar con psutil
-        return self.stats['memory_cleanups'] < 10  # Límite de limpiezas
+        """Determina si se debe realizar limpieza de memoria según RSS y el allocator de torch"""
+        if self._cleanup_cooldown_left > 0:
+            self._cleanup_cooldown_left -= 1
+            return False
+        
+        return self._measure_memory()['pressure'] >= self.memory_threshold
     
     def _perform_memory_cleanup(self):
-        """Realiza limpieza de memoria"""
+        """Realiza limpieza de memoria y registra lo recuperado"""
         self.logger.info("🧹 Realizando limpieza de memoria...")
+        before = self._measure_memory()
         
         # Forzar recolección de basura
         gc.collect()
         
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+                torch.cuda.ipc_collect()
+        except Exception:
+            pass
+        
+        after = self._measure_memory()
+        reclaimed = max(0, before['rss'] - after['rss']) + max(0, before['torch_reserved'] - after['torch_reserved'])
+        
+        # Si no se alcanzó el umbral bajo, limpiar de nuevo no ayudará de inmediato
+        if after['pressure'] > self.memory_low_watermark:
+            self._cleanup_cooldown_left = self.memory_cleanup_cooldown
+        
         self.stats['memory_cleanups'] += 1
-        self.logger.info("✅ Limpieza de memoria completada")
+        self.stats['memory_reclaimed_bytes'] += reclaimed
+        self.stats['last_memory_cleanup'] = {
+            'time': datetime.now().isoformat(),
+            'pressure_before': round(before['pressure'], 4),
+            'pressure_after': round(after['pressure'], 4),
+            'reclaimed_bytes': reclaimed
+        }
+        self.logger.info(f"✅ Limpieza de memoria completada: {reclaimed / (1024 * 1024):.1f} MB recuperados")
     
     def _perform_final_cleanup(self):
         """Realiza limpieza final completa de memoria"""
@@ -798,7 +1101,6 @@ class WebUIMassiveGenerator:
                 collected = gc.collect()
                 if collected == 0:
                     break
-                time.sleep(0.1)
             objects_after = len(gc.get_objects())
             objects_cleaned = objects_before - objects_after
             
@@ -814,8 +1116,18 @@ class WebUIMassiveGenerator:
         Returns:
             Diccionario con estadísticas
         """
+        with self._stage_lock:
+            stages = {}
+            for stage, stage_stats in self.stats['stages'].items():
+                busy = stage_stats['busy_time']
+                stages[stage] = dict(stage_stats, items_per_second=stage_stats['items'] / busy if busy > 0 else 0.0)
+        
+        stats = self.stats.copy()
+        stats['stages'] = stages
+        
         return {
             'batch_size': self.batch_size,
             'max_workers': self.max_workers,
-            'stats': self.stats.copy()
+            'queue_depth': self.queue_depth,
+            'stats': stats
         }
@@ -17,6 +17,7 @@ Autor: Sistema de Generación de Diversidad Étnica
 Fecha: 2025-01-12
 """
 
+import asyncio
 import json
 import os
 import time
@@ -28,19 +29,116 @@ import argparse
 from PIL import Image
 import io
 
+
+class DecodificadorImagenStream:
+    """
+    Extrae y decodifica en streaming la primera imagen de una respuesta JSON de txt2img
+
+    Recorre la respuesta a medida que llega, sin cargarla entera en memoria: busca la
+    clave de primer nivel "images", y a partir de ahí decodifica el base64 en bloques
+    múltiplos de 4 caracteres que se pueden escribir directamente a disco.
+    """
+
+    def __init__(self):
+        self.terminado = False
+        self._en_imagen = False
+        self._profundidad = 0
+        self._en_cadena = False
+        self._escape = False
+        self._cadena = bytearray()
+        self._ultima_clave = None
+        self._esperando = None  # None -> ':' -> '[' -> '"'
+        self._pendiente = b""
+
+    def alimentar(self, bloque: bytes) -> bytes:
+        """
+        Procesa un bloque de la respuesta
+
+        Returns:
+            Bytes de imagen decodificados disponibles en este bloque
+        """
+        salida = bytearray()
+        i = 0
+        while i < len(bloque) and not self.terminado:
+            if self._en_imagen:
+                fin = bloque.find(b'"', i)
+                datos = bloque[i:] if fin < 0 else bloque[i:fin]
+                salida += self._decodificar(datos.replace(b"\\", b""), final=fin >= 0)
+                if fin < 0:
+                    break
+                self._en_imagen = False
+                self.terminado = True
+                break
+
+            c = bloque[i]
+            i += 1
+            if self._en_cadena:
+                if self._escape:
+                    self._escape = False
+                elif c == 0x5C:  # barra invertida
+                    self._escape = True
+                elif c == 0x22:  # "
+                    self._en_cadena = False
+                    if self._profundidad == 1 and self._esperando is None:
+                        self._ultima_clave = bytes(self._cadena)
+                        self._esperando = b":"
+                elif self._profundidad == 1 and len(self._cadena) < 32:
+                    self._cadena.append(c)
+                continue
+
+            if c in b" \t\r\n":
+                continue
+            if self._esperando == b":" and c == 0x3A:
+                self._esperando = b"[" if self._ultima_clave == b"images" else None
+                continue
+            if self._esperando == b"[":
+                self._esperando = b'"' if c == 0x5B else None
+                if c == 0x5B:
+                    self._profundidad += 1
+                    continue
+            elif self._esperando == b'"':
+                self._esperando = None
+                if c == 0x22:
+                    self._en_imagen = True
+                    continue
+            elif self._esperando == b":":
+                self._esperando = None
+
+            if c == 0x22:
+                self._en_cadena = True
+                self._cadena.clear()
+            elif c in b"{[":
+                self._profundidad += 1
+            elif c in b"}]":
+                self._profundidad -= 1
+        return bytes(salida)
+
+    def _decodificar(self, datos: bytes, final: bool) -> bytes:
+        datos = self._pendiente + datos
+        corte = len(datos) if final else len(datos) - len(datos) % 4
+        self._pendiente = datos[corte:]
+        return base64.b64decode(datos[:corte]) if corte else b""
+
+
 class WebUIPasaportes:
     """Cliente para generar imágenes de pasaportes usando Stable Diffusion WebUI."""
     
-    def __init__(self, webui_url: str = "http://localhost:7860"):
+    def __init__(self, webui_url: str = "http://localhost:7860",
+                 backends: Optional[List[str]] = None,
+                 en_vuelo_por_backend: int = 2):
         """
         Inicializa el cliente de WebUI.
         
         Args:
             webui_url: URL del servidor de Stable Diffusion WebUI
+            backends: URLs de todas las instancias de WebUI para el modo asíncrono (por defecto solo webui_url)
+            en_vuelo_por_backend: Solicitudes simultáneas por instancia en el modo asíncrono
         """
         self.webui_url = webui_url.rstrip('/')
         self.api_url = f"{self.webui_url}/sdapi/v1"
         self.session = requests.Session()
+        self.backends = [url.rstrip('/') for url in (backends or [self.webui_url])]
+        self.en_vuelo_por_backend = max(1, int(en_vuelo_por_backend))
         
     def verificar_conexion(self) -> bool:
         """
@@ -99,31 +197,17 @@ class WebUIPasaportes:
             Datos de la imagen en bytes, o None si falló
         """
         try:
-            # Preparar payload para la API
-            payload = {
-                "prompt": configuracion['prompt_positivo'],
-                "negative_prompt": configuracion['prompt_negativo'],
-                "width": configuracion['configuracion_tecnica']['width'],
-                "height": configuracion['configuracion_tecnica']['height'],
-                "steps": configuracion['configuracion_tecnica']['steps'],
-                "cfg_scale": configuracion['configuracion_tecnica']['cfg_scale'],
-                "sampler_name": configuracion['configuracion_tecnica']['sampler'],
-                "batch_size": 1,
-                "n_iter": 1,
-                "seed": -1,
-                "save_images": False,
-                "send_images": True,
-                # Forzar heredar modelo activo y evitar estilos/LoRAs que desaturen
-                "override_settings": {},
-                "styles": [],
-                "disable_extra_networks": True,
-                "do_not_save_grid": True
-            }
+            payload = self._construir_payload(configuracion)
             
             # Enviar solicitud a la API
             response = self.session.post(f"{self.api_url}/txt2img", json=payload)
             
             if response.status_code == 200:
+                # Con response_format "image" llegan los bytes del PNG tal cual, sin base64
+                if response.headers.get('content-type', '').startswith('image/'):
+                    return response.content
+                
+                # Servidores sin response_format responden JSON con base64
                 result = response.json()
                 if 'images' in result and result['images']:
                     # Decodificar imagen base64
@@ -139,6 +223,29 @@ class WebUIPasaportes:
             print(f"❌ Error inesperado: {e}")
             return None
     
+    def _construir_payload(self, configuracion: Dict[str, Any]) -> Dict[str, Any]:
+        """Payload de /sdapi/v1/txt2img para una configuración."""
+        return {
+            "prompt": configuracion['prompt_positivo'],
+            "negative_prompt": configuracion['prompt_negativo'],
+            "width": configuracion['configuracion_tecnica']['width'],
+            "height": configuracion['configuracion_tecnica']['height'],
+            "steps": configuracion['configuracion_tecnica']['steps'],
+            "cfg_scale": configuracion['configuracion_tecnica']['cfg_scale'],
+            "sampler_name": configuracion['configuracion_tecnica']['sampler'],
+            "batch_size": 1,
+            "n_iter": 1,
+            "seed": -1,
+            "save_images": False,
+            "send_images": True,
+            "response_format": "image",
+            # Forzar heredar modelo activo y evitar estilos/LoRAs que desaturen
+            "override_settings": {},
+            "styles": [],
+            "disable_extra_networks": True,
+            "do_not_save_grid": True
+        }
+    
     def guardar_imagen(self, image_data: bytes, configuracion: Dict[str, Any], 
                       directorio_salida: str = "outputs/pasaportes") -> str:
         """
@@ -152,6 +259,16 @@ class WebUIPasaportes:
         Returns:
             Ruta del archivo guardado
         """
+        ruta_archivo = self._ruta_imagen(configuracion, directorio_salida)
+        
+        # Guardar imagen
+        with open(ruta_archivo, 'wb') as f:
+            f.write(image_data)
+        
+        return str(ruta_archivo)
+    
+    def _ruta_imagen(self, configuracion: Dict[str, Any], directorio_salida: str) -> Path:
+        """Ruta descriptiva de la imagen de una configuración (crea el directorio si no existe)."""
         # Crear directorio si no existe
         output_dir = Path(directorio_salida)
         output_dir.mkdir(parents=True, exist_ok=True)
@@ -163,13 +280,7 @@ class WebUIPasaportes:
         id_imagen = configuracion['id']
         
         nombre_archivo = f"pasaporte_{nacionalidad}_{genero}_{edad}_{id_imagen}.png"
-        ruta_archivo = output_dir / nombre_archivo
-        
-        # Guardar imagen
-        with open(ruta_archivo, 'wb') as f:
-            f.write(image_data)
-        
-        return str(ruta_archivo)
+        return output_dir / nombre_archivo
     
     def procesar_lote(self, archivo_configuraciones: str, 
                      directorio_salida: str = "outputs/pasaportes",
@@ -248,6 +359,170 @@ class WebUIPasaportes:
         
         return estadisticas
     
+    async def procesar_lote_async(self, archivo_configuraciones: str,
+                                  directorio_salida: str = "outputs/pasaportes",
+                                  modelo_preferido: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Procesa un lote repartiendo las configuraciones entre todos los backends.
+        
+        Cada backend tiene `en_vuelo_por_backend` trabajadores que toman configuraciones
+        de una cola común, de modo que las instancias más rápidas procesan más imágenes.
+        Las respuestas se decodifican en streaming directamente a disco.
+        
+        Args:
+            archivo_configuraciones: Ruta al archivo JSON con configuraciones
+            directorio_salida: Directorio donde guardar las imágenes
+            modelo_preferido: Modelo específico a usar en todos los backends (opcional)
+            
+        Returns:
+            Diccionario con estadísticas del procesamiento (incluye 'por_backend')
+        """
+        import httpx
+        
+        with open(archivo_configuraciones, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+        
+        configuraciones = datos['configuraciones']
+        metadata = datos['metadata']
+        
+        print(f"🚀 Iniciando procesamiento asíncrono de lote...")
+        print(f"📊 Total de imágenes: {len(configuraciones)}")
+        print(f"🌍 Nacionalidades: {', '.join(metadata['nacionalidades'])}")
+        
+        estadisticas = {
+            'total': len(configuraciones),
+            'exitosas': 0,
+            'fallidas': 0,
+            'archivos_generados': [],
+            'errores': [],
+            'por_backend': {}
+        }
+        
+        limites = httpx.Limits(
+            max_connections=len(self.backends) * self.en_vuelo_por_backend,
+            max_keepalive_connections=len(self.backends) * self.en_vuelo_por_backend
+        )
+        # Sin límite de lectura: una generación puede tardar minutos
+        timeout = httpx.Timeout(None, connect=10.0)
+        
+        async with httpx.AsyncClient(limits=limites, timeout=timeout) as client:
+            # Verificar conexión con cada backend
+            disponibles = []
+            for url, ok in zip(self.backends, await asyncio.gather(*(self._verificar_conexion_async(client, url) for url in self.backends))):
+                if ok:
+                    disponibles.append(url)
+                else:
+                    print(f"⚠️  Backend no disponible, se omite: {url}")
+            if not disponibles:
+                raise ConnectionError("No se puede conectar a ningún backend de Stable Diffusion WebUI")
+            
+            # Cambiar modelo si se especifica
+            if modelo_preferido:
+                print(f"🔄 Cambiando a modelo: {modelo_preferido}")
+                for url in disponibles:
+                    try:
+                        response = await client.post(f"{url}/sdapi/v1/options", json={"sd_model_checkpoint": modelo_preferido})
+                        if response.status_code != 200:
+                            print(f"⚠️  No se pudo cambiar al modelo {modelo_preferido} en {url}, continuando con el actual")
+                    except httpx.HTTPError:
+                        print(f"⚠️  No se pudo cambiar al modelo {modelo_preferido} en {url}, continuando con el actual")
+            
+            cola: asyncio.Queue = asyncio.Queue()
+            for i, configuracion in enumerate(configuraciones, 1):
+                cola.put_nowait((i, configuracion))
+            
+            for url in disponibles:
+                estadisticas['por_backend'][url] = {'exitosas': 0, 'fallidas': 0, 'tiempo': 0.0}
+            
+            trabajadores = [
+                self._trabajador_async(client, url, cola, directorio_salida, estadisticas)
+                for url in disponibles
+                for _ in range(self.en_vuelo_por_backend)
+            ]
+            await asyncio.gather(*trabajadores)
+        
+        return estadisticas
+    
+    async def _verificar_conexion_async(self, client, url: str) -> bool:
+        import httpx
+        try:
+            response = await client.get(f"{url}/", timeout=5)
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+    
+    async def _trabajador_async(self, client, url: str, cola: asyncio.Queue,
+                                directorio_salida: str, estadisticas: Dict[str, Any]):
+        """Toma configuraciones de la cola común y las genera en un backend hasta vaciarla."""
+        por_backend = estadisticas['por_backend'][url]
+        total = estadisticas['total']
+        
+        while True:
+            try:
+                i, configuracion = cola.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            
+            inicio = time.perf_counter()
+            try:
+                ruta_archivo = await self._generar_a_disco_async(client, url, configuracion, directorio_salida)
+                estadisticas['archivos_generados'].append(str(ruta_archivo))
+                estadisticas['exitosas'] += 1
+                por_backend['exitosas'] += 1
+                print(f"   ✅ [{i}/{total}] {configuracion['id']} ({url}): {ruta_archivo}")
+            except Exception as e:
+                estadisticas['fallidas'] += 1
+                por_backend['fallidas'] += 1
+                error_msg = f"Error en {configuracion['id']} ({url}): {e}"
+                estadisticas['errores'].append(error_msg)
+                print(f"   ❌ {error_msg}")
+            finally:
+                por_backend['tiempo'] += time.perf_counter() - inicio
+    
+    async def _generar_a_disco_async(self, client, url: str, configuracion: Dict[str, Any],
+                                     directorio_salida: str) -> Path:
+        """
+        Genera una imagen y la escribe a disco mientras se recibe la respuesta.
+        
+        Returns:
+            Ruta del archivo guardado
+        
+        Raises:
+            RuntimeError: Si el backend responde con error o sin imagen
+        """
+        ruta_archivo = self._ruta_imagen(configuracion, directorio_salida)
+        ruta_parcial = ruta_archivo.with_name(ruta_archivo.name + ".part")
+        decodificador = DecodificadorImagenStream()
+        
+        async with client.stream("POST", f"{url}/sdapi/v1/txt2img", json=self._construir_payload(configuracion)) as response:
+            if response.status_code != 200:
+                cuerpo = await response.aread()
+                raise RuntimeError(f"HTTP {response.status_code}: {cuerpo[:200].decode('utf-8', 'replace')}")
+            
+            binaria = response.headers.get('content-type', '').startswith('image/')
+            
+            try:
+                with open(ruta_parcial, 'wb') as f:
+                    async for bloque in response.aiter_bytes():
+                        if binaria:
+                            f.write(bloque)
+                        elif not decodificador.terminado:
+                            datos = decodificador.alimentar(bloque)
+                            if datos:
+                                f.write(datos)
+                        # El resto de la respuesta se sigue leyendo para devolver la conexión al pool
+            except BaseException:
+                # Stream cortado, error de decodificación o tarea cancelada: no dejar un .part a medias
+                ruta_parcial.unlink(missing_ok=True)
+                raise
+        
+        if not (binaria or decodificador.terminado):
+            ruta_parcial.unlink(missing_ok=True)
+            raise RuntimeError("La respuesta no contiene imágenes")
+        
+        os.replace(ruta_parcial, ruta_archivo)
+        return ruta_archivo
+    
     def mostrar_estadisticas_finales(self, estadisticas: Dict[str, Any]):
         """Muestra las estadísticas finales del procesamiento."""
         print(f"\n📊 ESTADÍSTICAS FINALES")
@@ -261,6 +536,11 @@ class WebUIPasaportes:
             for error in estadisticas['errores']:
                 print(f"   - {error}")
         
+        if estadisticas.get('por_backend'):
+            print(f"\n🖥️  Reparto por backend:")
+            for url, datos in estadisticas['por_backend'].items():
+                print(f"   - {url}: {datos['exitosas']} exitosas, {datos['fallidas']} fallidas, {datos['tiempo']:.1f}s")
+        
         if estadisticas['archivos_generados']:
             print(f"\n📁 Archivos generados:")
             for archivo in estadisticas['archivos_generados']:
@@ -279,12 +559,18 @@ def main():
                        help='Modelo específico a usar (opcional)')
     parser.add_argument('--listar-modelos', action='store_true',
                        help='Listar modelos disponibles en WebUI')
+    parser.add_argument('--async', dest='modo_async', action='store_true',
+                       help='Modo asíncrono: solicitudes concurrentes repartidas entre backends')
+    parser.add_argument('--backend', action='append', default=[],
+                       help='URL de una instancia de WebUI para el modo asíncrono (repetible; por defecto --webui-url)')
+    parser.add_argument('--en-vuelo', type=int, default=2,
+                       help='Solicitudes simultáneas por backend en el modo asíncrono (por defecto: 2)')
     
     args = parser.parse_args()
     
     try:
         # Inicializar cliente
-        webui = WebUIPasaportes(args.webui_url)
+        webui = WebUIPasaportes(args.webui_url, backends=args.backend or None, en_vuelo_por_backend=args.en_vuelo)
         
         if args.listar_modelos:
             print("🔄 Obteniendo modelos disponibles...")
@@ -297,14 +583,15 @@ def main():
                 print("❌ No se pudieron obtener los modelos")
             return
         
-        # Verificar conexión
-        print(f"🔍 Verificando conexión con WebUI en {args.webui_url}...")
-        if not webui.verificar_conexion():
-            print(f"❌ Error: No se puede conectar a Stable Diffusion WebUI en {args.webui_url}")
-            print("💡 Asegúrate de que WebUI esté ejecutándose y accesible")
-            return
-        
-        print("✅ Conexión establecida con WebUI")
+        # Verificar conexión (en modo asíncrono cada backend se verifica al iniciar el lote)
+        if not args.modo_async:
+            print(f"🔍 Verificando conexión con WebUI en {args.webui_url}...")
+            if not webui.verificar_conexion():
+                print(f"❌ Error: No se puede conectar a Stable Diffusion WebUI en {args.webui_url}")
+                print("💡 Asegúrate de que WebUI esté ejecutándose y accesible")
+                return
+            
+            print("✅ Conexión establecida con WebUI")
         
         # Verificar archivo de configuraciones
         if not os.path.exists(args.config):
@@ -312,7 +599,10 @@ def main():
             return
         
         # Procesar lote
-        estadisticas = webui.procesar_lote(args.config, args.output, args.modelo)
+        if args.modo_async:
+            estadisticas = asyncio.run(webui.procesar_lote_async(args.config, args.output, args.modelo))
+        else:
+            estadisticas = webui.procesar_lote(args.config, args.output, args.modelo)
         
         # Mostrar estadísticas finales
         webui.mostrar_estadisticas_finales(estadisticas)